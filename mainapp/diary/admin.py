@@ -1,6 +1,7 @@
 """Модуль представления таблиц из БД в админке."""
 from django.contrib import admin
-from .models import UserBase, UserStat, DirectoryFood, UserFoodDay, DirectoryIngredients, RecipeFood
+from .models import UserBase, UserStat, DirectoryFood, UserFoodDay, DirectoryIngredients,\
+    RecipeFood, DietaGramLookup, Job, UserStatRollup, DirectoryChange
 
 # Register your models here.
 @admin.register(UserBase)
@@ -22,7 +23,7 @@ class AdminDirectoryFood(admin.ModelAdmin):
 @admin.register(UserFoodDay)
 class AdminUserFoodDay(admin.ModelAdmin):
     """Класс представления таблицы UserFoodDay в админке"""
-    list_display = ('id', 'food', 'user', 'date')
+    list_display = ('id', 'food', 'user', 'date', 'name', 'caloric')
 
 @admin.register(DirectoryIngredients)
 class AdminDirectoryIngredients(admin.ModelAdmin):
@@ -33,3 +34,25 @@ class AdminDirectoryIngredients(admin.ModelAdmin):
 class AdminRecipeFood(admin.ModelAdmin):
     """Класс представления таблицы RecipeFood в админке"""
     list_display = ('id', 'food', 'ingredient', 'gram')
+
+@admin.register(DietaGramLookup)
+class AdminDietaGramLookup(admin.ModelAdmin):
+    """Класс представления таблицы DietaGramLookup в админке"""
+    list_display = ('id', 'name', 'lang', 'found', 'expires_at')
+
+@admin.register(Job)
+class AdminJob(admin.ModelAdmin):
+    """Класс представления таблицы Job в админке"""
+    list_display = ('id', 'kind', 'status', 'user', 'attempts', 'run_after', 'locked_by',\
+        'finished_at')
+
+@admin.register(UserStatRollup)
+class AdminUserStatRollup(admin.ModelAdmin):
+    """Класс представления таблицы UserStatRollup в админке"""
+    list_display = ('id', 'user', 'period', 'start', 'calories_burned', 'fat_burned',\
+        'protein_burned', 'carbon_burned', 'days_logged')
+
+@admin.register(DirectoryChange)
+class AdminDirectoryChange(admin.ModelAdmin):
+    """Класс представления таблицы DirectoryChange в админке"""
+    list_display = ('id', 'kind', 'item_id')
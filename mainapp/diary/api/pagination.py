@@ -0,0 +1,64 @@
+"""Модуль keyset пагинации списочных представлений.
+
+Страница выбирается не смещением OFFSET, а условием "после ключа последней
+строки предыдущей страницы" по тому же порядку сортировки: (date, id) для
+записей за период и (rank, id) для поиска. Поэтому стоимость страницы не
+зависит от того, как далеко пролистан список. Ключ передается клиенту
+подписанным токеном cursor (django.core.signing), подделанный или чужой
+токен отклоняется.
+
+Пагинация включается параметром cursor или page_size, без них
+представления отвечают прежним полным списком."""
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from rest_framework.response import Response
+
+
+class InvalidPage(Exception):
+    """Неверный page_size или cursor в запросе."""
+
+
+def paginated(request):
+    """Запрошена ли постраничная выдача."""
+    return 'cursor' in request.query_params or 'page_size' in request.query_params
+
+
+def after_date_id(queryset, key):
+    """Записи выборки после ключа (date, id) в порядке date, id."""
+    if key:
+        queryset = queryset.filter(Q(date__gt=key[0]) | Q(date=key[0], id__gt=key[1]))
+    return queryset.order_by('date', 'id')
+
+
+class KeysetPage:
+    """Параметры страницы запроса: размер size и ключ key последней строки
+    предыдущей страницы (None для первой). scope отделяет токены разных
+    представлений друг от друга."""
+
+    def __init__(self, request, scope):
+        self.request = request
+        self.salt = f'diary.cursor.{scope}'
+        options = settings.DIARY_PAGINATION
+        try:
+            size = int(request.query_params.get('page_size') or options['PAGE_SIZE'])
+        except ValueError as error:
+            raise InvalidPage('page_size must be integer') from error
+        self.size = max(1, min(size, options['MAX_PAGE_SIZE']))
+        token = request.query_params.get('cursor')
+        try:
+            self.key = signing.loads(token, salt=self.salt) if token else None
+        except signing.BadSignature as error:
+            raise InvalidPage('invalid cursor') from error
+
+    def response(self, rows, keys):
+        """Ответ со страницей rows и ссылкой next на следующую страницу.
+        rows и keys - строки и их ключи, прочитанные с запасом в одну строку
+        (size + 1): лишняя строка означает, что следующая страница есть."""
+        next_url = None
+        if len(rows) > self.size:
+            params = self.request.query_params.copy()
+            params['cursor'] = signing.dumps(list(keys[self.size - 1]), salt=self.salt)
+            params['page_size'] = self.size
+            next_url = self.request.build_absolute_uri(f'{self.request.path}?{params.urlencode()}')
+        return Response({'next': next_url, 'results': rows[:self.size]})
@@ -0,0 +1,38 @@
+"""Модуль дополнительных форматов ответа API."""
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Байтовые последовательности U+2028 и U+2029, которые JSONRenderer экранирует.
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSON рендерер на orjson. Вывод совпадает с JSONRenderer в компактном
+    режиме: даты, время, Decimal и ленивые строки Django кодируются тем же
+    encoder_class, U+2028/U+2029 так же экранируются. Ответы с отступами
+    (браузерный API, indent в Accept), значения, которые orjson не умеет
+    кодировать, и окружение без orjson обрабатываются JSONRenderer."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None or not self.compact or\
+                self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            content = orjson.dumps(data, default=self.encoder_class().default,\
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+        except (orjson.JSONEncodeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+        for char, escaped in LINE_SEPARATORS:
+            content = content.replace(char, escaped)
+        return content
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    """JSON в колоночном виде: параллельные массивы значений вместо массива
+    объектов. Выбирается параметром format=columnar, данные для него
+    представление строит само (diary.exports.period_columns)."""
+    format = 'columnar'
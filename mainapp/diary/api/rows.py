@@ -0,0 +1,67 @@
+"""Модуль быстрого построения ответов списочных представлений.
+
+Вместо ModelSerializer строки читаются из БД values_list сразу нужными
+полями и превращаются в обычные словари.
+Ключи и значения совпадают с выводом сериализаторов (SearchFoodSerializer,
+UserFoodDaySerializer, UserStatForPeriodSerializer), даты приводятся
+к строкам ISO 8601, как это делает DateField сериализатора.
+
+Параметр запроса fields=a,b,c сужает ответ до перечисленных ключей, тогда
+и из БД читаются только соответствующие столбцы."""
+
+# Ключ ответа и поле выборки values_list для каждого представления.
+SEARCH_FOOD_FIELDS = {'id': 'id', 'name': 'name', 'caloric': 'caloric', 'fat': 'fat',
+                      'carbon': 'carbon', 'protein': 'protein'}
+FOOD_DAY_FIELDS = {'id': 'id', 'food': 'food', 'user': 'user', 'date': 'date',
+                   'name': 'name', 'gram': 'gram', 'caloric': 'caloric', 'fat': 'fat',
+                   'protein': 'protein', 'carbon': 'carbon'}
+STAT_PERIOD_FIELDS = {'id': 'id', 'user': 'user', 'date': 'date',
+                      'calories_burned': 'calories_burned'}
+
+
+class InvalidFields(Exception):
+    """Параметр fields содержит неизвестные ключи."""
+
+
+def pick_fields(fields, requested):
+    """Ключи fields, перечисленные через запятую в параметре requested, в
+    порядке fields. Без параметра возвращает все ключи."""
+    if not requested:
+        return fields
+    names = {i.strip() for i in requested.split(',')} - {''}
+    unknown = sorted(names - set(fields))
+    if unknown or not names:
+        raise InvalidFields(f'unknown fields: {", ".join(unknown)}; '
+                            f'allowed: {", ".join(fields)}')
+    return {key: name for key, name in fields.items() if key in names}
+
+
+def with_keys(fields, keys, all_fields):
+    """Добавляет к выбранным ключам fields ключи keys, нужные представлению
+    (порядок строк, ключ страницы), из полного набора all_fields."""
+    return {**fields, **{key: all_fields[key] for key in keys if key not in fields}}
+
+
+def project(rows, fields):
+    """Оставляет в словарях ответа только ключи fields."""
+    return [{key: row[key] for key in fields} for row in rows]
+
+
+def queryset_rows(queryset, fields):
+    """Словари ответа по выборке: один запрос values_list без создания
+    экземпляров моделей. Порядок строк совпадает с порядком выборки."""
+    keys = tuple(fields)
+    has_date = 'date' in keys
+    rows = []
+    for values in queryset.values_list(*fields.values()):
+        row = dict(zip(keys, values))
+        if has_date and row['date'] is not None:
+            row['date'] = row['date'].isoformat()
+        rows.append(row)
+    return rows
+
+
+def object_rows(objects, fields):
+    """Словари ответа по уже загруженным экземплярам моделей, например по
+    результату поискового бэкенда с raw запросом."""
+    return [{key: getattr(obj, name) for key, name in fields.items()} for obj in objects]
@@ -2,7 +2,8 @@
 from rest_framework.serializers import ModelSerializer, \
     CharField, DateField, IntegerField, BooleanField
 from diary.models import UserBase, DirectoryFood, \
-    UserFoodDay, UserStat, DirectoryIngredients, RecipeFood
+    UserFoodDay, UserStat, DirectoryIngredients, RecipeFood, Job, UserStatRollup
+from diary.rollups import STAT_FIELDS
 
 
 class UserRegisterSerializer(ModelSerializer):
@@ -82,29 +83,40 @@ class SearchQueryParamSerializer(ModelSerializer):
     """Сериализатор query-параметров поиска еды."""
     name = CharField(help_text='Name of food', required=False)
     lang = CharField(help_text='Search language ', required=False)
+    limit = IntegerField(help_text='Max number of results', required=False)
 
     class Meta:
         """Метакласс сериализатора поиска еды.
-        Определяет поля поиска name и lang."""
+        Определяет поля поиска name, lang и limit."""
         model = DirectoryFood
-        fields = ('name', 'lang')
+        fields = ('name', 'lang', 'limit')
+
+
+class AutocompleteQueryParamSerializer(ModelSerializer):
+    """Сериализатор query-параметров автодополнения названий."""
+    prefix = CharField(help_text='Beginning of food or ingredient name', required=True)
+    limit = IntegerField(help_text='Max number of results', required=False)
+    kind = CharField(help_text='food or ingredient', required=False)
+
+    class Meta:
+        """Метакласс сериализатора. Определяет поля
+        prefix, limit, kind."""
+        model = DirectoryFood
+        fields = ('prefix', 'limit', 'kind')
 
 
 class UserFoodDaySerializer(ModelSerializer):
     """Сериализатор представления получения статистики
-    по еде за день."""
-    name = CharField(source='food.name')
-    caloric = IntegerField(source='food.caloric')
-    fat = IntegerField(source='food.fat')
-    protein = IntegerField(source='food.protein')
-    carbon = IntegerField(source='food.carbon')
+    по еде за день. Название, калории и БЖУ берутся из записи дневника,
+    куда они скопированы из справочника при добавлении блюда в пересчете
+    на съеденные gram грамм."""
 
     class Meta:
         """Метакласс сериализатора. Определяет поля
-        id, food, user, date, name, caloric,
+        id, food, user, date, name, gram, caloric,
         fat, protein, carbon."""
         model = UserFoodDay
-        fields = ('id', 'food', 'user', 'date', 'name',
+        fields = ('id', 'food', 'user', 'date', 'name', 'gram',
                   'caloric', 'fat', 'protein', 'carbon')
 
 
@@ -114,9 +126,9 @@ class UserFoodDayAddSerializer(ModelSerializer):
 
     class Meta:
         """Метакласс сериализатора. Определяет поля
-        id, food, user, date."""
+        id, food, user, date, gram."""
         model = UserFoodDay
-        fields = ('id', 'food', 'user', 'date')
+        fields = ('id', 'food', 'user', 'date', 'gram')
 
 
 class UserFoodDayDeleteSerializer(ModelSerializer):
@@ -266,3 +278,47 @@ class RecipeFoodDeleteSerializer(ModelSerializer):
         food, ingredients, gram"""
         model = RecipeFood
         fields = ('food', 'ingredients', 'gram')
+
+
+class JobSerializer(ModelSerializer):
+    """Сериализатор состояния фоновой задачи."""
+
+    class Meta:
+        """Метакласс сериализатора. Определяет поля
+        id, kind, status, attempts, error, created_at, finished_at."""
+        model = Job
+        fields = ('id', 'kind', 'status', 'attempts', 'error', 'created_at', 'finished_at')
+
+
+class UserStatRollupSerializer(ModelSerializer):
+    """Сериализатор сумм статистики пользователя за неделю или месяц.
+    Средние считаются на день с записями статистики."""
+
+    class Meta:
+        """Метакласс сериализатора. Определяет поля
+        period, start, calories_burned, fat_burned, protein_burned,
+        carbon_burned, days_logged."""
+        model = UserStatRollup
+        fields = ('period', 'start', *STAT_FIELDS, 'days_logged')
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        for field in STAT_FIELDS:
+            data[f'avg_{field}'] = round(getattr(instance, field) / instance.days_logged, 1)\
+                if instance.days_logged else 0
+        return data
+
+
+class UserStatRollupQueryParamSerializer(ModelSerializer):
+    """Сериализатор query-параметров для представления получения
+    сумм статистики пользователя по неделям или месяцам."""
+    date_start = DateField(help_text='First day of the period', required=True)
+    date_end = DateField(help_text='Last day of the period', required=True)
+    user = IntegerField(help_text='User id', required=True)
+    period = CharField(help_text='week or month', required=True)
+
+    class Meta:
+        """Метакласс сериализатора. Определяет поля
+        date_start, date_end, user, period."""
+        model = UserStatRollup
+        fields = ('date_start', 'date_end', 'user', 'period')
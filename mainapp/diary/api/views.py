@@ -1,29 +1,38 @@
 """Модуль представлений django приложения."""
-import io
-import csv
 import datetime
+import gzip
 from http import HTTPStatus
-import requests
-from dotenv import dotenv_values
 from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.lib import colors
-from reportlab import rl_config
-from reportlab.platypus import Table, SimpleDocTemplate, Paragraph
-from reportlab.lib.styles import getSampleStyleSheet
-from django.db.models import Q
-from django.db.utils import IntegrityError
-from django.http import HttpResponse, FileResponse
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
 from django.contrib.auth.views import LoginView, LogoutView
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.generics import CreateAPIView, DestroyAPIView, UpdateAPIView
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, IsAuthenticated
+from rest_framework.settings import api_settings
 from diary.models import UserBase, DirectoryFood, UserFoodDay, UserStat,\
-    DirectoryIngredients, RecipeFood
-from mainapp.settings import BASE_DIR
+    DirectoryIngredients, RecipeFood, Job, UserStatRollup
+from diary.search import get_search_backend
+from diary.stats import add_to_stat, apply_stat_deltas
+from diary.rollups import PERIODS, period_range
+from diary.exports import STREAM_FORMATS, STAT_REPORT, FOOD_REPORT, ReportTooLarge,\
+    check_row_limit, period_columns, period_csv, period_filename, period_json, period_queryset,\
+    stream_response
+from diary.jobs import artifact_path, enqueue as enqueue_job
+from diary.report_cache import report_cache
+from diary.autocomplete import name_index
+from diary.changelog import FOOD, INGREDIENT, SnapshotRequired, delta, directory_snapshot
+from diary.dietagram.errors import DietaGramError, DietaGramUnavailable
+from .renderers import ColumnarJSONRenderer
+from .pagination import InvalidPage, KeysetPage, after_date_id, paginated
+from .rows import FOOD_DAY_FIELDS, SEARCH_FOOD_FIELDS, STAT_PERIOD_FIELDS, InvalidFields,\
+    object_rows, pick_fields, project, queryset_rows, with_keys
 from .serializers import UserRegisterSerializer, SearchFoodSerializer,\
     SearchQueryParamSerializer, UserFoodDaySerializer, UserStatAddSerializer,\
     DirectoryFoodUserCreateSerializer, DirectoryIngredientsCreateSerializer,\
@@ -32,17 +41,9 @@ from .serializers import UserRegisterSerializer, SearchFoodSerializer,\
     UserStatForDayQueryParamSerializer, RecipeFoodDeleteSerializer,\
     UserStatForPeriodQueryParamSerializer, UserStatForPeriodSerializer, \
     UserFoodDayAddSerializer, UserChangePwdSerializer, UserGetInfoSerializer,\
-    UserGetInfoQueryParamSerializer, RecipeGetQueryParamSerializer
-
-CONFIG = dotenv_values(".env")
-
-
-styles = getSampleStyleSheet()
-
-styles['Normal'].fontName='Arimo'
-styles['Heading1'].fontName = 'Arimo'
-rl_config.TTFSearchPath.append(str(BASE_DIR) + '/mainapp/font')
-pdfmetrics.registerFont(TTFont('Arimo', 'Arimo-VariableFont_wght.ttf'))
+    UserGetInfoQueryParamSerializer, RecipeGetQueryParamSerializer,\
+    AutocompleteQueryParamSerializer, JobSerializer, UserStatRollupSerializer,\
+    UserStatRollupQueryParamSerializer
 
 
 class UserLoginView(LoginView):
@@ -111,39 +112,63 @@ class FoodSearchView(APIView):
         type=openapi.TYPE_STRING, required=True), \
         openapi.Parameter(name='lang', in_=openapi.IN_QUERY, \
         description='Language', type=openapi.TYPE_STRING, \
-        required=True)])
+        required=True), \
+        openapi.Parameter(name='limit', in_=openapi.IN_QUERY, \
+        description='Max number of results', type=openapi.TYPE_INTEGER, \
+        required=False), \
+        openapi.Parameter(name='page_size', in_=openapi.IN_QUERY, \
+        description='Return a page of results with a next link', \
+        type=openapi.TYPE_INTEGER, required=False), \
+        openapi.Parameter(name='cursor', in_=openapi.IN_QUERY, \
+        description='Page token from the next link', type=openapi.TYPE_STRING, \
+        required=False), \
+        openapi.Parameter(name='fields', in_=openapi.IN_QUERY, \
+        description='Comma separated fields to return', type=openapi.TYPE_STRING, \
+        required=False)])
     def get(self, request):
         """Реализация GET метода класса поиска еды.
         Условия следующие: Если запрашиваемая еда есть в БД,
         то возвращаем его. Если еды нет, то обращаемся
         к API DietaGram, результаты записываем в БД и возвращаем
-        результат пользователю."""
+        импортированные блюда пользователю. Результаты поиска по БД
+        отсортированы по релевантности, ответ ограничен параметром limit,
+        либо, с параметрами page_size и cursor, отдается по страницам."""
         name_food = request.query_params['name']
         lang = request.query_params['lang']
-        result = DirectoryFood.objects.filter(Q(name__icontains = name_food))
-        if not len(result):
-            req_result = requests.get(\
-                f'https://dietagram.p.rapidapi.com/apiFood.php?name={name_food}&lang={lang}', \
-                headers= {'X-RapidAPI-Key': CONFIG['X-RapidAPI-Key'],\
-                    'X-RapidAPI-Host': CONFIG['X-RapidAPI-Host']})
-            if req_result.status_code != HTTPStatus.OK:
-                return Response({'error': 'Food not found'}, status=HTTPStatus.NOT_FOUND)
+        page = None
+        try:
+            fields = pick_fields(SEARCH_FOOD_FIELDS, request.query_params.get('fields'))
+            if paginated(request):
+                page = KeysetPage(request, 'search')
+                limit = page.size + 1
             else:
-                data = req_result.json()
-                if not len(data['dishes']):
-                    return Response({'error': 'Food not found'}, status=HTTPStatus.NOT_FOUND)
-                for i in data['dishes']:
-                    try:
-                        i_format = self.item_parse(i)
-                        food_dir = DirectoryFood(name=i_format['name'],\
-                            caloric=i_format['caloric'], fat=i_format['fat'],\
-                            carbon=i_format['carbon'], protein=i_format['protein'])
-                        food_dir.save()
-                    except IntegrityError:
-                        continue
-                result = DirectoryFood.objects.filter(Q(name__icontains = name_food))
-                return Response(SearchFoodSerializer(result, many=True).data)
-        return Response(SearchFoodSerializer(result, many=True).data)
+                limit = int(request.query_params.get('limit', settings.DIARY_SEARCH_LIMIT))
+                limit = max(1, min(limit, settings.DIARY_SEARCH_MAX_LIMIT))
+        except (InvalidFields, InvalidPage) as error:
+            return Response({'error': str(error)}, status=HTTPStatus.BAD_REQUEST)
+        except ValueError:
+            return Response({'error': 'limit must be integer'}, status=HTTPStatus.BAD_REQUEST)
+        result = get_search_backend().search(name_food, limit, page and page.key,\
+            tuple(fields.values()))
+        if not result and not (page and page.key):
+            # Клиент DietaGram импортирует requests, загружаем его при первом промахе.
+            from diary.dietagram.lookup import lookup_dishes  # pylint: disable=import-outside-toplevel
+            try:
+                result = lookup_dishes(name_food, lang, self.item_parse)[:limit]
+            except DietaGramUnavailable:
+                return Response({'error': 'Food search is temporarily unavailable'},\
+                    status=HTTPStatus.SERVICE_UNAVAILABLE)
+            except DietaGramError:
+                return Response({'error': 'Food not found'}, status=HTTPStatus.NOT_FOUND)
+            if not result:
+                return Response({'error': 'Food not found'}, status=HTTPStatus.NOT_FOUND)
+            if page:
+                # У блюд из DietaGram нет rank, их выдача помещается на одну страницу.
+                result = result[:page.size]
+        if page:
+            return page.response(object_rows(result, fields),\
+                [(getattr(i, 'rank', None), i.id) for i in result])
+        return Response(object_rows(result, fields))
 
     def item_parse(self, item):
         """Внутренний метод парсинга ответа от внешнего api."""
@@ -157,6 +182,133 @@ class FoodSearchView(APIView):
         return result
 
 
+class FoodBatchView(APIView):
+    """Представление получения блюд справочника по списку id."""
+    serializer_class = SearchFoodSerializer
+    permission_classes = (IsAuthenticatedOrReadOnly, )
+
+    @swagger_auto_schema(manual_parameters=[openapi.Parameter(name='ids', \
+        in_=openapi.IN_QUERY, description='Comma separated food ids', \
+        type=openapi.TYPE_STRING, required=True), \
+        openapi.Parameter(name='fields', in_=openapi.IN_QUERY, \
+        description='Comma separated fields to return', type=openapi.TYPE_STRING, \
+        required=False)])
+    def get(self, request):
+        """Реализация GET метода класса получения блюд по id. Блюда читаются
+        одним запросом id__in только с запрошенными полями и возвращаются
+        в порядке ids, несуществующие id пропускаются."""
+        try:
+            ids = list(dict.fromkeys(int(i) for i in\
+                request.query_params.get('ids', '').split(',') if i.strip()))
+        except ValueError:
+            return Response({'error': 'ids must be comma separated integers'},\
+                status=HTTPStatus.BAD_REQUEST)
+        if not 0 < len(ids) <= settings.DIARY_FOOD_BATCH_MAX_IDS:
+            return Response({'error': 'ids must contain from 1 to '\
+                f'{settings.DIARY_FOOD_BATCH_MAX_IDS} food ids'}, status=HTTPStatus.BAD_REQUEST)
+        try:
+            fields = pick_fields(SEARCH_FOOD_FIELDS, request.query_params.get('fields'))
+        except InvalidFields as error:
+            return Response({'error': str(error)}, status=HTTPStatus.BAD_REQUEST)
+        rows = queryset_rows(DirectoryFood.objects.filter(id__in=ids),\
+            with_keys(fields, ('id',), SEARCH_FOOD_FIELDS))
+        by_id = {row['id']: row for row in rows}
+        return Response(project([by_id[i] for i in ids if i in by_id], fields))
+
+
+class FoodAutocompleteView(APIView):
+    """Представление автодополнения названий блюд и ингредиентов.
+    Отвечает из индекса в памяти процесса, не обращаясь к БД."""
+    permission_classes = (IsAuthenticatedOrReadOnly, )
+
+    @swagger_auto_schema(query_serializer=AutocompleteQueryParamSerializer, \
+        manual_parameters=[openapi.Parameter(name='prefix', in_=openapi.IN_QUERY, \
+        description='Beginning of food or ingredient name', \
+        type=openapi.TYPE_STRING, required=True), \
+        openapi.Parameter(name='limit', in_=openapi.IN_QUERY, \
+        description='Max number of results', type=openapi.TYPE_INTEGER, required=False), \
+        openapi.Parameter(name='kind', in_=openapi.IN_QUERY, \
+        description='food or ingredient', type=openapi.TYPE_STRING, required=False)])
+    def get(self, request):
+        """Реализация GET метода класса автодополнения."""
+        prefix = request.query_params.get('prefix', '').strip()
+        kind = request.query_params.get('kind')
+        options = settings.DIARY_AUTOCOMPLETE
+        try:
+            limit = int(request.query_params.get('limit', options['LIMIT']))
+        except ValueError:
+            return Response({'error': 'limit must be integer'}, status=HTTPStatus.BAD_REQUEST)
+        if not prefix:
+            return Response({'error': 'prefix is required'}, status=HTTPStatus.BAD_REQUEST)
+        if kind not in (None, FOOD, INGREDIENT):
+            return Response({'error': 'kind must be food or ingredient'},\
+                status=HTTPStatus.BAD_REQUEST)
+        name_index.ensure_fresh()
+        limit = max(1, min(limit, options['MAX_LIMIT']))
+        return Response(name_index.lookup(prefix, limit, kind))
+
+
+class DirectorySnapshotView(APIView):
+    """Представление полного снимка справочников блюд и ингредиентов для
+    кэширования на клиенте."""
+    permission_classes = (IsAuthenticatedOrReadOnly, )
+
+    def get(self, request):
+        """Реализация GET метода: JSON {"version", "food", "ingredient"},
+        сжатый gzip, если клиент его принимает. ETag - версия справочников,
+        повторный запрос с If-None-Match получает 304."""
+        current, data = directory_snapshot.get()
+        key = f'directory-{current}'
+        if report_cache.matches(request.headers.get('If-None-Match'), key):
+            response = HttpResponseNotModified()
+        elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response = HttpResponse(data, content_type='application/json')
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(gzip.decompress(data), content_type='application/json')
+        response['ETag'] = report_cache.etag(key)
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        return response
+
+
+class DirectoryChangesView(APIView):
+    """Представление изменений справочников после известной клиенту версии."""
+    permission_classes = (IsAuthenticatedOrReadOnly, )
+
+    @swagger_auto_schema(manual_parameters=[openapi.Parameter(name='since', \
+        in_=openapi.IN_QUERY, description='Directory version known to the client', \
+        type=openapi.TYPE_INTEGER, required=True)])
+    def get(self, request):
+        """Реализация GET метода: созданные и измененные записи и id удаленных
+        после версии since. Если изменений слишком много, возвращает 410 со
+        ссылкой на снимок."""
+        try:
+            since = int(request.query_params['since'])
+        except (KeyError, ValueError):
+            return Response({'error': 'since must be integer'}, status=HTTPStatus.BAD_REQUEST)
+        if since < 0:
+            return Response({'error': 'since must not be negative'},\
+                status=HTTPStatus.BAD_REQUEST)
+        try:
+            return Response(delta(since))
+        except SnapshotRequired as error:
+            return Response({'error': str(error),\
+                'snapshot_url': reverse('directory_snapshot')}, status=HTTPStatus.GONE)
+
+
+def parse_gram(value):
+    """Приводит вес порции из запроса к целому числу грамм, по умолчанию
+    100 г. Выбрасывает ValueError для нецелого или неположительного веса."""
+    if value is None or value == '':
+        return UserFoodDay.DEFAULT_GRAM
+    if isinstance(value, bool) or (isinstance(value, float) and not value.is_integer()):
+        raise ValueError(value)
+    gram = int(value)
+    if not 0 < gram <= UserFoodDay.MAX_GRAM:
+        raise ValueError(value)
+    return gram
+
+
 class UserFoodAddView(APIView):
     """Представление добавления пользовательской еды."""
     queryset = UserFoodDay
@@ -170,38 +322,93 @@ class UserFoodAddView(APIView):
                                 properties=  {
                                     'user' : openapi.Schema(type=openapi.TYPE_INTEGER), 
                                     'food' : openapi.Schema(type=openapi.TYPE_INTEGER), 
-                                    'date': openapi.Schema(type=openapi.TYPE_STRING)
+                                    'date': openapi.Schema(type=openapi.TYPE_STRING),
+                                    'gram': openapi.Schema(type=openapi.TYPE_INTEGER)
                                 }
                             ))
     def post(self, request):
         """Реализация метода POST для представления."""
-        user = UserBase.objects.get(id=request.data['user'])
-        food = DirectoryFood.objects.get(id=request.data['food'])
-        today = datetime.datetime.today()
-        time = today.strftime('%Y-%m-%d')
-        date = request.data['date'] if 'date' in request.data else time
-        UserFoodDay.objects.create(user=user, food=food, date=date)
         try:
-            result = UserStat.objects.get(user=user, date=date)
-            result.calories_burned += food.caloric
-            result.fat_burned += food.fat
-            result.protein_burned += food.protein
-            result.carbon_burned += food.carbon
-            result.save()
-        except UserStat.DoesNotExist:
-            result = UserStat.objects.create(user=user, calories_burned=food.caloric,\
-                fat_burned=food.fat, protein_burned=food.protein, carbon_burned=food.carbon, \
-                date=date)
-            return Response(UserStatAddSerializer(result, many=False).data)
+            gram = parse_gram(request.data.get('gram'))
+        except (TypeError, ValueError):
+            return Response({'error': 'gram must be an integer from 1 to '\
+                f'{UserFoodDay.MAX_GRAM}'}, status=HTTPStatus.BAD_REQUEST)
+        food = DirectoryFood.objects.get(id=request.data['food'])
+        date = request.data.get('date') or datetime.date.today()
+        with transaction.atomic():
+            entry = UserFoodDay.objects.create(user_id=request.data['user'], food=food, date=date,\
+                **UserFoodDay.snapshot(food, gram))
+            result = add_to_stat(request.data['user'], date, *entry.nutrients)
         return Response(UserStatAddSerializer(result, many=False).data)
 
 
+class UserFoodAddBatchView(APIView):
+    """Представление добавления нескольких блюд пользователя одним запросом."""
+    queryset = UserFoodDay
+    serializer_class = UserStatAddSerializer
+    permission_classes = (IsAuthenticated, )
+
+    @swagger_auto_schema(
+                            request_body=openapi.Schema(
+                                type=openapi.TYPE_OBJECT,
+                                required= ['user', 'items'],
+                                properties=  {
+                                    'user' : openapi.Schema(type=openapi.TYPE_INTEGER),
+                                    'items': openapi.Schema(type=openapi.TYPE_ARRAY,
+                                        items=openapi.Schema(type=openapi.TYPE_OBJECT,
+                                        required=['food'], properties={
+                                        'food': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                        'date': openapi.Schema(type=openapi.TYPE_STRING),
+                                        'gram': openapi.Schema(type=openapi.TYPE_INTEGER)}))
+                                }
+                            ))
+    def post(self, request):
+        """Реализация метода POST для представления. Все блюда проверяются
+        одним запросом, записи UserFoodDay создаются bulk_create, а статистика
+        каждого затронутого дня увеличивается на сумму блюд одним upsert."""
+        items = request.data.get('items')
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'items must be a non-empty list'},\
+                status=HTTPStatus.BAD_REQUEST)
+        date_field = UserFoodDay._meta.get_field('date')  # pylint: disable=protected-access
+        today = datetime.date.today()
+        try:
+            entries = [(int(i['food']), date_field.to_python(i.get('date') or today),\
+                parse_gram(i.get('gram'))) for i in items]
+        except (KeyError, TypeError, ValueError, ValidationError):
+            return Response({'error': 'each item needs an integer food, a date yyyy-mm-dd '\
+                f'and a gram from 1 to {UserFoodDay.MAX_GRAM}'}, status=HTTPStatus.BAD_REQUEST)
+        foods = DirectoryFood.objects.in_bulk({food for food, _, _ in entries})
+        missing = sorted({food for food, _, _ in entries if food not in foods})
+        if missing:
+            return Response({'error': 'food not found', 'food': missing},\
+                status=HTTPStatus.NOT_FOUND)
+        rows = [UserFoodDay(user_id=request.data['user'], food_id=food, date=date,\
+            **UserFoodDay.snapshot(foods[food], gram)) for food, date, gram in entries]
+        deltas = {}
+        for row in rows:
+            total = deltas.get(row.date, (0, 0, 0, 0))
+            deltas[row.date] = tuple(i + j for i, j in zip(total, row.nutrients))
+        with transaction.atomic():
+            UserFoodDay.objects.bulk_create(rows)
+            result = apply_stat_deltas(request.data['user'], deltas)
+        result.sort(key=lambda stat: stat.date)
+        return Response(UserStatAddSerializer(result, many=True).data)
+
+
 class UserFoodDeleteView(DestroyAPIView):
-    """Представление добавления пользовательской еды."""
+    """Представление удаления пользовательской еды."""
     queryset = UserFoodDay.objects.all()
     serializer_class = UserFoodDayDeleteSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, )
 
+    def perform_destroy(self, instance):
+        """Удаляет блюдо из дневника и в той же транзакции вычитает
+        его сохраненные в записи калории и БЖУ из статистики за день."""
+        with transaction.atomic():
+            instance.delete()
+            add_to_stat(instance.user_id, instance.date, *(-i for i in instance.nutrients))
+
 
 class UserStatAddView(APIView):
     """Представление добавления количества калорий за день."""
@@ -221,24 +428,11 @@ class UserStatAddView(APIView):
             'date': openapi.Schema(type=openapi.TYPE_STRING),}))
     def post(self, request):
         """Реализация метода POST для представления."""
-        stat = UserStat.objects.filter(user=UserBase.objects.get(id=request.data['user']),\
-            date=request.data['date'])
-        if len(stat):
-            result = UserStat.objects.get(user=UserBase.objects.get(id=request.data['user']),\
-                date=request.data['date'])
-            result.calories_burned += request.data['calories_burned']
-            result.fat_burned += request.data['fat_burned']
-            result.protein_burned += request.data['protein_burned']
-            result.carbon_burned += request.data['carbon_burned']
-            result.save()
-            return Response(UserStatAddSerializer(result, many=False).data)
-        else:
-            result = UserStat.objects.create(user=UserBase.objects.get(\
-                id=request.data['user']), calories_burned=request.data['calories_burned'],
-                fat_burned=request.data['fat_burned'],
-                protein_burned=request.data['protein_burned'],
-                carbon_burned=request.data['carbon_burned'])
-            return Response(UserStatAddSerializer(result, many=False).data)
+        result = add_to_stat(request.data['user'],\
+            request.data.get('date') or datetime.date.today(),\
+            request.data['calories_burned'], request.data['fat_burned'],\
+            request.data['protein_burned'], request.data['carbon_burned'])
+        return Response(UserStatAddSerializer(result, many=False).data)
 
 
 class DirectoryFoodUserCreateView(CreateAPIView):
@@ -338,11 +532,130 @@ class UserGetStatForDayView(APIView):
                 status=HTTPStatus.NOT_FOUND)
 
 
-class UserGetStatForPeriodView(APIView):
+class UserStatRollupView(APIView):
+    """Получение сумм статистики пользователя по неделям или месяцам."""
+    model = UserStatRollup
+    serializer_class = UserStatRollupSerializer
+    permission_classes = (IsAuthenticatedOrReadOnly, )
+
+    @swagger_auto_schema(query_serializer=UserStatRollupQueryParamSerializer)
+    def get(self, request):
+        """Реализация GET метода: недели или месяцы, пересекающиеся с периодом
+        от date_start до date_end, по возрастанию начала."""
+        serializer = UserStatRollupQueryParamSerializer(data=request.query_params)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=HTTPStatus.BAD_REQUEST)
+        params = serializer.validated_data
+        if params['period'] not in PERIODS:
+            return Response({'error': f'period must be one of {", ".join(PERIODS)}'},\
+                status=HTTPStatus.BAD_REQUEST)
+        if not UserBase.objects.filter(id=params['user']).exists():
+            return Response({'error': 'user not found'}, status=HTTPStatus.NOT_FOUND)
+        result = UserStatRollup.objects.filter(user=params['user'], period=params['period'],\
+            start__range=(period_range(params['period'], params['date_start'])[0],\
+            params['date_end'])).order_by('start')
+        return Response(UserStatRollupSerializer(result, many=True).data)
+
+
+class PeriodExportMixin:
+    """Выгрузка отчета report за период: потоковая CSV/JSON выгрузка, PDF
+    отчет или, при async=true, фоновая задача построения PDF/CSV файла.
+    PDF и CSV файлы кэшируются на диске (diary.report_cache) и отдаются с ETag.
+    format=columnar возвращает JSON параллельными массивами."""
+    report = None
+    renderer_classes = (*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer)
+
+    def export(self, request, user, result):
+        """Ответ с выгрузкой или отчетом по параметрам запроса либо None,
+        если запрошен обычный JSON ответ."""
+        params = request.query_params
+        stream_format = 'csv' if params.get('csv_file') == 'true' else params.get('stream')
+        pdf = params.get('pdf_file') == 'true'
+        if params.get('async') == 'true' and (stream_format == 'csv' or pdf):
+            return self.enqueue(request, user, result, 'csv' if stream_format == 'csv'\
+                else 'pdf')
+        if stream_format in STREAM_FORMATS and stream_format != 'csv':
+            return stream_response(stream_format, *period_json(self.report, user, result), None)
+        if stream_format == 'csv' or pdf:
+            return self.cached(request, user, result, 'csv' if stream_format == 'csv' else 'pdf')
+        if request.accepted_renderer.format == ColumnarJSONRenderer.format:
+            return Response(period_columns(self.report, result))
+        return None
+
+    def cached(self, request, user, result, extension):
+        """PDF или CSV файл отчета: 304, если у клиента актуальная версия,
+        файл из кэша либо новый отчет, который попутно сохраняется в кэш."""
+        date_start, date_end = request.query_params['date_start'],\
+            request.query_params['date_end']
+        key = report_cache.key(user, self.report, extension, date_start, date_end)
+        filename = period_filename(self.report, extension, date_start, date_end)
+        if report_cache.matches(request.headers.get('If-None-Match'), key):
+            response = HttpResponseNotModified()
+        else:
+            response = self.render(user, result, extension, key, filename)
+        if response.status_code < HTTPStatus.BAD_REQUEST:
+            response['ETag'] = report_cache.etag(key)
+        return response
+
+    def render(self, user, result, extension, key, filename):
+        """Ответ с файлом отчета из кэша либо с новым отчетом, сохраняемым
+        в кэш: CSV - по мере отправки клиенту, PDF - после построения."""
+        file = report_cache.open(key, extension)
+        if file is not None:
+            return FileResponse(file, as_attachment=True, filename=filename)
+        if extension == 'csv':
+            response = stream_response('csv', *period_csv(self.report, user, result), filename)
+            response.streaming_content = report_cache.tee(key, extension,\
+                response.streaming_content)
+            return response
+        from diary.reports import period_pdf  # pylint: disable=import-outside-toplevel
+        params = self.request.query_params
+        try:
+            file = period_pdf(self.report, user, result, params['date_start'],\
+                params['date_end'])
+        except ReportTooLarge as error:
+            return Response({'error': str(error)}, status=HTTPStatus.BAD_REQUEST)
+        return FileResponse(report_cache.store(key, extension, file), as_attachment=True,\
+            filename=filename)
+
+    def listing(self, request, result, all_fields):
+        """Обычный JSON ответ: все записи за период или, с параметрами
+        page_size и cursor, страница записей по ключу (date, id). Параметр
+        fields оставляет в ответе только перечисленные поля."""
+        try:
+            fields = pick_fields(all_fields, request.query_params.get('fields'))
+            if not paginated(request):
+                return Response(queryset_rows(result, fields))
+            page = KeysetPage(request, self.report)
+        except (InvalidFields, InvalidPage) as error:
+            return Response({'error': str(error)}, status=HTTPStatus.BAD_REQUEST)
+        rows = queryset_rows(after_date_id(result, page.key)[:page.size + 1],\
+            with_keys(fields, ('date', 'id'), all_fields))
+        return page.response(project(rows, fields), [(i['date'], i['id']) for i in rows])
+
+    def enqueue(self, request, user, result, extension):
+        """Ставит построение файла в очередь задач, возвращает id задачи."""
+        if not request.user.is_authenticated:
+            return Response({'error': 'authentication required for async reports'},\
+                status=HTTPStatus.UNAUTHORIZED)
+        if extension == 'pdf':
+            try:
+                check_row_limit(result.count())
+            except ReportTooLarge as error:
+                return Response({'error': str(error)}, status=HTTPStatus.BAD_REQUEST)
+        job = enqueue_job('period_report', {'report': self.report, 'format': extension,\
+            'user': user.id, 'date_start': request.query_params['date_start'],\
+            'date_end': request.query_params['date_end']}, user=request.user)
+        return Response({'job': job.id, 'status': job.status,\
+            'status_url': reverse('job_status', args=[job.id])}, status=HTTPStatus.ACCEPTED)
+
+
+class UserGetStatForPeriodView(PeriodExportMixin, APIView):
     """Получение статистики пользователя за период."""
     model = UserStat
     serializer_class = UserStatForPeriodSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, )
+    report = STAT_REPORT
 
     @swagger_auto_schema(query_serializer=UserStatForPeriodQueryParamSerializer, 
             manual_parameters=[openapi.Parameter(name='date_start', in_=openapi.IN_QUERY,
@@ -356,61 +669,33 @@ class UserGetStatForPeriodView(APIView):
             required=True), openapi.Parameter(name='csv_file', in_=openapi.IN_QUERY,
             description='return csv file', type=openapi.TYPE_BOOLEAN,
             required=False), openapi.Parameter(name='pdf_file', in_=openapi.IN_QUERY,
-            description='return pdf file', type=openapi.TYPE_BOOLEAN, required=False)])
+            description='return pdf file', type=openapi.TYPE_BOOLEAN, required=False),
+            openapi.Parameter(name='stream', in_=openapi.IN_QUERY,
+            description='stream export: csv, ndjson or json', type=openapi.TYPE_STRING,
+            required=False),
+            openapi.Parameter(name='async', in_=openapi.IN_QUERY,
+            description='build pdf or csv file in background, returns job id',
+            type=openapi.TYPE_BOOLEAN, required=False),
+            openapi.Parameter(name='format', in_=openapi.IN_QUERY,
+            description='columnar: parallel arrays instead of objects',
+            type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter(name='page_size', in_=openapi.IN_QUERY,
+            description='Return a page of records ordered by date with a next link',
+            type=openapi.TYPE_INTEGER, required=False),
+            openapi.Parameter(name='cursor', in_=openapi.IN_QUERY,
+            description='Page token from the next link', type=openapi.TYPE_STRING,
+            required=False),
+            openapi.Parameter(name='fields', in_=openapi.IN_QUERY,
+            description='Comma separated fields to return', type=openapi.TYPE_STRING,
+            required=False)])
     def get(self, request):
         """Реализация GET метода класса получения статистики за период."""
-        result = UserStat.objects.filter(date__range=(request.query_params['date_start'],\
-            request.query_params['date_end']),
-            user=UserBase.objects.get(id=request.query_params['user']))
-        start_date = request.query_params['date_start']
-        date_end = request.query_params['date_end']
-        user=UserBase.objects.get(id=request.query_params['user'])
-        if 'csv_file' in request.query_params and request.query_params['csv_file'] == 'true':
-            response = HttpResponse(content_type="text/csv", \
-                headers={"Content-Disposition": f'attachment; filename="calories_stat_for\
-                _period_{start_date}-{date_end}.csv"'},)
-            writer = csv.writer(response)
-            if user.recommended_calories:
-                writer.writerow(['id', 'user', 'date', 'calories_burned',\
-                    'fat_burned', 'protein_burned', 'carbon_burned', 'balance'])
-                for i in result:
-                    balance = user.recommended_calories - i.calories_burned
-                    writer.writerow([i.id, i.user, i.date, i.calories_burned,\
-                        i.fat_burned, i.protein_burned, i.carbon_burned, balance])
-            else:
-                writer.writerow(['id', 'user', 'date', 'calories_burned',\
-                'fat_burned', 'protein_burned', 'carbon_burned'])
-                for i in result:
-                    writer.writerow([i.id, i.user, i.date, i.calories_burned,\
-                        i.fat_burned, i.protein_burned, i.carbon_burned])
-            return response
-        elif 'pdf_file' in request.query_params and request.query_params['pdf_file'] == 'true':
-            buf = io.BytesIO()
-            story = []
-            title=f'Your report on calories/fat/protein/carbon \
-                received the period from {start_date} to {date_end}'
-            story.append(Paragraph(title, styles['Normal']))
-            if user.recommended_calories:
-                data = [('id', 'username', 'data', 'calories', 'fat', 'protein', 'carbon', 'balance')]
-                for i in result:
-                    balance = user.recommended_calories - i.calories_burned
-                    data.append((i.id, i.user, i.date, i.calories_burned,\
-                        i.fat_burned, i.protein_burned, i.carbon_burned, balance))
-            else:
-                data = [('id', 'username', 'data', 'calories', 'fat', 'protein', 'carbon')]
-                for i in result:
-                    data.append((i.id, i.user, i.date, i.calories_burned,\
-                        i.fat_burned, i.protein_burned, i.carbon_burned))
-            doc = SimpleDocTemplate(buf, rightMargin=0,\
-                leftMargin=6.5, topMargin=0.3, bottomMargin=0)
-            table = Table(data, hAlign='CENTER', style=[('GRID', (0,0), (-1,-1), 0.25, colors.black),])
-            story.append(table)
-            doc.build(story)
-            buf.seek(0)
-            return FileResponse(buf, as_attachment=True, \
-                filename=f'calories_stat_for_period_{start_date}-{date_end}.pdf')
-        else:
-            return Response(UserStatForPeriodSerializer(result, many=True).data)
+        user = UserBase.objects.get(id=request.query_params['user'])
+        result = period_queryset(self.report, user, request.query_params['date_start'],\
+            request.query_params['date_end'])
+        return self.export(request, user, result) or\
+            self.listing(request, result, STAT_PERIOD_FIELDS)
+
 
 class UserFoodDayStatView(APIView):
     """Представление получения блюд пользователя за день."""
@@ -423,19 +708,26 @@ class UserFoodDayStatView(APIView):
                 description='DateField for get stat on how much user eat',
                 type=openapi.TYPE_STRING, required=True), 
                 openapi.Parameter(name='user', in_=openapi.IN_QUERY,
-                description='User id', type=openapi.TYPE_INTEGER, required=True)])
+                description='User id', type=openapi.TYPE_INTEGER, required=True),
+                openapi.Parameter(name='fields', in_=openapi.IN_QUERY,
+                description='Comma separated fields to return', type=openapi.TYPE_STRING,
+                required=False)])
     def get(self, request):
         """Реализация GET метода класса получения блюд пользователя за день."""
+        try:
+            fields = pick_fields(FOOD_DAY_FIELDS, request.query_params.get('fields'))
+        except InvalidFields as error:
+            return Response({'error': str(error)}, status=HTTPStatus.BAD_REQUEST)
         result = UserFoodDay.objects.filter(date=request.query_params['date'],\
-            user=UserBase.objects.get(id=request.query_params['user']))\
-            .select_related('food')
-        return Response(UserFoodDaySerializer(result, many=True).data)
+            user=UserBase.objects.get(id=request.query_params['user']))
+        return Response(queryset_rows(result, fields))
 
-class UserFoodDayStatPeriodView(APIView):
+class UserFoodDayStatPeriodView(PeriodExportMixin, APIView):
     """Представление получения блюд пользователя за период."""
     model = UserFoodDay
     serializer_class = UserFoodDaySerializer
     permission_classes = (IsAuthenticatedOrReadOnly, )
+    report = FOOD_REPORT
 
     @swagger_auto_schema(query_serializer=UserStatForPeriodQueryParamSerializer, 
             manual_parameters=[openapi.Parameter(name='date_start', in_=openapi.IN_QUERY,
@@ -450,45 +742,32 @@ class UserFoodDayStatPeriodView(APIView):
             description='return csv file', type=openapi.TYPE_BOOLEAN, required=False), 
             openapi.Parameter(name='pdf_file', in_=openapi.IN_QUERY,
             description='return pdf file',
-            type=openapi.TYPE_BOOLEAN, required=False)])
+            type=openapi.TYPE_BOOLEAN, required=False),
+            openapi.Parameter(name='stream', in_=openapi.IN_QUERY,
+            description='stream export: csv, ndjson or json', type=openapi.TYPE_STRING,
+            required=False),
+            openapi.Parameter(name='async', in_=openapi.IN_QUERY,
+            description='build pdf or csv file in background, returns job id',
+            type=openapi.TYPE_BOOLEAN, required=False),
+            openapi.Parameter(name='format', in_=openapi.IN_QUERY,
+            description='columnar: parallel arrays instead of objects',
+            type=openapi.TYPE_STRING, required=False),
+            openapi.Parameter(name='page_size', in_=openapi.IN_QUERY,
+            description='Return a page of records ordered by date with a next link',
+            type=openapi.TYPE_INTEGER, required=False),
+            openapi.Parameter(name='cursor', in_=openapi.IN_QUERY,
+            description='Page token from the next link', type=openapi.TYPE_STRING,
+            required=False),
+            openapi.Parameter(name='fields', in_=openapi.IN_QUERY,
+            description='Comma separated fields to return', type=openapi.TYPE_STRING,
+            required=False)])
     def get(self, request):
         """Реализация GET метода класса получения блюд пользователя за период."""
-        result = UserFoodDay.objects.filter(date__range=(request.query_params['date_start'],\
-            request.query_params['date_end']),
-         user=UserBase.objects.get(id=request.query_params['user'])).select_related('food')
-        start_date = request.query_params['date_start']
-        date_end = request.query_params['date_end']
-        if 'csv_file' in request.query_params and request.query_params['csv_file'] == 'true':
-            response = HttpResponse(content_type="text/csv", \
-                headers={"Content-Disposition": f'attachment; filename="userfoodday_stat_for\
-                _period_{start_date}-{date_end}.csv"'},)
-            writer = csv.writer(response)
-            writer.writerow(['id', 'food id', 'username', 'date', 'name of food', 'caloric',\
-                    'fat', 'protein', 'carbon'])
-            for i in result:
-                writer.writerow([i.id, i.food.id, i.user, i.date, i.food.name, i.food.caloric,\
-                    i.food.fat, i.food.protein, i.food.carbon])    
-            return response
-        elif 'pdf_file' in request.query_params and request.query_params['pdf_file'] == 'true':
-            buf = io.BytesIO()
-            story = []
-            data = [('id', 'food id', 'user id', 'date', 'food name', 'caloric', 'fat',\
-                'protein', 'carbon')]
-            for i in result:
-                data.append((i.id, i.food, i.user, i.date,  Paragraph(i.food.name,\
-                    styles['Normal']), i.food.caloric, i.food.fat, i.food.protein, i.food.carbon))
-            doc = SimpleDocTemplate(buf, rightMargin=0, leftMargin=6.5,\
-                topMargin=0.3, bottomMargin=0,)
-            title=f'Your report on dishes eaten during the period from {start_date} to {date_end}'
-            table = Table(data, hAlign='CENTER', style=[('GRID', (0,0), (-1,-1), 0.25, colors.black),])
-            story.append(Paragraph(title, styles['Normal']))
-            story.append(table)
-            doc.build(story)
-            buf.seek(0)
-            return FileResponse(buf, as_attachment=True,\
-                filename=f'food_stat_for_period_{start_date}-{date_end}.pdf')
-        else:
-            return Response(UserFoodDaySerializer(result, many=True).data)
+        user = UserBase.objects.get(id=request.query_params['user'])
+        result = period_queryset(self.report, user, request.query_params['date_start'],\
+            request.query_params['date_end'])
+        return self.export(request, user, result) or\
+            self.listing(request, result, FOOD_DAY_FIELDS)
 
 
 class FoodGetRecipeView(APIView):
@@ -515,23 +794,11 @@ class FoodGetRecipeView(APIView):
                 item = {'ingredient name': ing.ingredient.name, 'gram': ing.gram}
                 result['ingredients'].append(item)
             if 'pdf_file' in request.query_params and request.query_params['pdf_file'] == 'true':
-                buf = io.BytesIO()
-                story = []
-                doc = SimpleDocTemplate(buf, rightMargin=0, leftMargin=6.5,\
-                    topMargin=0.3, bottomMargin=0,)
-                title=f'Recipe of {food.name}'
-                story.append(Paragraph(title, styles['Normal']))
-                story.append(Paragraph(result['recipe'], styles['Normal'])) if result['recipe']\
-                    else story.append(Paragraph('Not description', styles['Normal']))
-                table_data = [('ingredient', 'gram')]
-                for i in result['ingredients']:
-                    table_data.append((Paragraph(i['ingredient name'],\
-                        styles['Normal']), i['gram']))
-                table = Table(table_data, hAlign='CENTER', style=[('GRID', (0,0), (-1,-1), 0.25, colors.black),])
-                story.append(table)
-                doc.build(story)
-                buf.seek(0)
-                return FileResponse(buf, as_attachment=True, filename=f'recipe_{food.name}.pdf')
+                from diary.reports import build_report  # pylint: disable=import-outside-toplevel
+                file = build_report([f'Recipe of {food.name}', result['recipe'] or\
+                    'Not description'], ('ingredient', 'gram'), ((i['ingredient name'],\
+                    i['gram']) for i in result['ingredients']), [0.7, 0.3])
+                return FileResponse(file, as_attachment=True, filename=f'recipe_{food.name}.pdf')
             else:
                 return Response(result, status=HTTPStatus.OK)
         else:
@@ -610,3 +877,43 @@ class UserRecCaloriesView(APIView):
         user.recommended_calories = result
         user.save()
         return Response({'success': f'recommended calories: {result}'}, status=HTTPStatus.OK)
+
+
+class JobStatusView(APIView):
+    """Представление состояния фоновой задачи пользователя."""
+    model = Job
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated, )
+
+    def get(self, request, pk):
+        """Реализация GET метода: состояние задачи и ссылка на результат."""
+        try:
+            job = Job.objects.get(id=pk, user=request.user)
+        except Job.DoesNotExist:
+            return Response({'error': 'job not found'}, status=HTTPStatus.NOT_FOUND)
+        data = JobSerializer(job).data
+        if job.status == Job.DONE and job.artifact:
+            data['artifact_url'] = reverse('job_artifact', args=[job.id])
+        return Response(data)
+
+
+class JobArtifactView(APIView):
+    """Представление получения файла результата фоновой задачи."""
+    model = Job
+    permission_classes = (IsAuthenticated, )
+
+    def get(self, request, pk):
+        """Реализация GET метода: файл результата выполненной задачи."""
+        try:
+            job = Job.objects.get(id=pk, user=request.user)
+        except Job.DoesNotExist:
+            return Response({'error': 'job not found'}, status=HTTPStatus.NOT_FOUND)
+        if job.status != Job.DONE or not job.artifact:
+            return Response({'error': f'job is {job.status}, no artifact yet'},\
+                status=HTTPStatus.CONFLICT)
+        try:
+            file = open(artifact_path(job), 'rb')  # pylint: disable=consider-using-with
+        except FileNotFoundError:
+            return Response({'error': 'artifact expired'}, status=HTTPStatus.GONE)
+        return FileResponse(file, as_attachment=True, filename=job.artifact_name,\
+            content_type=job.content_type)
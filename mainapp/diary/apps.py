@@ -5,3 +5,7 @@ from django.apps import AppConfig
 class DiaryConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'diary'
+
+    def ready(self):
+        """Подключает обработчики сигналов приложения."""
+        from diary import signals  # pylint: disable=import-outside-toplevel,unused-import
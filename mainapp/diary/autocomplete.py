@@ -0,0 +1,132 @@
+"""Модуль индекса названий для автодополнения.
+
+Индекс - отсортированный в памяти процесса массив названий блюд и
+ингредиентов, префикс ищется бинарным поиском. Изменения справочников
+в этом процессе применяются сигналами (diary.signals), изменения из других
+процессов и массовые загрузки не чаще CHECK_INTERVAL секунд дочитываются
+по журналу изменений справочников (diary.changelog)."""
+import threading
+import time
+from bisect import bisect_left, insort
+from django.conf import settings
+from diary.changelog import KIND_MODELS, SnapshotRequired, changed_since, version
+
+
+class NameIndex:
+    """Отсортированный индекс названий справочников блюд и ингредиентов."""
+
+    def __init__(self):
+        self._entries = []
+        self._names = {}
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.RLock()
+
+    @property
+    def loaded(self):
+        """Загружен ли индекс в память процесса."""
+        return self._version is not None
+
+    def reset(self):
+        """Выгружает индекс, он будет загружен заново при следующем поиске."""
+        with self._lock:
+            self._entries = []
+            self._names = {}
+            self._version = None
+
+    def load(self):
+        """Полностью перечитывает названия справочников из БД."""
+        current = version()
+        entries = []
+        for kind, model in KIND_MODELS.items():
+            entries.extend((name.casefold(), kind, pk, name) for pk, name\
+                in model.objects.values_list('id', 'name').iterator(chunk_size=10000))
+        entries.sort()
+        with self._lock:
+            self._entries = entries
+            self._names = {(kind, pk): (key, kind, pk, name) for key, kind, pk, name in entries}
+            self._version = current
+            self._checked_at = time.monotonic()
+
+    def ensure_fresh(self):
+        """Загружает индекс при первом обращении и не чаще CHECK_INTERVAL
+        секунд применяет изменения справочников из журнала. Если изменений
+        больше MAX_DELTA, индекс перечитывается целиком."""
+        if not self.loaded:
+            self.load()
+            return
+        if time.monotonic() - self._checked_at < settings.DIARY_AUTOCOMPLETE['CHECK_INTERVAL']:
+            return
+        current = version()
+        with self._lock:
+            since = self._version
+            self._checked_at = time.monotonic()
+        if current == since:
+            return
+        try:
+            self.apply_changes(since, current)
+        except SnapshotRequired:
+            self.load()
+
+    def apply_changes(self, since, current):
+        """Перечитывает названия записей, измененных после версии since."""
+        changed = changed_since(since)
+        if sum(len(ids) for ids in changed.values()) > settings.DIARY_DIRECTORY_SYNC['MAX_DELTA']:
+            raise SnapshotRequired(f'too many changes since version {since}')
+        names = {kind: dict(KIND_MODELS[kind].objects.filter(id__in=ids)\
+            .values_list('id', 'name')) for kind, ids in changed.items() if ids}
+        with self._lock:
+            if not self.loaded:
+                return
+            for kind, ids in changed.items():
+                for pk in ids:
+                    if pk in names.get(kind, {}):
+                        self.add(kind, pk, names[kind][pk])
+                    else:
+                        self.remove(kind, pk)
+            self._version = max(self._version, current)
+
+    def add(self, kind, pk, name):
+        """Добавляет или переименовывает запись индекса."""
+        with self._lock:
+            if not self.loaded:
+                return
+            self._discard(kind, pk)
+            entry = (name.casefold(), kind, pk, name)
+            insort(self._entries, entry)
+            self._names[(kind, pk)] = entry
+
+    def remove(self, kind, pk):
+        """Удаляет запись из индекса."""
+        with self._lock:
+            if not self.loaded:
+                return
+            self._discard(kind, pk)
+
+    def lookup(self, prefix, limit, kind=None):
+        """Возвращает до limit записей, название которых начинается с prefix,
+        в алфавитном порядке."""
+        key = prefix.casefold()
+        result = []
+        with self._lock:
+            entries = self._entries
+            for position in range(bisect_left(entries, (key,)), len(entries)):
+                entry = entries[position]
+                if not entry[0].startswith(key) or len(result) >= limit:
+                    break
+                if kind is None or entry[1] == kind:
+                    result.append({'id': entry[2], 'name': entry[3], 'type': entry[1]})
+        return result
+
+    def _discard(self, kind, pk):
+        """Удаляет запись из отсортированного массива, если она есть."""
+        entry = self._names.pop((kind, pk), None)
+        if entry is None:
+            return False
+        position = bisect_left(self._entries, entry)
+        if position < len(self._entries) and self._entries[position] == entry:
+            del self._entries[position]
+        return True
+
+
+name_index = NameIndex()
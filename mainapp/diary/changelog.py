@@ -0,0 +1,128 @@
+"""Модуль журнала изменений справочников блюд и ингредиентов.
+
+Каждое создание, изменение и удаление записи справочника добавляет в
+DirectoryChange строку (kind, item_id) с новым автоинкрементным id - версией
+справочников, прежние строки той же записи удаляются. Поэтому журнал не
+длиннее справочников вместе с удаленными записями, а изменения после
+известной клиенту версии - это записи журнала с большим id.
+
+id выдается при INSERT, а виден другим транзакциям только после COMMIT.
+Чтобы версия N+1 не стала видна раньше N, запись в журнал на PostgreSQL
+берет блокировку таблицы журнала в режиме EXCLUSIVE до конца транзакции:
+изменения справочников фиксируются строго в порядке id, а чтение журнала
+не блокируется.
+
+Полный снимок справочников сжимается gzip один раз на версию и хранится
+в памяти процесса до следующего изменения."""
+import gzip
+import json
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+from diary.models import DirectoryChange, DirectoryFood, DirectoryIngredients
+
+FOOD = DirectoryChange.FOOD
+INGREDIENT = DirectoryChange.INGREDIENT
+KIND_MODELS = {FOOD: DirectoryFood, INGREDIENT: DirectoryIngredients}
+MODEL_KINDS = {model: kind for kind, model in KIND_MODELS.items()}
+# Поля записей справочников в снимке и изменениях.
+ITEM_FIELDS = ('id', 'name', 'caloric', 'fat', 'carbon', 'protein')
+BATCH_SIZE = 500
+
+
+class SnapshotRequired(Exception):
+    """Изменений после версии клиента слишком много или версия неизвестна,
+    клиенту нужно загрузить снимок заново."""
+
+
+def record(kind, ids):
+    """Отмечает записи справочника kind с id из ids измененными. Удаление
+    прежних строк и вставка новых выполняются в одной транзакции."""
+    ids = list(ids)
+    if not ids:
+        return
+    # Без точки сохранения: ошибка и так отменяет всю внешнюю транзакцию.
+    with transaction.atomic(savepoint=False):
+        if connection.vendor == 'postgresql':
+            meta = DirectoryChange._meta  # pylint: disable=protected-access
+            table = connection.ops.quote_name(meta.db_table)
+            with connection.cursor() as cursor:
+                cursor.execute(f'LOCK TABLE {table} IN EXCLUSIVE MODE')
+        for start in range(0, len(ids), BATCH_SIZE):
+            batch = ids[start:start + BATCH_SIZE]
+            DirectoryChange.objects.filter(kind=kind, item_id__in=batch).delete()
+            DirectoryChange.objects.bulk_create([DirectoryChange(kind=kind, item_id=i)\
+                for i in batch])
+
+
+def version():
+    """Текущая версия справочников: id последней записи журнала."""
+    return DirectoryChange.objects.aggregate(version=Max('id'))['version'] or 0
+
+
+def changed_since(since):
+    """id записей справочников, измененных после версии since, по видам."""
+    result = {kind: set() for kind in KIND_MODELS}
+    for kind, item_id in DirectoryChange.objects.filter(id__gt=since)\
+            .values_list('kind', 'item_id').iterator():
+        result[kind].add(item_id)
+    return result
+
+
+def item_rows(kind, ids=None):
+    """Записи справочника kind (все или с id из ids) словарями ITEM_FIELDS."""
+    queryset = KIND_MODELS[kind].objects.order_by('id')
+    if ids is not None:
+        queryset = queryset.filter(id__in=ids)
+    return [dict(zip(ITEM_FIELDS, row)) for row in queryset.values_list(*ITEM_FIELDS)\
+        .iterator(chunk_size=10000)]
+
+
+def delta(since):
+    """Изменения справочников после версии since: текущие значения
+    созданных и измененных записей и id удаленных. Версия читается до
+    журнала, поэтому изменение, записанное во время запроса, в худшем
+    случае придет клиенту повторно, но не потеряется."""
+    current = version()
+    if since > current:
+        raise SnapshotRequired(f'version {since} is newer than the directory version {current}')
+    changed = changed_since(since)
+    if sum(len(ids) for ids in changed.values()) > settings.DIARY_DIRECTORY_SYNC['MAX_DELTA']:
+        raise SnapshotRequired(f'too many changes since version {since}')
+    result = {'version': current, 'deleted': {}}
+    for kind, ids in changed.items():
+        result[kind] = item_rows(kind, ids) if ids else []
+        result['deleted'][kind] = sorted(ids - {row['id'] for row in result[kind]})
+    return result
+
+
+class DirectorySnapshot:
+    """Сжатый gzip JSON снимок справочников последней версии."""
+
+    def __init__(self):
+        self._version = None
+        self._data = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Возвращает версию и gzip сжатый снимок, пересобирая его, если
+        справочники изменились."""
+        current = version()
+        with self._lock:
+            if self._version == current:
+                return current, self._data
+        payload = {'version': current, **{kind: item_rows(kind) for kind in KIND_MODELS}}
+        data = gzip.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':'))\
+            .encode(), mtime=0)
+        with self._lock:
+            self._version, self._data = current, data
+        return current, data
+
+    def reset(self):
+        """Сбрасывает снимок, он будет собран при следующем запросе."""
+        with self._lock:
+            self._version = self._data = None
+
+
+directory_snapshot = DirectorySnapshot()
@@ -0,0 +1,126 @@
+"""Модуль кэша запросов к API DietaGram.
+
+Кэш двухуровневый: LRU в памяти процесса и таблица DietaGramLookup в БД,
+которая переживает перезапуск воркеров. Кэшируются как найденные блюда,
+так и ответы "блюдо не найдено", каждый со своим временем жизни."""
+import logging
+import threading
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from diary.models import DietaGramLookup
+
+logger = logging.getLogger(__name__)
+
+LookupResult = namedtuple('LookupResult', ('found', 'food_ids', 'expires_at'))
+
+
+def normalize_query(name, lang):
+    """Приводит название блюда и язык к ключу кэша: схлопывает пробелы
+    и приводит к нижнему регистру."""
+    return ' '.join(name.split()).casefold(), lang.strip().lower()
+
+
+class LookupCache:
+    """Кэш результатов поиска блюд во внешнем API DietaGram."""
+
+    def __init__(self):
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self._stores = 0
+
+    @property
+    def options(self):
+        """Настройки кэша из DIETAGRAM_CACHE."""
+        return settings.DIETAGRAM_CACHE
+
+    def get(self, name, lang, record=True):
+        """Возвращает LookupResult или None, если в кэше нет актуальной записи.
+        При record=False обращение не учитывается в счетчиках попаданий."""
+        key = normalize_query(name, lang)
+        now = timezone.now()
+        with self._lock:
+            item = self._memory.get(key)
+            if item is not None and item.expires_at > now:
+                self._memory.move_to_end(key)
+                self.memory_hits += record
+                return item
+        row = DietaGramLookup.objects.filter(name=key[0], lang=key[1], expires_at__gt=now)\
+            .values_list('found', 'food_ids', 'expires_at').first()
+        with self._lock:
+            if row is None:
+                self._memory.pop(key, None)
+                if record:
+                    self.misses += 1
+                    self._log_ratio()
+                return None
+            self.db_hits += record
+            item = LookupResult(*row)
+            self._remember(key, item)
+        return item
+
+    def store(self, name, lang, food_ids):
+        """Сохраняет результат запроса. Пустой список food_ids означает,
+        что DietaGram не знает такого блюда."""
+        key = normalize_query(name, lang)
+        found = bool(food_ids)
+        ttl = self.options['POSITIVE_TTL'] if found else self.options['NEGATIVE_TTL']
+        item = LookupResult(found, list(food_ids), timezone.now() + timedelta(seconds=ttl))
+        DietaGramLookup.objects.update_or_create(name=key[0], lang=key[1],\
+            defaults={'found': item.found, 'food_ids': item.food_ids,\
+            'expires_at': item.expires_at})
+        with self._lock:
+            self._remember(key, item)
+            self._stores += 1
+            trim = self._stores % self.options['TRIM_EVERY'] == 0
+        self.evict()
+        if trim:
+            self.trim()
+        return item
+
+    def evict(self):
+        """Удаляет из БД просроченные записи."""
+        DietaGramLookup.objects.filter(expires_at__lte=timezone.now()).delete()
+
+    def trim(self):
+        """Удаляет из БД самые старые записи сверх MAX_ROWS. Запрос сортирует
+        всю таблицу, поэтому выполняется раз в TRIM_EVERY сохранений."""
+        max_rows = self.options['MAX_ROWS']
+        overflow = DietaGramLookup.objects.order_by('-expires_at')\
+            .values_list('expires_at', flat=True)[max_rows:max_rows + 1]
+        if overflow:
+            DietaGramLookup.objects.filter(expires_at__lte=overflow[0]).delete()
+
+    def clear(self):
+        """Очищает кэш в памяти процесса и счетчики."""
+        with self._lock:
+            self._memory.clear()
+            self.memory_hits = self.db_hits = self.misses = self._stores = 0
+
+    def stats(self):
+        """Возвращает счетчики попаданий и долю попаданий в кэш."""
+        hits = self.memory_hits + self.db_hits
+        total = hits + self.misses
+        return {'memory_hits': self.memory_hits, 'db_hits': self.db_hits,
+                'misses': self.misses, 'size': len(self._memory),
+                'hit_ratio': hits / total if total else 0.0}
+
+    def _remember(self, key, item):
+        """Кладет запись в LRU в памяти, вытесняя самые давние."""
+        self._memory[key] = item
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.options['MEMORY_SIZE']:
+            self._memory.popitem(last=False)
+
+    def _log_ratio(self):
+        """Периодически пишет в лог долю попаданий в кэш."""
+        total = self.memory_hits + self.db_hits + self.misses
+        if total % self.options['STATS_LOG_EVERY'] == 0:
+            logger.info('DietaGram cache stats: %s', self.stats())
+
+
+lookup_cache = LookupCache()
@@ -0,0 +1,164 @@
+"""Модуль клиента внешнего API DietaGram.
+
+Клиент держит пул keep-alive соединений, ограничивает время ожидания
+ответа, перестает обращаться к API, пока тот неисправен (circuit breaker),
+и не превышает лимит запросов RapidAPI (token bucket)."""
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from dotenv import dotenv_values
+from django.conf import settings
+from .errors import DietaGramError, DietaGramUnavailable
+
+
+class TokenBucket:
+    """Ограничитель частоты запросов. Пополняется со скоростью rate
+    токенов в секунду, вмещает не более capacity токенов."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout=0):
+        """Забирает токен, ожидая его не дольше timeout секунд.
+        Возвращает False, если токен за это время не появился."""
+        deadline = self.clock() + timeout
+        while True:
+            with self._lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if now + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
+class CircuitBreaker:
+    """Предохранитель от обращений к неисправному API. После failure_threshold
+    ошибок подряд размыкается на reset_timeout секунд, затем пропускает
+    один пробный запрос."""
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._probe = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        """Текущее состояние предохранителя."""
+        if self.opened_at is None:
+            return self.CLOSED
+        if self.clock() - self.opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        """Можно ли сейчас выполнить запрос."""
+        with self._lock:
+            state = self.state
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probe:
+                self._probe = True
+                return True
+            return False
+
+    def release(self):
+        """Возвращает право на пробный запрос, если запрос так и не был
+        выполнен, чтобы следующий вызов мог попробовать снова."""
+        with self._lock:
+            self._probe = False
+
+    def record_success(self):
+        """Отмечает успешный запрос и замыкает предохранитель."""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe = False
+
+    def record_failure(self):
+        """Отмечает неудачный запрос."""
+        with self._lock:
+            self.failures += 1
+            self._probe = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = self.clock()
+
+
+class DietaGramClient:
+    """Клиент поиска блюд в API DietaGram."""
+
+    def __init__(self, url, headers, options):
+        self.url = url
+        self.timeout = (options['CONNECT_TIMEOUT'], options['READ_TIMEOUT'])
+        self.quota_wait = options['QUOTA_WAIT']
+        self.breaker = CircuitBreaker(options['FAILURE_THRESHOLD'], options['RESET_TIMEOUT'])
+        self.bucket = TokenBucket(options['RATE'], options['BURST'])
+        self.session = requests.Session()
+        self.session.headers.update(headers)
+        retry = Retry(total=options['RETRIES'], backoff_factor=0.2,\
+            status_forcelist=(502, 503, 504), allowed_methods=('GET',), raise_on_status=False)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=options['POOL_SIZE'],\
+            max_retries=retry, pool_block=True)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def search(self, name, lang):
+        """Ищет блюда по названию. Возвращает список блюд из ответа API,
+        пустой список - если блюдо не найдено."""
+        if not self.breaker.allow():
+            raise DietaGramUnavailable('circuit breaker is open')
+        if not self.bucket.acquire(self.quota_wait):
+            self.breaker.release()
+            raise DietaGramUnavailable('request quota exceeded')
+        try:
+            response = self.session.get(self.url, params={'name': name, 'lang': lang},\
+                timeout=self.timeout)
+        except requests.RequestException as error:
+            self.breaker.record_failure()
+            raise DietaGramUnavailable(str(error)) from error
+        if response.status_code >= 500 or response.status_code == 429:
+            self.breaker.record_failure()
+            raise DietaGramUnavailable(f'upstream status {response.status_code}')
+        self.breaker.record_success()
+        if response.status_code != 200:
+            raise DietaGramError(f'upstream status {response.status_code}')
+        try:
+            return response.json().get('dishes') or []
+        except ValueError as error:
+            raise DietaGramError('invalid upstream response') from error
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """Возвращает клиент DietaGram процесса, создавая его при первом вызове.
+    Ключи RapidAPI читаются из env файла DIETAGRAM['ENV_FILE']."""
+    global _client  # pylint: disable=global-statement
+    with _client_lock:
+        if _client is None:
+            options = settings.DIETAGRAM
+            config = dotenv_values(options['ENV_FILE'])
+            headers = {'X-RapidAPI-Key': config.get('X-RapidAPI-Key', ''),
+                       'X-RapidAPI-Host': config.get('X-RapidAPI-Host', '')}
+            _client = DietaGramClient(options['URL'], headers, options)
+        return _client
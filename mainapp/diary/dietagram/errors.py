@@ -0,0 +1,13 @@
+"""Модуль исключений клиента API DietaGram.
+
+Исключения отделены от diary.dietagram.client, чтобы представления могли
+перехватывать их, не импортируя requests при запуске процесса."""
+
+
+class DietaGramError(Exception):
+    """Ошибка обращения к API DietaGram."""
+
+
+class DietaGramUnavailable(DietaGramError):
+    """API DietaGram временно недоступен: не отвечает, отвечает ошибкой,
+    открыт circuit breaker или исчерпана квота запросов."""
@@ -0,0 +1,36 @@
+"""Модуль поиска блюд в DietaGram с импортом в справочник блюд.
+
+Одновременные запросы одного и того же блюда объединяются: во внешнее
+API обращается и импортирует блюда только один запрос, остальные ждут
+его результат. Между процессами операция сериализуется advisory lock."""
+from diary.directory import import_dishes
+from diary.models import DirectoryFood
+from diary.singleflight import SingleFlight, advisory_lock
+from .cache import lookup_cache, normalize_query
+from .client import get_client
+
+search_flight = SingleFlight()
+
+
+def lookup_dishes(name, lang, parse):
+    """Возвращает блюда справочника, найденные DietaGram по названию: из кэша
+    либо запросом к API с импортом. parse - функция разбора блюда из ответа API.
+    Пустой список означает, что DietaGram не знает такого блюда."""
+    cached = lookup_cache.get(name, lang)
+    if cached is None:
+        key = normalize_query(name, lang)
+        return search_flight.do(key, lambda: _fetch_dishes(key, name, lang, parse))
+    return list(DirectoryFood.objects.filter(id__in=cached.food_ids)) if cached.found else []
+
+
+def _fetch_dishes(key, name, lang, parse):
+    """Запрашивает блюда у DietaGram и импортирует их под advisory lock.
+    Перед запросом повторно проверяет кэш: его мог заполнить другой процесс,
+    пока этот ждал блокировку."""
+    with advisory_lock(f'dietagram:{key[0]}:{key[1]}'):
+        cached = lookup_cache.get(name, lang, record=False)
+        if cached is not None:
+            return list(DirectoryFood.objects.filter(id__in=cached.food_ids))
+        foods = import_dishes([parse(i) for i in get_client().search(name, lang)])
+        lookup_cache.store(name, lang, [i.id for i in foods])
+        return foods
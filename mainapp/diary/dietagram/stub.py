@@ -0,0 +1,70 @@
+"""Модуль локальной заглушки API DietaGram.
+
+Заглушка отвечает в формате apiFood.php и позволяет проверять клиент
+под нагрузкой без доступа к RapidAPI: можно задать задержку ответа
+и долю ответов с ошибкой."""
+import json
+import random
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+
+class DietaGramStubHandler(BaseHTTPRequestHandler):
+    """Обработчик запросов заглушки. Названия, содержащие unknown,
+    считаются неизвестными и возвращают пустой список блюд."""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Обработка GET запроса к apiFood.php."""
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if url.path != '/apiFood.php' or 'name' not in query:
+            self._reply(HTTPStatus.NOT_FOUND, {'error': 'not found'})
+        elif random.random() < self.server.error_rate:
+            self._reply(HTTPStatus.SERVICE_UNAVAILABLE, {'error': 'stub failure'})
+        else:
+            self._reply(HTTPStatus.OK, {'dishes': self.dishes(query['name'][0])})
+
+    @staticmethod
+    def dishes(name):
+        """Формирует детерминированный список блюд для названия."""
+        if 'unknown' in name.lower():
+            return []
+        seed = sum(name.encode())
+        return [{'name': f'{name} {i}'[:50], 'caloric': f'{seed % 500 + i},5',
+                 'fat': f'{seed % 40 + i}', 'carbon': f'{seed % 70 + i},25',
+                 'protein': f'{seed % 30 + i}'} for i in range(1, 4)]
+
+    def _reply(self, status, body):
+        """Отправляет JSON ответ."""
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        """Отключает журналирование каждого запроса."""
+
+
+def make_stub_server(host='127.0.0.1', port=0, latency=0.0, error_rate=0.0):
+    """Создает сервер заглушки. При port=0 порт выбирается свободный."""
+    server = ThreadingHTTPServer((host, port), DietaGramStubHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.error_rate = error_rate
+    return server
+
+
+def start_stub_server(**kwargs):
+    """Запускает заглушку в фоновом потоке. Возвращает сервер и URL apiFood.php."""
+    server = make_stub_server(**kwargs)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f'http://{host}:{port}/apiFood.php'
@@ -0,0 +1,203 @@
+"""Модуль массовой загрузки записей в справочники блюд и ингредиентов."""
+import codecs
+import csv
+import io
+import json
+from django.db import connection
+from diary.changelog import MODEL_KINDS, record
+from diary.models import DirectoryFood
+
+NUTRIENT_FIELDS = ('caloric', 'fat', 'carbon', 'protein')
+IMPORT_FIELDS = ('name',) + NUTRIENT_FIELDS
+NAME_MAX_LENGTH = 50
+BATCH_SIZE = 500
+READ_SIZE = 1 << 16
+
+
+def prepare_rows(items):
+    """Приводит записи к кортежам (name, caloric, fat, carbon, protein).
+    Названия обрезаются до длины поля, записи без названия и повторы
+    названий отбрасываются."""
+    rows = {}
+    for item in items:
+        name = str(item.get('name') or '').strip()[:NAME_MAX_LENGTH]
+        if name and name not in rows:
+            rows[name] = (name,) + tuple(_to_int(item.get(field))\
+                for field in NUTRIENT_FIELDS)
+    return list(rows.values())
+
+
+def _to_int(value):
+    """Приводит значение нутриента к целому, допуская запятую в дробной части."""
+    return int(float(str(value or 0).replace(',', '.')))
+
+
+def _insert_returning(model, rows):
+    """Вставляет строки одним INSERT ... ON CONFLICT (name) DO NOTHING RETURNING
+    и возвращает созданные записи. Существующие названия пропускаются."""
+    meta = model._meta  # pylint: disable=protected-access
+    quote = connection.ops.quote_name
+    columns = [field.column for field in meta.concrete_fields]
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(IMPORT_FIELDS)) + ')'] * len(rows))
+    sql = (f'INSERT INTO {quote(meta.db_table)} '
+           f'({", ".join(quote(meta.get_field(i).column) for i in IMPORT_FIELDS)}) '
+           f'VALUES {placeholders} ON CONFLICT ({quote(meta.get_field("name").column)}) '
+           f'DO NOTHING RETURNING {", ".join(quote(i) for i in columns)}')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [value for row in rows for value in row])
+        attnames = [field.attname for field in meta.concrete_fields]
+        return [model.from_db(connection.alias, attnames, values) for values in cursor.fetchall()]
+
+
+def bulk_import(model, items, batch_size=BATCH_SIZE):
+    """Импортирует записи справочника пачками, не падая на уже существующих
+    названиях. Возвращает записи справочника для всех переданных названий -
+    как созданные, так и существовавшие ранее - в порядке items.
+    Созданные записи отмечаются в журнале изменений справочников."""
+    rows = prepare_rows(items)
+    returning = connection.vendor in ('postgresql', 'sqlite')
+    created = []
+    for start in range(0, len(rows), batch_size):
+        batch = rows[start:start + batch_size]
+        if returning:
+            created.extend(_insert_returning(model, batch))
+        else:
+            model.objects.bulk_create([model(**dict(zip(IMPORT_FIELDS, row)))\
+                for row in batch], ignore_conflicts=True)
+    by_name = {i.name: i for i in created}
+    missing = [row[0] for row in rows if row[0] not in by_name]
+    for start in range(0, len(missing), batch_size):
+        by_name.update((i.name, i) for i in model.objects.filter(\
+            name__in=missing[start:start + batch_size]))
+    result = [by_name[row[0]] for row in rows if row[0] in by_name]
+    # Без RETURNING созданные записи не отличить от существовавших.
+    record(MODEL_KINDS[model], [i.pk for i in (created if returning else result)])
+    return result
+
+
+def import_dishes(dishes):
+    """Импортирует блюда из ответа DietaGram, уже разобранные item_parse."""
+    return bulk_import(DirectoryFood, dishes)
+
+
+def _lines(file, offset):
+    """Строки бинарного файла, начиная с байта offset, декодированные из
+    UTF-8, вместе с байтовой позицией конца каждой строки."""
+    file.seek(offset)
+    for line in iter(file.readline, b''):
+        offset += len(line)
+        yield line.decode('utf-8'), offset
+
+
+def iter_csv(file, offset=0):
+    """Построчно читает CSV выгрузку с заголовком из бинарного файла.
+    Возвращает пары (запись, байтовая позиция после нее); offset - позиция,
+    с которой продолжить чтение, заголовок при этом читается из начала файла."""
+    file.seek(0)
+    header = next(csv.reader([file.readline().decode('utf-8')]), None)
+    if not header:
+        return
+    position = {'end': offset or file.tell()}
+
+    def lines():
+        for line, end in _lines(file, position['end']):
+            position['end'] = end
+            yield line
+    for row in csv.DictReader(lines(), fieldnames=header):
+        yield row, position['end']
+
+
+def iter_ndjson(file, offset=0):
+    """Построчно читает выгрузку в формате JSON Lines из бинарного файла.
+    Возвращает пары (запись, байтовая позиция после нее)."""
+    for line, end in _lines(file, offset):
+        if line.strip():
+            yield json.loads(line), end
+
+
+def iter_json_array(file, offset=0):
+    """Потоково читает JSON массив объектов из бинарного файла, не загружая
+    файл целиком. Если массив вложен в объект (например {"dishes": [...]}),
+    читается первый массив файла. Возвращает пары (запись, байтовая позиция
+    после нее); ненулевой offset указывает внутрь массива."""
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    file.seek(offset)
+    buf = ''
+    eof = False
+    if not offset:
+        while '[' not in buf:
+            chunk = file.read(READ_SIZE)
+            if not chunk:
+                return
+            buf += utf8.decode(chunk)
+        offset = len(buf[:buf.index('[') + 1].encode('utf-8'))
+        buf = buf[buf.index('[') + 1:]
+    while True:
+        stripped = buf.lstrip(' \t\r\n,')
+        offset += len(buf) - len(stripped)
+        buf = stripped
+        if buf.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buf)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(READ_SIZE)
+            eof = not chunk
+            buf += utf8.decode(chunk, final=eof)
+            continue
+        offset += len(buf[:end].encode('utf-8'))
+        yield item, offset
+        buf = buf[end:]
+
+
+DUMP_READERS = {'csv': iter_csv, 'ndjson': iter_ndjson, 'jsonl': iter_ndjson,
+                'json': iter_json_array}
+
+
+def copy_rows(model, rows):
+    """Загружает строки в справочник через COPY во временную таблицу и
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING. Только для PostgreSQL.
+    Возвращает id вставленных строк."""
+    meta = model._meta  # pylint: disable=protected-access
+    quote = connection.ops.quote_name
+    columns = ', '.join(quote(meta.get_field(i).column) for i in IMPORT_FIELDS)
+    buf = io.StringIO()
+    csv.writer(buf).writerows(rows)
+    buf.seek(0)
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TEMP TABLE directory_import AS '
+                       f'SELECT {columns} FROM {quote(meta.db_table)} WITH NO DATA')
+        copy_sql = f'COPY directory_import ({columns}) FROM STDIN WITH (FORMAT csv)'
+        raw = cursor.cursor
+        if hasattr(raw, 'copy_expert'):
+            raw.copy_expert(copy_sql, buf)
+        else:
+            with raw.copy(copy_sql) as copy:
+                copy.write(buf.getvalue())
+        cursor.execute(f'INSERT INTO {quote(meta.db_table)} ({columns}) '
+                       f'SELECT {columns} FROM directory_import '
+                       f'ON CONFLICT ({quote(meta.get_field("name").column)}) DO NOTHING '
+                       f'RETURNING {quote(meta.pk.column)}')
+        inserted = [row[0] for row in cursor.fetchall()]
+        cursor.execute('DROP TABLE directory_import')
+    return inserted
+
+
+def load_rows(model, rows):
+    """Загружает подготовленные prepare_rows строки в справочник, пропуская
+    существующие названия: COPY на PostgreSQL, bulk_create на остальных СУБД.
+    Загруженные записи отмечаются в журнале изменений справочников."""
+    if connection.vendor == 'postgresql':
+        ids = copy_rows(model, rows)
+    else:
+        model.objects.bulk_create([model(**dict(zip(IMPORT_FIELDS, row)))\
+            for row in rows], batch_size=BATCH_SIZE, ignore_conflicts=True)
+        names = [row[0] for row in rows]
+        ids = []
+        for start in range(0, len(names), BATCH_SIZE):
+            ids.extend(model.objects.filter(name__in=names[start:start + BATCH_SIZE])\
+                .values_list('id', flat=True))
+    record(MODEL_KINDS[model], ids)
@@ -0,0 +1,173 @@
+"""Модуль потоковой выгрузки статистики пользователя за период.
+
+Строки читаются из БД курсором по CHUNK_SIZE (queryset.iterator) и сразу
+отправляются клиенту фрагментами по FLUSH_ROWS строк через
+StreamingHttpResponse, поэтому память процесса не зависит от длины
+периода, а первые байты уходят клиенту до чтения всей выборки.
+
+Модуль не зависит от reportlab: построение PDF (diary.reports) импортируется
+только при первом запросе PDF отчета."""
+import csv
+import io
+import json
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from diary.models import UserFoodDay, UserStat
+
+STREAM_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+STAT_REPORT = 'stat'
+FOOD_REPORT = 'food'
+PERIOD_REPORTS = (STAT_REPORT, FOOD_REPORT)
+PERIOD_FILENAMES = {
+    (STAT_REPORT, 'csv'): 'calories_stat',
+    (STAT_REPORT, 'pdf'): 'calories_stat',
+    (FOOD_REPORT, 'csv'): 'userfoodday_stat',
+    (FOOD_REPORT, 'pdf'): 'food_stat',
+}
+
+
+class ReportTooLarge(Exception):
+    """Число строк отчета превышает MAX_ROWS."""
+
+
+def check_row_limit(count):
+    """Проверяет, что отчет из count строк не превышает MAX_ROWS."""
+    limit = settings.DIARY_REPORTS['MAX_ROWS']
+    if count > limit:
+        raise ReportTooLarge(f'report has {count} rows, the limit is {limit}, '
+                             'narrow the period or use the csv export')
+
+
+def iter_rows(queryset, *fields):
+    """Читает кортежи полей выборки курсором по CHUNK_SIZE строк."""
+    return queryset.values_list(*fields).iterator(\
+        chunk_size=settings.DIARY_EXPORT['CHUNK_SIZE'])
+
+
+def _flush(lines):
+    """Склеивает строки выгрузки во фрагменты по FLUSH_ROWS строк."""
+    flush_rows = settings.DIARY_EXPORT['FLUSH_ROWS']
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= flush_rows:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def iter_csv(header, rows):
+    """Строки CSV выгрузки: заголовок отдельным фрагментом, затем данные."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(header)
+    yield buf.getvalue()
+
+    def lines():
+        for row in rows:
+            buf.seek(0)
+            buf.truncate()
+            writer.writerow(row)
+            yield buf.getvalue()
+    yield from _flush(lines())
+
+
+def _dumps(fields, row):
+    """Сериализует строку выгрузки в JSON объект."""
+    return json.dumps(dict(zip(fields, row)), cls=DjangoJSONEncoder, ensure_ascii=False)
+
+
+def iter_ndjson(fields, rows):
+    """Строки выгрузки в формате JSON Lines: один объект на строку."""
+    return _flush(f'{_dumps(fields, row)}\n' for row in rows)
+
+
+def iter_json_array(fields, rows):
+    """JSON массив объектов, отправляемый по частям."""
+    yield '['
+    yield from _flush(f'{"," if index else ""}{_dumps(fields, row)}'\
+        for index, row in enumerate(rows))
+    yield ']'
+
+
+def stream_response(stream_format, fields, rows, filename, header=None):
+    """Потоковый ответ с выгрузкой rows в формате stream_format.
+    fields - ключи объектов JSON, header - заголовок CSV (по умолчанию fields).
+    CSV отдается вложением с именем filename."""
+    if stream_format == 'csv':
+        response = StreamingHttpResponse(iter_csv(header or fields, rows),\
+            content_type=STREAM_FORMATS['csv'])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    content = iter_ndjson(fields, rows) if stream_format == 'ndjson'\
+        else iter_json_array(fields, rows)
+    return StreamingHttpResponse(content, content_type=STREAM_FORMATS[stream_format])
+
+
+def period_queryset(report, user, date_start, date_end):
+    """Выборка отчета за период: статистика UserStat или блюда UserFoodDay."""
+    if report == STAT_REPORT:
+        return UserStat.objects.filter(date__range=(date_start, date_end), user=user)
+    return UserFoodDay.objects.filter(date__range=(date_start, date_end), user=user)
+
+
+def period_filename(report, extension, date_start, date_end):
+    """Имя файла выгрузки или отчета за период."""
+    prefix = PERIOD_FILENAMES[report, extension]
+    return f'{prefix}_for_period_{date_start}-{date_end}.{extension}'
+
+
+def period_json(report, user, result):
+    """Ключи и строки JSON выгрузки за период, совпадающие с полями
+    сериализаторов обычного ответа API."""
+    result = result.order_by('date', 'id')
+    if report == STAT_REPORT:
+        return ('id', 'user', 'date', 'calories_burned'), ((i, user.id, date, calories)\
+            for i, date, calories in iter_rows(result, 'id', 'date', 'calories_burned'))
+    fields = ('id', 'food', 'user', 'date', 'name', 'gram', 'caloric', 'fat', 'protein', 'carbon')
+    return fields, iter_rows(result, *fields)
+
+
+def period_columns(report, result):
+    """Колоночное представление отчета за период: параллельные массивы
+    значений, прочитанные values_list без сериализаторов DRF."""
+    result = result.order_by('date', 'id')
+    if report == STAT_REPORT:
+        names = ('dates', 'calories', 'fat', 'protein', 'carbon')
+        fields = ('date', 'calories_burned', 'fat_burned', 'protein_burned', 'carbon_burned')
+    else:
+        names = ('dates', 'food', 'names', 'grams', 'calories', 'fat', 'protein', 'carbon')
+        fields = ('date', 'food', 'name', 'gram', 'caloric', 'fat', 'protein', 'carbon')
+    columns = list(zip(*result.values_list(*fields))) or [()] * len(fields)
+    columns[0] = [i.isoformat() for i in columns[0]]
+    return dict(zip(names, columns))
+
+
+def period_csv(report, user, result):
+    """Заголовок и строки CSV выгрузки за период."""
+    result = result.order_by('date', 'id')
+    if report == FOOD_REPORT:
+        return ['id', 'food id', 'username', 'date', 'name of food', 'gram', 'caloric', 'fat',\
+            'protein', 'carbon'], ((i, food, user, *rest) for i, food, *rest in\
+            iter_rows(result, 'id', 'food', 'date', 'name', 'gram', 'caloric', 'fat', 'protein',\
+            'carbon'))
+    header = ['id', 'user', 'date', 'calories_burned', 'fat_burned', 'protein_burned',\
+        'carbon_burned']
+    rows = ((i, user, date, *counters) for i, date, *counters in iter_rows(result,\
+        'id', 'date', 'calories_burned', 'fat_burned', 'protein_burned', 'carbon_burned'))
+    if user.recommended_calories:
+        header.append('balance')
+        rows = (row + (user.recommended_calories - row[3],) for row in rows)
+    return header, rows
+
+
+def write_csv(file, header, rows):
+    """Записывает CSV выгрузку в бинарный файл фрагментами."""
+    for chunk in iter_csv(header, rows):
+        file.write(chunk.encode())
@@ -0,0 +1,215 @@
+"""Модуль очереди фоновых задач в БД.
+
+Задачи хранятся в таблице Job и выполняются командой manage.py run_jobs,
+поэтому очереди нужна только основная БД (PostgreSQL или SQLite), без
+брокера. Задача захватывается условным UPDATE ... WHERE status = ...:
+из нескольких воркеров его выполнит только один. Ошибка задачи повторяется
+с экспоненциальной задержкой до max_attempts попыток, JobFailed завершает
+задачу сразу. Пока задача выполняется, воркер каждые HEARTBEAT_INTERVAL
+секунд обновляет locked_at, а задачи воркера, пропавшего дольше
+LOCK_TIMEOUT, снова ставятся в очередь. Результат задачи (файл) сохраняется в ARTIFACT_DIR
+и удаляется вместе с задачей через ARTIFACT_TTL."""
+import io
+import os
+import shutil
+import socket
+import threading
+import traceback
+import uuid
+from collections import namedtuple
+from datetime import timedelta
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+from diary.exports import PERIOD_REPORTS, ReportTooLarge, period_csv, period_filename,\
+    period_queryset, write_csv
+from diary.models import Job, UserBase
+
+Artifact = namedtuple('Artifact', ('name', 'content_type', 'file'))
+HANDLERS = {}
+COMMANDS = ('import_directory', 'rebuild_userstat', 'backfill_rollups')
+
+
+class JobFailed(Exception):
+    """Ошибка задачи, при которой повторять ее бессмысленно."""
+
+
+def register(kind):
+    """Декоратор регистрации обработчика задач вида kind. Обработчик получает
+    параметры задачи и возвращает Artifact или None."""
+    def decorator(func):
+        HANDLERS[kind] = func
+        return func
+    return decorator
+
+
+def enqueue(kind, params, user=None, max_attempts=None, delay=0):
+    """Ставит задачу в очередь."""
+    if kind not in HANDLERS:
+        raise ValueError(f'Unknown job kind "{kind}"')
+    return Job.objects.create(kind=kind, params=params, user=user,\
+        max_attempts=max_attempts or settings.DIARY_JOBS['MAX_ATTEMPTS'],\
+        run_after=timezone.now() + timedelta(seconds=delay))
+
+
+def claim(worker, kinds=None):
+    """Захватывает первую готовую к выполнению задачу для воркера worker.
+    Возвращает задачу или None, если очередь пуста."""
+    now = timezone.now()
+    candidates = Job.objects.filter(status=Job.QUEUED, run_after__lte=now)
+    if kinds:
+        candidates = candidates.filter(kind__in=kinds)
+    for job_id in candidates.order_by('run_after', 'id').values_list('id', flat=True)[:10]:
+        if Job.objects.filter(id=job_id, status=Job.QUEUED).update(status=Job.RUNNING,\
+                locked_by=worker, locked_at=now, attempts=F('attempts') + 1):
+            return Job.objects.get(id=job_id)
+    return None
+
+
+def run(job):
+    """Выполняет захваченную задачу и записывает результат. Состояние
+    обновляется только если задача все еще захвачена этим воркером."""
+    finished = {'locked_by': '', 'locked_at': None}
+    try:
+        handler = HANDLERS.get(job.kind)
+        if handler is None:
+            raise JobFailed(f'Unknown job kind "{job.kind}"')
+        artifact = with_heartbeat(job, handler, job.params)
+    except Exception as error:  # pylint: disable=broad-exception-caught
+        finished['error'] = ''.join(traceback.format_exception_only(type(error), error)).strip()
+        if isinstance(error, JobFailed) or job.attempts >= job.max_attempts:
+            finished.update(status=Job.FAILED, finished_at=timezone.now())
+        else:
+            delay = settings.DIARY_JOBS['RETRY_DELAY'] * 2 ** (job.attempts - 1)
+            finished.update(status=Job.QUEUED, run_after=timezone.now() + timedelta(seconds=delay))
+    else:
+        finished.update(status=Job.DONE, finished_at=timezone.now(), error='')
+        if artifact is not None:
+            finished.update(artifact=save_artifact(job, artifact), artifact_name=artifact.name,\
+                content_type=artifact.content_type)
+    Job.objects.filter(id=job.id, status=Job.RUNNING, locked_by=job.locked_by).update(**finished)
+
+
+def heartbeat(job, stop):
+    """Обновляет locked_at задачи каждые HEARTBEAT_INTERVAL секунд, пока не
+    установлен stop, чтобы maintain() не вернул долгую задачу в очередь."""
+    try:
+        while not stop.wait(settings.DIARY_JOBS['HEARTBEAT_INTERVAL']):
+            Job.objects.filter(id=job.id, status=Job.RUNNING, locked_by=job.locked_by)\
+                .update(locked_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def with_heartbeat(job, func, *args):
+    """Выполняет func(*args), обновляя locked_at задачи в отдельном потоке."""
+    stop = threading.Event()
+    beat = threading.Thread(target=heartbeat, args=(job, stop), daemon=True)
+    beat.start()
+    try:
+        return func(*args)
+    finally:
+        stop.set()
+        beat.join()
+
+
+def save_artifact(job, artifact):
+    """Сохраняет файл результата задачи в ARTIFACT_DIR, возвращает имя файла."""
+    directory = settings.DIARY_JOBS['ARTIFACT_DIR']
+    os.makedirs(directory, exist_ok=True)
+    name = f'{job.id}-{uuid.uuid4().hex}{os.path.splitext(artifact.name)[1]}'
+    with artifact.file as source, open(os.path.join(directory, name), 'wb') as target:
+        source.seek(0)
+        shutil.copyfileobj(source, target)
+    return name
+
+
+def artifact_path(job):
+    """Полный путь к файлу результата задачи."""
+    return os.path.join(settings.DIARY_JOBS['ARTIFACT_DIR'], job.artifact)
+
+
+def maintain():
+    """Возвращает в очередь задачи пропавших воркеров (или завершает их,
+    если попытки исчерпаны) и удаляет устаревшие задачи с результатами."""
+    now = timezone.now()
+    stale = Q(status=Job.RUNNING, locked_at__lt=now - timedelta(\
+        seconds=settings.DIARY_JOBS['LOCK_TIMEOUT']))
+    Job.objects.filter(stale, attempts__lt=F('max_attempts')).update(status=Job.QUEUED,\
+        locked_by='', locked_at=None, run_after=now)
+    Job.objects.filter(stale).update(status=Job.FAILED, locked_by='', locked_at=None,\
+        finished_at=now, error='worker lost')
+    expired = Job.objects.filter(status__in=(Job.DONE, Job.FAILED),\
+        finished_at__lt=now - timedelta(seconds=settings.DIARY_JOBS['ARTIFACT_TTL']))
+    for job in expired.exclude(artifact='').only('id', 'artifact').iterator():
+        if os.path.exists(artifact_path(job)):
+            os.remove(artifact_path(job))
+    expired.delete()
+
+
+def worker_name():
+    """Уникальное имя воркера: хост, процесс и поток."""
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+def work(stop, once=False, kinds=None):
+    """Цикл воркера: захватывает и выполняет задачи, пока не установлен stop.
+    При once завершается, когда готовых задач не осталось."""
+    worker = worker_name()
+    try:
+        maintain()
+        while not stop.is_set():
+            job = claim(worker, kinds)
+            if job is not None:
+                run(job)
+                continue
+            if once:
+                return
+            stop.wait(settings.DIARY_JOBS['POLL_INTERVAL'])
+            maintain()
+    finally:
+        connection.close()
+
+
+@register('period_report')
+def period_report(params):
+    """Отчет за период: PDF или CSV выгрузка статистики либо блюд пользователя.
+    Параметры: report (stat, food), format (pdf, csv), user, date_start, date_end."""
+    report, extension = params['report'], params['format']
+    if report not in PERIOD_REPORTS or extension not in ('pdf', 'csv'):
+        raise JobFailed(f'Unknown report {report}.{extension}')
+    try:
+        user = UserBase.objects.get(id=params['user'])
+    except UserBase.DoesNotExist as error:
+        raise JobFailed(f'User {params["user"]} not found') from error
+    result = period_queryset(report, user, params['date_start'], params['date_end'])
+    name = period_filename(report, extension, params['date_start'], params['date_end'])
+    if extension == 'pdf':
+        from diary.reports import period_pdf  # pylint: disable=import-outside-toplevel
+        try:
+            return Artifact(name, 'application/pdf',\
+                period_pdf(report, user, result, params['date_start'], params['date_end']))
+        except ReportTooLarge as error:
+            raise JobFailed(str(error)) from error
+    file = io.BytesIO()
+    write_csv(file, *period_csv(report, user, result))
+    return Artifact(name, 'text/csv', file)
+
+
+@register('command')
+def command(params):
+    """Команда manage.py из COMMANDS (загрузка справочника, пересчет
+    статистики). Параметры: command, args, options. Результат - вывод команды."""
+    if params.get('command') not in COMMANDS:
+        raise JobFailed(f'Command {params.get("command")} is not allowed')
+    out = io.StringIO()
+    try:
+        call_command(params['command'], *params.get('args', []), stdout=out,\
+            **params.get('options', {}))
+    except CommandError as error:
+        raise JobFailed(f'{error}\n{out.getvalue()}') from error
+    return Artifact(f'{params["command"]}.log', 'text/plain',\
+        io.BytesIO(out.getvalue().encode()))
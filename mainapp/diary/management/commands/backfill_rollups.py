@@ -0,0 +1,28 @@
+"""Команда заполнения сумм статистики за недели и месяцы по UserStat."""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from diary.rollups import lock_users, refresh_users
+from diary.stats import user_ranges
+
+
+class Command(BaseCommand):
+    """Пересчитывает UserStatRollup по UserStat пачками пользователей:
+    первичное заполнение после миграции или восстановление после
+    правки UserStat в обход diary.stats."""
+    help = 'Backfill weekly and monthly UserStatRollup sums from UserStat'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only this user id')
+        parser.add_argument('--date-start', help='First date yyyy-mm-dd')
+        parser.add_argument('--date-end', help='Last date yyyy-mm-dd')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Users per aggregation statement')
+
+    def handle(self, *args, **options):
+        written = 0
+        for users in user_ranges(options['chunk_size'], options['user']):
+            with transaction.atomic():
+                lock_users(users)
+                written += refresh_users(users, options['date_start'], options['date_end'])
+            self.stdout.write(f'users {users[0]}-{users[1]}: {written} periods written')
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {written} weekly and monthly periods'))
@@ -0,0 +1,71 @@
+"""Команда замера времени импорта приложения при запуске процесса."""
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SCRIPT = 'import django; django.setup(); import importlib; importlib.import_module({!r})'
+
+
+def import_times(module):
+    """Импортирует module в новом процессе под python -X importtime.
+    Возвращает словарь {модуль: (собственное, накопленное время в мс)}."""
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE',\
+        'mainapp.settings'))
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', SCRIPT.format(module)],\
+        cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=False)
+    if process.returncode:
+        raise CommandError(f'import of {module} failed:\n{process.stderr[-2000:]}')
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        times[name.strip()] = (int(own) / 1000, int(cumulative) / 1000)
+    return times
+
+
+class Command(BaseCommand):
+    """Замеряет время импорта URLconf вместе с django.setup(), как при
+    запуске воркера, команды manage.py или тестов. Каждый замер - новый
+    процесс. Завершается с ошибкой, если лучший замер превышает бюджет
+    IMPORT_BUDGET_MS или при запуске импортируются модули из LAZY_MODULES."""
+    help = 'Benchmark cold import time of the project with python -X importtime'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default=settings.ROOT_URLCONF,
+                            help='Module to import after django.setup()')
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=15,
+                            help='Slowest modules to print by cumulative time')
+        parser.add_argument('--budget-ms', type=float,
+                            default=settings.DIARY_STARTUP['IMPORT_BUDGET_MS'])
+        parser.add_argument('--lazy-modules', nargs='*',
+                            default=settings.DIARY_STARTUP['LAZY_MODULES'],
+                            help='Modules that must not be imported at startup')
+
+    def handle(self, *args, **options):
+        totals = []
+        cumulative = defaultdict(list)
+        for _ in range(options['runs']):
+            times = import_times(options['module'])
+            totals.append(sum(own for own, _ in times.values()))
+            for name, (_, total) in times.items():
+                cumulative[name].append(total)
+        self.stdout.write(f'{"cumulative ms":>14}  module')
+        slowest = sorted(cumulative.items(), key=lambda i: -statistics.median(i[1]))
+        for name, values in slowest[:options['top']]:
+            self.stdout.write(f'{statistics.median(values):>14.1f}  {name}')
+        best = min(totals)
+        self.stdout.write(f'import time of {options["module"]}: best {best:.0f} ms, '
+                          f'median {statistics.median(totals):.0f} ms over {len(totals)} runs')
+        eager = [i for i in options['lazy_modules'] if i in cumulative]
+        if eager:
+            raise CommandError(f'{", ".join(eager)} imported at startup, import lazily')
+        if best > options['budget_ms']:
+            raise CommandError(f'import time {best:.0f} ms exceeds the budget '
+                               f'{options["budget_ms"]:.0f} ms')
+        self.stdout.write(self.style.SUCCESS(f'Within the budget of {options["budget_ms"]:.0f} ms'))
@@ -0,0 +1,85 @@
+"""Команда замера времени и памяти построения PDF отчетов."""
+import datetime
+import io
+import resource
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from django.core.management.base import BaseCommand
+from reportlab.lib import colors
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Table
+from diary.reports import build_report, report_styles
+
+HEADER = ('id', 'food id', 'user', 'date', 'food name', 'caloric', 'fat', 'protein', 'carbon')
+WIDTHS = [0.08, 0.08, 0.13, 0.11, 0.28, 0.08, 0.08, 0.08, 0.08]
+
+
+def synthetic_rows(count):
+    """Строки отчета о блюдах за период, похожие на реальные."""
+    start = datetime.date(2020, 1, 1)
+    for i in range(count):
+        yield (i, i % 500, 'benchmark_user', start + datetime.timedelta(days=i // 8),\
+            f'Блюдо номер {i % 500}', 100 + i % 700, i % 40, i % 60, i % 90)
+
+
+def _rss_kb():
+    """Текущий RSS процесса в килобайтах."""
+    with open('/proc/self/statm', encoding='ascii') as file:
+        return int(file.read().split()[1]) * resource.getpagesize() // 1024
+
+
+def render_legacy(count):
+    """Прежний способ: одна таблица Table с Paragraph в каждой строке."""
+    styles, _ = report_styles()
+    with io.BytesIO() as file:
+        doc = SimpleDocTemplate(file, rightMargin=0, leftMargin=6.5, topMargin=0.3,\
+            bottomMargin=0)
+        data = [HEADER] + [(*row[:4], Paragraph(row[4], styles['Normal']), *row[5:])\
+            for row in synthetic_rows(count)]
+        doc.build([Table(data, hAlign='CENTER',\
+            style=[('GRID', (0, 0), (-1, -1), 0.25, colors.black)])])
+        return file.tell()
+
+
+def render_chunked(count):
+    """Построение отчета через diary.reports."""
+    with build_report(['Benchmark report'], HEADER, synthetic_rows(count), WIDTHS) as file:
+        file.seek(0, 2)
+        return file.tell()
+
+
+def measure(engine, count):
+    """Строит отчет в отдельном процессе и возвращает время, прирост пикового
+    RSS в мегабайтах и размер документа в килобайтах."""
+    report_styles()
+    before = _rss_kb()
+    started = time.perf_counter()
+    size = ENGINES[engine](count)
+    elapsed = time.perf_counter() - started
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, max(peak - before, 0) / 1024, size / 1024
+
+
+ENGINES = {'chunked': render_chunked, 'legacy': render_legacy}
+
+
+class Command(BaseCommand):
+    """Замеряет время построения и пиковую память PDF отчета о блюдах
+    в зависимости от числа строк. Каждый замер выполняется в новом
+    процессе, чтобы пиковый RSS не накапливался между замерами."""
+    help = 'Benchmark PDF report render time and peak RSS against row count'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 5000, 20000])
+        parser.add_argument('--legacy', action='store_true',
+                            help='Also measure the previous single Table layout')
+
+    def handle(self, *args, **options):
+        engines = ['chunked', 'legacy'] if options['legacy'] else ['chunked']
+        self.stdout.write(f'{"engine":<8} {"rows":>8} {"seconds":>9} {"peak MB":>9} {"KB":>8}')
+        for count in options['rows']:
+            for engine in engines:
+                with ProcessPoolExecutor(1, mp_context=get_context('fork')) as pool:
+                    elapsed, peak, size = pool.submit(measure, engine, count).result()
+                self.stdout.write(f'{engine:<8} {count:>8} {elapsed:>9.2f} {peak:>9.1f} '
+                                  f'{size:>8.0f}')
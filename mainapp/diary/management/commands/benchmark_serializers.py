@@ -0,0 +1,82 @@
+"""Команда замера построения JSON ответов списочных представлений."""
+import datetime
+import time
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from diary.api.renderers import FastJSONRenderer, orjson
+from diary.api.rows import FOOD_DAY_FIELDS, SEARCH_FOOD_FIELDS, STAT_PERIOD_FIELDS,\
+    object_rows, queryset_rows
+from diary.api.serializers import SearchFoodSerializer, UserFoodDaySerializer,\
+    UserStatForPeriodSerializer
+from diary.models import DirectoryFood, UserBase, UserFoodDay, UserStat
+
+
+def fill(count):
+    """Создает пользователя с count блюдами и count днями статистики."""
+    user = UserBase.objects.create(username='benchmark_serializers',\
+        email='benchmark_serializers@example.com')
+    foods = DirectoryFood.objects.bulk_create([DirectoryFood(name=f'Бенчмарк {i}',\
+        caloric=100 + i % 700, fat=i % 40, carbon=i % 90, protein=i % 60)\
+        for i in range(min(count, 500))])
+    start = datetime.date(2000, 1, 1)
+    UserFoodDay.objects.bulk_create([UserFoodDay(user=user, food=food,\
+        date=start + datetime.timedelta(days=i // 8), **UserFoodDay.snapshot(food))\
+        for i, food in ((i, foods[i % len(foods)]) for i in range(count))], batch_size=1000)
+    UserStat.objects.bulk_create([UserStat(user=user, date=start + datetime.timedelta(days=i),\
+        calories_burned=i % 3000) for i in range(count)], batch_size=1000)
+    return user
+
+
+def cases(user):
+    """Пары построения ответа (сериализатор, быстрый путь) по представлениям."""
+    food_day = UserFoodDay.objects.filter(user=user)
+    stat = UserStat.objects.filter(user=user)
+    foods = list(DirectoryFood.objects.filter(name__startswith='Бенчмарк'))
+    return {
+        'food search': (lambda: SearchFoodSerializer(foods, many=True).data,\
+            lambda: object_rows(foods, SEARCH_FOOD_FIELDS)),
+        'food for period': (lambda: UserFoodDaySerializer(food_day, many=True).data,\
+            lambda: queryset_rows(food_day, FOOD_DAY_FIELDS)),
+        'stat for period': (lambda: UserStatForPeriodSerializer(stat, many=True).data,\
+            lambda: queryset_rows(stat, STAT_PERIOD_FIELDS)),
+    }
+
+
+def best_of(runs, build, renderer):
+    """Лучшее время построения и кодирования ответа и сам ответ."""
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        content = renderer.render(build())
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000, content
+
+
+class Command(BaseCommand):
+    """Сравнивает прежний путь (ModelSerializer и JSONRenderer) с быстрым
+    (values_list в словари и FastJSONRenderer) на синтетических данных.
+    Данные создаются в транзакции, которая затем откатывается."""
+    help = 'Benchmark ModelSerializer against the values() read path on list endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stdout.write(self.style.WARNING('orjson is not installed, '
+                                                 'FastJSONRenderer falls back to JSONRenderer'))
+        with transaction.atomic():
+            user = fill(options['rows'])
+            self.stdout.write(f'{"endpoint":<16} {"rows":>7} {"serializer ms":>14} '
+                              f'{"fast ms":>8} {"speedup":>8}')
+            for name, (slow, fast) in cases(user).items():
+                slow_ms, slow_content = best_of(options['runs'], slow, JSONRenderer())
+                fast_ms, fast_content = best_of(options['runs'], fast, FastJSONRenderer())
+                if slow_content != fast_content:
+                    self.stdout.write(self.style.ERROR(f'{name}: responses differ'))
+                rows = len(fast())
+                self.stdout.write(f'{name:<16} {rows:>7} {slow_ms:>14.1f} {fast_ms:>8.1f} '
+                                  f'{slow_ms / fast_ms:>7.1f}x')
+            transaction.set_rollback(True)
@@ -0,0 +1,65 @@
+"""Команда запуска локальной заглушки API DietaGram."""
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from diary.dietagram.client import DietaGramClient, DietaGramError
+from diary.dietagram.stub import make_stub_server, start_stub_server
+
+
+class Command(BaseCommand):
+    """Запускает заглушку API DietaGram. С параметром --load вместо
+    обслуживания запросов прогоняет через клиент нагрузочный тест."""
+    help = 'Run a local DietaGram API stub, optionally load-testing the client against it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8010)
+        parser.add_argument('--latency', type=float, default=0.0,
+                            help='Response delay in seconds')
+        parser.add_argument('--error-rate', type=float, default=0.0,
+                            help='Share of requests answered with 503')
+        parser.add_argument('--load', type=int, default=0,
+                            help='Number of client requests to send instead of serving')
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--rate', type=float,
+                            help='Override DIETAGRAM RATE/BURST for the load test')
+
+    def handle(self, *args, **options):
+        stub = {'latency': options['latency'], 'error_rate': options['error_rate']}
+        if not options['load']:
+            server = make_stub_server(options['host'], options['port'], **stub)
+            self.stdout.write(f'DietaGram stub on http://{options["host"]}:'
+                              f'{server.server_address[1]}/apiFood.php')
+            server.serve_forever()
+            return
+        server, url = start_stub_server(host=options['host'], **stub)
+        client_options = dict(settings.DIETAGRAM)
+        if options['rate']:
+            client_options.update(RATE=options['rate'], BURST=options['rate'])
+        client = DietaGramClient(url, {}, client_options)
+
+        def call(i):
+            started = time.perf_counter()
+            try:
+                client.search(f'dish {i % 100}', 'en')
+                outcome = 'ok'
+            except DietaGramError as error:
+                outcome = f'{type(error).__name__}: {error}'
+            return outcome, time.perf_counter() - started
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(options['concurrency']) as pool:
+            results = list(pool.map(call, range(options['load'])))
+        elapsed = time.perf_counter() - started
+        server.shutdown()
+        outcomes = Counter(outcome for outcome, _ in results)
+        latencies = sorted(latency for _, latency in results)
+        for quantile in (0.5, 0.95, 0.99):
+            value = latencies[min(len(latencies) - 1, int(len(latencies) * quantile))]
+            self.stdout.write(f'p{int(quantile * 100)}: {value * 1000:.2f} ms')
+        self.stdout.write(f'{options["load"] / elapsed:.1f} requests/s, breaker '
+                          f'{client.breaker.state}')
+        for outcome, count in outcomes.most_common():
+            self.stdout.write(f'{outcome}: {count}')
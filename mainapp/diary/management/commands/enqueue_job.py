@@ -0,0 +1,25 @@
+"""Команда постановки фоновой задачи в очередь."""
+import json
+from django.core.management.base import BaseCommand, CommandError
+from diary.jobs import HANDLERS, enqueue
+
+
+class Command(BaseCommand):
+    """Ставит задачу в очередь Job, например пересчет статистики:
+    enqueue_job command --params '{"command": "rebuild_userstat"}'."""
+    help = 'Put a background job into the Job queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=sorted(HANDLERS))
+        parser.add_argument('--params', default='{}', help='Job parameters as JSON object')
+        parser.add_argument('--max-attempts', type=int)
+        parser.add_argument('--delay', type=int, default=0, help='Seconds before the first run')
+
+    def handle(self, *args, **options):
+        try:
+            params = json.loads(options['params'])
+        except json.JSONDecodeError as error:
+            raise CommandError(f'--params is not valid JSON: {error}') from error
+        job = enqueue(options['kind'], params, max_attempts=options['max_attempts'],\
+            delay=options['delay'])
+        self.stdout.write(self.style.SUCCESS(f'Queued job {job.id}'))
@@ -0,0 +1,84 @@
+"""Команда массовой загрузки выгрузки в справочник блюд или ингредиентов."""
+import json
+import os
+import time
+from itertools import islice
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from diary.directory import DUMP_READERS, load_rows, prepare_rows
+from diary.models import DirectoryFood, DirectoryIngredients
+
+MODELS = {'food': DirectoryFood, 'ingredients': DirectoryIngredients}
+
+
+class Command(BaseCommand):
+    """Потоково загружает JSON/JSON Lines/CSV выгрузку в справочник пачками.
+    После каждой пачки сохраняет контрольную точку с байтовой позицией в
+    файле, поэтому прерванная загрузка продолжается повторным запуском той же
+    команды с этой позиции, без повторного разбора загруженных записей."""
+    help = 'Stream a JSON/NDJSON/CSV dump into DirectoryFood or DirectoryIngredients'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Dump file')
+        parser.add_argument('--model', choices=sorted(MODELS), default='food')
+        parser.add_argument('--format', choices=sorted(DUMP_READERS),
+                            help='Dump format, by default taken from the file extension')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--checkpoint', help='Checkpoint file, default <path>.checkpoint')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore an existing checkpoint and start from the beginning')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        dump_format = options['format'] or os.path.splitext(path)[1].lstrip('.').lower()
+        if dump_format not in DUMP_READERS:
+            raise CommandError(f'Unknown dump format "{dump_format}", use --format')
+        model = MODELS[options['model']]
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        done, offset = (0, 0) if options['restart'] else self.read_checkpoint(checkpoint, path)
+        if done:
+            self.stdout.write(f'Resuming after {done} records')
+        started = time.perf_counter()
+        processed = 0
+        with open(path, 'rb') as file:
+            records = DUMP_READERS[dump_format](file, offset)
+            while True:
+                chunk = list(islice(records, options['chunk_size']))
+                if not chunk:
+                    break
+                with transaction.atomic():
+                    load_rows(model, prepare_rows(item for item, _ in chunk))
+                processed += len(chunk)
+                offset = chunk[-1][1]
+                self.write_checkpoint(checkpoint, path, done + processed, offset)
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'{done + processed} records, '
+                                  f'{processed / elapsed:.0f} rows/s')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {processed} records into {model.__name__} '
+            f'in {time.perf_counter() - started:.1f}s'))
+
+    @staticmethod
+    def read_checkpoint(checkpoint, path):
+        """Возвращает число уже загруженных записей и байтовую позицию, с
+        которой продолжить чтение. Контрольная точка другого или измененного
+        файла, как и точка без позиции, игнорируется: загрузка начинается
+        сначала, а существующие названия пропускаются."""
+        if not os.path.exists(checkpoint):
+            return 0, 0
+        with open(checkpoint, encoding='utf-8') as file:
+            state = json.load(file)
+        if state.get('path') != os.path.abspath(path) or\
+                state.get('size') != os.path.getsize(path) or 'offset' not in state:
+            return 0, 0
+        return state['records'], state['offset']
+
+    @staticmethod
+    def write_checkpoint(checkpoint, path, records, offset):
+        """Атомарно сохраняет число загруженных записей и байтовую позицию
+        после последней из них."""
+        tmp = f'{checkpoint}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as file:
+            json.dump({'path': os.path.abspath(path), 'size': os.path.getsize(path),
+                       'records': records, 'offset': offset}, file)
+        os.replace(tmp, checkpoint)
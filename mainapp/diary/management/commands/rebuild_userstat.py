@@ -0,0 +1,50 @@
+"""Команда сверки и пересчета статистики UserStat по блюдам UserFoodDay."""
+from django.core.management.base import BaseCommand, CommandError
+from diary.stats import rebuild_stats, stat_mismatches, user_ranges
+
+
+class Command(BaseCommand):
+    """Пересчитывает дневную статистику пользователей по записям UserFoodDay
+    пачками пользователей. В режиме --verify только сообщает о расхождениях
+    и завершается с ошибкой, если они есть."""
+    help = 'Recompute UserStat daily totals from UserFoodDay or report mismatches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, help='Only this user id')
+        parser.add_argument('--date-start', help='First date yyyy-mm-dd')
+        parser.add_argument('--date-end', help='Last date yyyy-mm-dd')
+        parser.add_argument('--chunk-size', type=int, default=500,
+                            help='Users per aggregation statement')
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report mismatches, do not write')
+        parser.add_argument('--show', type=int, default=20,
+                            help='Max mismatches printed in --verify mode')
+
+    def handle(self, *args, **options):
+        window = (options['date_start'], options['date_end'])
+        if options['verify']:
+            self.verify(options, window)
+            return
+        repaired = zeroed = 0
+        for users in user_ranges(options['chunk_size'], options['user']):
+            chunk_repaired, chunk_zeroed = rebuild_stats(users, *window)
+            repaired += chunk_repaired
+            zeroed += chunk_zeroed
+            self.stdout.write(f'users {users[0]}-{users[1]}: {chunk_repaired} days rebuilt, '
+                              f'{chunk_zeroed} days zeroed')
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {repaired} days, zeroed {zeroed} days without food'))
+
+    def verify(self, options, window):
+        """Выводит расхождения статистики и завершается ошибкой, если они найдены."""
+        found = 0
+        for users in user_ranges(options['chunk_size'], options['user']):
+            for mismatch in stat_mismatches(users, *window):
+                found += 1
+                if found <= options['show']:
+                    self.stdout.write(f'user {mismatch["user"]} {mismatch["date"]}: '
+                                      f'stored {mismatch["stored"]}, '
+                                      f'expected {mismatch["expected"]}')
+        if found:
+            raise CommandError(f'{found} days of UserStat do not match UserFoodDay')
+        self.stdout.write(self.style.SUCCESS('UserStat matches UserFoodDay'))
@@ -0,0 +1,76 @@
+"""Команда запуска воркеров очереди фоновых задач."""
+import multiprocessing
+import signal
+import threading
+from django.conf import settings
+from django.db import connections
+from django.core.management.base import BaseCommand
+from diary.jobs import HANDLERS, work
+
+
+class Command(BaseCommand):
+    """Выполняет задачи из таблицы Job пулом потоков или процессов до
+    SIGTERM/SIGINT. С --once выполняет готовые задачи и завершается."""
+    help = 'Run background job workers over the Job table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, help='Worker count, default DIARY_JOBS WORKERS')
+        parser.add_argument('--mode', choices=('thread', 'process'),
+                            help='Worker pool, default DIARY_JOBS MODE')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when no job is ready instead of polling')
+        parser.add_argument('--kinds', nargs='+', choices=sorted(HANDLERS),
+                            help='Only run jobs of these kinds')
+
+    def handle(self, *args, **options):
+        workers = options['workers'] or settings.DIARY_JOBS['WORKERS']
+        mode = options['mode'] or settings.DIARY_JOBS['MODE']
+        once, kinds = options['once'], options['kinds']
+        if workers == 1:
+            stop = threading.Event()
+            previous = self.handle_signals(stop)
+            try:
+                work(stop, once, kinds)
+            finally:
+                self.restore_signals(previous)
+            return
+        if mode == 'process':
+            context = multiprocessing.get_context('fork')
+            stop = context.Event()
+            connections.close_all()
+            pool = [context.Process(target=self.child, args=(stop, once, kinds))\
+                for _ in range(workers)]
+        else:
+            stop = threading.Event()
+            pool = [threading.Thread(target=work, args=(stop, once, kinds))\
+                for _ in range(workers)]
+        previous = self.handle_signals(stop)
+        for worker in pool:
+            worker.start()
+        self.stdout.write(f'Started {workers} {mode} workers')
+        try:
+            for worker in pool:
+                worker.join()
+        finally:
+            self.restore_signals(previous)
+
+    @staticmethod
+    def child(stop, once, kinds):
+        """Воркер в дочернем процессе: останавливается по событию родителя,
+        а не по SIGINT, который терминал посылает всей группе процессов."""
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        work(stop, once, kinds)
+
+    @staticmethod
+    def handle_signals(stop):
+        """Останавливает воркеры после текущей задачи по SIGTERM и SIGINT.
+        Возвращает прежние обработчики сигналов."""
+        return {signum: signal.signal(signum, lambda *_: stop.set())\
+            for signum in (signal.SIGTERM, signal.SIGINT)}
+
+    @staticmethod
+    def restore_signals(previous):
+        """Восстанавливает обработчики сигналов после остановки воркеров."""
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
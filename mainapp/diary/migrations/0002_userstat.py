@@ -1,29 +1,29 @@
-# Generated by Django 4.2.9 on 2024-02-01 18:23
-
-import datetime
-from django.conf import settings
-from django.db import migrations, models
-import django.db.models.deletion
-
-
-class Migration(migrations.Migration):
-
-    dependencies = [
-        ('diary', '0001_initial'),
-    ]
-
-    operations = [
-        migrations.CreateModel(
-            name='UserStat',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('date', models.DateTimeField(default=datetime.datetime.now)),
-                ('calories_burned', models.IntegerField(default=0)),
-                ('callories_received', models.IntegerField(default=0)),
-                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
-            ],
-            options={
-                'verbose_name_plural': 'UserStat',
-            },
-        ),
-    ]
+# Generated by Django 4.2.9 on 2024-02-01 18:23
+
+import datetime
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateTimeField(default=datetime.datetime.now)),
+                ('calories_burned', models.IntegerField(default=0)),
+                ('callories_received', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'UserStat',
+            },
+        ),
+    ]
@@ -1,37 +1,37 @@
-# Generated by Django 4.2.9 on 2024-02-03 13:20
-
-from django.conf import settings
-from django.db import migrations, models
-import django.db.models.deletion
-
-
-class Migration(migrations.Migration):
-
-    dependencies = [
-        ('diary', '0003_directoryfood_remove_userstat_callories_received'),
-    ]
-
-    operations = [
-        migrations.AddField(
-            model_name='directoryfood',
-            name='user_create',
-            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
-        ),
-        migrations.AlterField(
-            model_name='userstat',
-            name='date',
-            field=models.DateField(auto_now_add=True),
-        ),
-        migrations.CreateModel(
-            name='UserFoodDay',
-            fields=[
-                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
-                ('date', models.DateField(auto_now_add=True)),
-                ('food', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='diary.directoryfood')),
-                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
-            ],
-            options={
-                'verbose_name_plural': 'UserFoodDay',
-            },
-        ),
-    ]
+# Generated by Django 4.2.9 on 2024-02-03 13:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0003_directoryfood_remove_userstat_callories_received'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='directoryfood',
+            name='user_create',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='userstat',
+            name='date',
+            field=models.DateField(auto_now_add=True),
+        ),
+        migrations.CreateModel(
+            name='UserFoodDay',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(auto_now_add=True)),
+                ('food', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='diary.directoryfood')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'UserFoodDay',
+            },
+        ),
+    ]
@@ -0,0 +1,77 @@
+"""Индексы полнотекстового поиска по справочнику блюд.
+
+На PostgreSQL создается GIN индекс pg_trgm над UPPER(name), на SQLite -
+теневая FTS5 таблица с триггерами синхронизации. Пересоздание таблицы
+diary_directoryfood на SQLite (AlterField и т.п.) удаляет триггеры,
+поэтому такие миграции должны заново вызывать create_search_index."""
+from django.db import migrations
+
+SQLITE_FORWARD = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS diary_directoryfood_fts USING fts5("
+    "name, content='diary_directoryfood', content_rowid='id', tokenize='trigram')",
+    "INSERT INTO diary_directoryfood_fts(diary_directoryfood_fts) VALUES('rebuild')",
+    "CREATE TRIGGER IF NOT EXISTS diary_directoryfood_fts_ai "
+    "AFTER INSERT ON diary_directoryfood BEGIN "
+    "INSERT INTO diary_directoryfood_fts(rowid, name) VALUES (new.id, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS diary_directoryfood_fts_ad "
+    "AFTER DELETE ON diary_directoryfood BEGIN "
+    "INSERT INTO diary_directoryfood_fts(diary_directoryfood_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS diary_directoryfood_fts_au "
+    "AFTER UPDATE OF name ON diary_directoryfood BEGIN "
+    "INSERT INTO diary_directoryfood_fts(diary_directoryfood_fts, rowid, name) "
+    "VALUES ('delete', old.id, old.name); "
+    "INSERT INTO diary_directoryfood_fts(rowid, name) VALUES (new.id, new.name); END",
+)
+
+SQLITE_BACKWARD = (
+    "DROP TRIGGER IF EXISTS diary_directoryfood_fts_ai",
+    "DROP TRIGGER IF EXISTS diary_directoryfood_fts_ad",
+    "DROP TRIGGER IF EXISTS diary_directoryfood_fts_au",
+    "DROP TABLE IF EXISTS diary_directoryfood_fts",
+)
+
+POSTGRES_FORWARD = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS diary_food_name_trgm ON diary_directoryfood "
+    "USING gin ((UPPER(name::text)) gin_trgm_ops)",
+)
+
+POSTGRES_BACKWARD = (
+    "DROP INDEX IF EXISTS diary_food_name_trgm",
+)
+
+
+def _run(schema_editor, statements):
+    """Выполняет набор SQL выражений в рамках миграции."""
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def create_search_index(apps, schema_editor):
+    """Создает поисковый индекс для СУБД текущего подключения."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_FORWARD)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_FORWARD)
+
+
+def drop_search_index(apps, schema_editor):
+    """Удаляет поисковый индекс для СУБД текущего подключения."""
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        _run(schema_editor, SQLITE_BACKWARD)
+    elif vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_BACKWARD)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0014_alter_userfoodday_date_alter_userstat_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
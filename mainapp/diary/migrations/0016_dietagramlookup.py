@@ -0,0 +1,31 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0015_directoryfood_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DietaGramLookup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200)),
+                ('lang', models.CharField(max_length=10)),
+                ('found', models.BooleanField(default=False)),
+                ('food_ids', models.JSONField(default=list)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'DietaGramLookup',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dietagramlookup',
+            constraint=models.UniqueConstraint(fields=('name', 'lang'), name='dietagram_lookup_name_lang_uniq'),
+        ),
+    ]
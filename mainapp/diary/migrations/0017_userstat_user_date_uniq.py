@@ -0,0 +1,34 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:32
+
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+STAT_FIELDS = ('calories_burned', 'fat_burned', 'protein_burned', 'carbon_burned')
+
+
+def merge_duplicate_stats(apps, schema_editor):
+    """Сливает повторяющиеся записи статистики за один день пользователя
+    в запись с наименьшим id, суммируя счетчики."""
+    user_stat = apps.get_model('diary', 'UserStat')
+    duplicates = user_stat.objects.values('user', 'date').annotate(rows=Count('id'),\
+        keep=Min('id'), **{f'total_{i}': Sum(i) for i in STAT_FIELDS}).filter(rows__gt=1)
+    for item in duplicates.iterator():
+        user_stat.objects.filter(id=item['keep'])\
+            .update(**{i: item[f'total_{i}'] for i in STAT_FIELDS})
+        user_stat.objects.filter(user=item['user'], date=item['date'])\
+            .exclude(id=item['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0016_dietagramlookup'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_stats, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='userstat',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='userstat_user_date_uniq'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+"""Индексы выборок дневника пользователя по дате и периоду.
+
+Составной индекс (user, date, food) таблицы UserFoodDay покрывает выборку
+блюд за день и период. Для UserStat ключ (user, date) уже индексирован
+ограничением userstat_user_date_uniq; на PostgreSQL дополнительно создается
+покрывающий индекс со счетчиками, чтобы выборка статистики за период
+выполнялась index only scan. SQLite не поддерживает INCLUDE, а индекс
+ограничения и так содержит rowid, поэтому там он не создается.
+Одноколоночные индексы внешнего ключа user обеих таблиц удаляются: их
+заменяют составные индексы, начинающиеся с user."""
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+POSTGRES_FORWARD = (
+    "CREATE INDEX IF NOT EXISTS userstat_user_date_cov ON diary_userstat "
+    "(user_id, date) INCLUDE (id, calories_burned, fat_burned, protein_burned, carbon_burned)",
+)
+
+POSTGRES_BACKWARD = (
+    "DROP INDEX IF EXISTS userstat_user_date_cov",
+)
+
+
+def create_covering_index(apps, schema_editor):
+    """Создает покрывающий индекс статистики на PostgreSQL."""
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_FORWARD:
+            schema_editor.execute(sql)
+
+
+def drop_covering_index(apps, schema_editor):
+    """Удаляет покрывающий индекс статистики на PostgreSQL."""
+    if schema_editor.connection.vendor == 'postgresql':
+        for sql in POSTGRES_BACKWARD:
+            schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('diary', '0017_userstat_user_date_uniq'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userfoodday',
+            index=models.Index(fields=['user', 'date', 'food'], name='userfoodday_user_date_food_idx'),
+        ),
+        migrations.RunPython(create_covering_index, drop_covering_index),
+        migrations.AlterField(
+            model_name='userfoodday',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='userstat',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+    ]
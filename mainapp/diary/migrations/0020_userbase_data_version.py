@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0019_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userbase',
+            name='data_version',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:54
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0020_userbase_data_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStatRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('week', 'week'), ('month', 'month')], max_length=5)),
+                ('start', models.DateField()),
+                ('calories_burned', models.IntegerField(default=0)),
+                ('fat_burned', models.IntegerField(default=0)),
+                ('protein_burned', models.IntegerField(default=0)),
+                ('carbon_burned', models.IntegerField(default=0)),
+                ('days_logged', models.IntegerField(default=0)),
+                ('user', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'UserStatRollup',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='userstatrollup',
+            constraint=models.UniqueConstraint(fields=('user', 'period', 'start'), name='userstatrollup_user_period_start_uniq'),
+        ),
+    ]
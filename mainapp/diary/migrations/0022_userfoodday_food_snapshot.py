@@ -0,0 +1,38 @@
+# Generated by Django 4.2.9 on 2026-10-18 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0021_userstatrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfoodday',
+            name='caloric',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userfoodday',
+            name='carbon',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userfoodday',
+            name='fat',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userfoodday',
+            name='name',
+            field=models.CharField(default='', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='userfoodday',
+            name='protein',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.9 on 2026-10-18 20:03
+
+from django.db import migrations, transaction
+from django.db.models import Max, OuterRef, Subquery
+
+SNAPSHOT_FIELDS = ('name', 'caloric', 'fat', 'protein', 'carbon')
+BATCH_SIZE = 10000
+
+
+def backfill_snapshot(apps, schema_editor):
+    """Копирует название, калории и БЖУ блюда в записи дневника диапазонами
+    id по BATCH_SIZE строк, каждый диапазон в своей транзакции, чтобы не
+    держать блокировку всей таблицы на время заполнения."""
+    user_food_day = apps.get_model('diary', 'UserFoodDay')
+    directory_food = apps.get_model('diary', 'DirectoryFood')
+    food = directory_food.objects.filter(id=OuterRef('food_id'))
+    snapshot = {field: Subquery(food.values(field)[:1]) for field in SNAPSHOT_FIELDS}
+    last_id = user_food_day.objects.aggregate(last_id=Max('id'))['last_id'] or 0
+    for start in range(0, last_id, BATCH_SIZE):
+        with transaction.atomic(using=schema_editor.connection.alias):
+            user_food_day.objects.filter(id__gt=start, id__lte=start + BATCH_SIZE)\
+                .update(**snapshot)
+
+
+class Migration(migrations.Migration):
+    atomic = False
+
+    dependencies = [
+        ('diary', '0022_userfoodday_food_snapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_snapshot, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.9 on 2026-10-18 20:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0023_backfill_userfoodday_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userfoodday',
+            name='gram',
+            field=models.PositiveIntegerField(default=100),
+        ),
+    ]
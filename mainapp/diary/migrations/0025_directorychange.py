@@ -0,0 +1,40 @@
+# Generated by Django 4.2.9 on 2026-10-18 20:12
+
+from itertools import islice
+from django.db import migrations, models
+
+BATCH_SIZE = 5000
+
+
+def log_existing(apps, schema_editor):
+    """Записывает в журнал все существующие записи справочников, чтобы
+    изменения после версии 0 содержали справочники целиком."""
+    change = apps.get_model('diary', 'DirectoryChange')
+    for kind, model in (('food', 'DirectoryFood'), ('ingredient', 'DirectoryIngredients')):
+        ids = apps.get_model('diary', model).objects.order_by('id')\
+            .values_list('id', flat=True).iterator(chunk_size=BATCH_SIZE)
+        while batch := list(islice(ids, BATCH_SIZE)):
+            change.objects.bulk_create([change(kind=kind, item_id=i) for i in batch])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diary', '0024_userfoodday_gram'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DirectoryChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('food', 'food'), ('ingredient', 'ingredient')], max_length=10)),
+                ('item_id', models.BigIntegerField()),
+            ],
+            options={
+                'verbose_name_plural': 'DirectoryChange',
+                'indexes': [models.Index(fields=['kind', 'item_id'], name='directorychange_kind_item_idx')],
+            },
+        ),
+        migrations.RunPython(log_existing, migrations.RunPython.noop),
+    ]
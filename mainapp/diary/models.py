@@ -11,6 +11,9 @@ class UserBase(AbstractUser):
     date_create = models.DateField(default=datetime.now)
     email = models.EmailField(unique=True)
     recommended_calories = models.IntegerField(null=True)
+    # Версия данных дневника: увеличивается при каждом изменении UserFoodDay
+    # и UserStat пользователя, входит в ключ кэша отчетов (diary.report_cache).
+    data_version = models.IntegerField(default=0)
 
     class Meta:
         """Метакласс таблицы пользователей."""
@@ -19,7 +22,7 @@ class UserBase(AbstractUser):
 class UserStat(models.Model):
     """Таблица статистики пользователя по калориям,
     жирам, белкам и углеводам за день."""
-    user = models.ForeignKey(UserBase, on_delete=models.CASCADE, null=False)
+    user = models.ForeignKey(UserBase, on_delete=models.CASCADE, null=False, db_index=False)
     date = models.DateField(default=date.today())
     calories_burned = models.IntegerField(default=0)
     fat_burned = models.IntegerField(default=0)
@@ -29,6 +32,32 @@ class UserStat(models.Model):
     class Meta:
         """Метакласс таблицы статистики пользователя."""
         verbose_name_plural = 'UserStat'
+        constraints = [models.UniqueConstraint(fields=('user', 'date'),
+            name='userstat_user_date_uniq')]
+
+class UserStatRollup(models.Model):
+    """Таблица сумм статистики пользователя за неделю или месяц
+    (diary.rollups). Поддерживается теми же записями, что и UserStat."""
+    WEEK = 'week'
+    MONTH = 'month'
+    PERIODS = ((WEEK, 'week'), (MONTH, 'month'))
+
+    user = models.ForeignKey(UserBase, on_delete=models.CASCADE, null=False, db_index=False)
+    period = models.CharField(max_length=5, choices=PERIODS)
+    # Понедельник недели или первое число месяца.
+    start = models.DateField()
+    calories_burned = models.IntegerField(default=0)
+    fat_burned = models.IntegerField(default=0)
+    protein_burned = models.IntegerField(default=0)
+    carbon_burned = models.IntegerField(default=0)
+    # Дни периода с ненулевой статистикой.
+    days_logged = models.IntegerField(default=0)
+
+    class Meta:
+        """Метакласс таблицы сумм статистики за неделю или месяц."""
+        verbose_name_plural = 'UserStatRollup'
+        constraints = [models.UniqueConstraint(fields=('user', 'period', 'start'),
+            name='userstatrollup_user_period_start_uniq')]
 
 class DirectoryFood(models.Model):
     """Таблица справочник блюд."""
@@ -47,12 +76,42 @@ class DirectoryFood(models.Model):
 class UserFoodDay(models.Model):
     """Таблица блюд пользователя за день."""
     food = models.ForeignKey(DirectoryFood, on_delete=models.CASCADE)
-    user = models.ForeignKey(UserBase, on_delete=models.CASCADE)
+    user = models.ForeignKey(UserBase, on_delete=models.CASCADE, db_index=False)
     date = models.DateField(default=date.today())
+    # Название блюда и калории и БЖУ съеденной порции на момент добавления
+    # в дневник: история не меняется при правке справочника и читается без
+    # присоединения блюд.
+    name = models.CharField(max_length=50, default='')
+    gram = models.PositiveIntegerField(default=100)
+    caloric = models.IntegerField(default=0)
+    fat = models.IntegerField(default=0)
+    protein = models.IntegerField(default=0)
+    carbon = models.IntegerField(default=0)
+
+    NUTRIENT_FIELDS = ('caloric', 'fat', 'protein', 'carbon')
+    # Значения справочника указаны на 100 г блюда.
+    DEFAULT_GRAM = 100
+    # Порция больше 10 кг считается ошибкой ввода.
+    MAX_GRAM = 10000
 
     class Meta:
         """Метакласс таблицы еды пользователя за день."""
         verbose_name_plural = 'UserFoodDay'
+        indexes = [models.Index(fields=('user', 'date', 'food'),
+            name='userfoodday_user_date_food_idx')]
+
+    @classmethod
+    def snapshot(cls, food, gram=DEFAULT_GRAM):
+        """Значения полей новой записи дневника: название блюда food и
+        калории и БЖУ порции gram грамм."""
+        values = {field: round(getattr(food, field) * gram / cls.DEFAULT_GRAM)\
+            for field in cls.NUTRIENT_FIELDS}
+        return dict(values, name=food.name, gram=gram)
+
+    @property
+    def nutrients(self):
+        """Калории, жиры, белки и углеводы записи в порядке счетчиков UserStat."""
+        return tuple(getattr(self, field) for field in self.NUTRIENT_FIELDS)
 
 class DirectoryIngredients(models.Model):
     """Таблица справочник ингредиентов."""
@@ -76,3 +135,64 @@ class RecipeFood(models.Model):
     class Meta:
         """Метакласс таблицы рецептов."""
         verbose_name_plural = 'RecipeFood'
+
+class DietaGramLookup(models.Model):
+    """Таблица кэша запросов к API DietaGram. Хранит как найденные блюда
+    (id записей справочника блюд), так и ответы "блюдо не найдено"."""
+    name = models.CharField(max_length=200)
+    lang = models.CharField(max_length=10)
+    found = models.BooleanField(default=False)
+    food_ids = models.JSONField(default=list)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        """Метакласс таблицы кэша запросов к API DietaGram."""
+        verbose_name_plural = 'DietaGramLookup'
+        constraints = [models.UniqueConstraint(fields=('name', 'lang'),
+            name='dietagram_lookup_name_lang_uniq')]
+
+class Job(models.Model):
+    """Таблица очереди фоновых задач (diary.jobs): отчеты, выгрузки,
+    загрузки справочников и пересчеты статистики."""
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = ((QUEUED, 'queued'), (RUNNING, 'running'), (DONE, 'done'), (FAILED, 'failed'))
+
+    kind = models.CharField(max_length=50)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=QUEUED)
+    user = models.ForeignKey(UserBase, on_delete=models.CASCADE, null=True)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    run_after = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True)
+    error = models.TextField(blank=True, default='')
+    artifact = models.CharField(max_length=255, blank=True, default='')
+    artifact_name = models.CharField(max_length=255, blank=True, default='')
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        """Метакласс таблицы очереди фоновых задач."""
+        verbose_name_plural = 'Job'
+        indexes = [models.Index(fields=('status', 'run_after'), name='job_status_run_after_idx')]
+
+class DirectoryChange(models.Model):
+    """Журнал изменений справочников блюд и ингредиентов (diary.changelog).
+    id строки - версия справочников. Для записи справочника хранится только
+    последнее изменение, строки удаленных записей остаются в журнале."""
+    FOOD = 'food'
+    INGREDIENT = 'ingredient'
+    KINDS = ((FOOD, 'food'), (INGREDIENT, 'ingredient'))
+
+    kind = models.CharField(max_length=10, choices=KINDS)
+    item_id = models.BigIntegerField()
+
+    class Meta:
+        """Метакласс таблицы журнала изменений справочников."""
+        verbose_name_plural = 'DirectoryChange'
+        indexes = [models.Index(fields=('kind', 'item_id'), name='directorychange_kind_item_idx')]
@@ -0,0 +1,141 @@
+"""Модуль дискового кэша готовых отчетов и выгрузок за период.
+
+Ключ файла - хэш параметров, от которых зависит его содержимое: пользователь,
+вид отчета, период, формат и версия данных дневника UserBase.data_version,
+которая растет при каждом изменении UserFoodDay/UserStat пользователя.
+Поэтому устаревшие файлы не нужно удалять при записи: новый запрос получает
+другой ключ, а старые файлы вытесняются по LRU, когда размер каталога
+превышает MAX_BYTES. Ключ же служит ETag ответа, и повторный запрос с
+If-None-Match получает 304 без обращения к отчету."""
+import hashlib
+import os
+import shutil
+import time
+import uuid
+from django.conf import settings
+from django.utils.http import parse_etags
+
+# Увеличивается при изменении верстки отчетов, чтобы не отдавать старые файлы.
+RENDER_VERSION = 2
+# Через сколько секунд недописанный временный файл считается брошенным.
+TMP_TTL = 3600
+
+
+class ReportCache:
+    """Кэш файлов отчетов за период в каталоге DIARY_REPORT_CACHE['DIR']."""
+
+    @property
+    def options(self):
+        """Настройки кэша из DIARY_REPORT_CACHE."""
+        return settings.DIARY_REPORT_CACHE
+
+    @staticmethod
+    def key(user, report, extension, date_start, date_end):
+        """Ключ отчета. Кроме версии данных в него входят имя пользователя и
+        рекомендуемые калории, которые тоже выводятся в отчете."""
+        parts = (RENDER_VERSION, user.id, user.data_version, user.username,\
+            user.recommended_calories, report, extension, date_start, date_end)
+        return hashlib.sha256(repr(parts).encode()).hexdigest()[:32]
+
+    @staticmethod
+    def etag(key):
+        """ETag ответа по ключу. Слабый: при повторном построении после
+        вытеснения PDF отличается датой создания, но не содержимым."""
+        return f'W/"{key}"'
+
+    @staticmethod
+    def matches(if_none_match, key):
+        """Совпадает ли заголовок If-None-Match с ключом (слабое сравнение)."""
+        tags = [i.removeprefix('W/') for i in parse_etags(if_none_match or '')]
+        return '*' in tags or f'"{key}"' in tags
+
+    def path(self, key, extension):
+        """Путь к файлу отчета в кэше."""
+        return os.path.join(self.options['DIR'], f'{key}.{extension}')
+
+    def open(self, key, extension):
+        """Открывает файл отчета из кэша и отмечает его использование,
+        либо возвращает None."""
+        path = self.path(key, extension)
+        try:
+            file = open(path, 'rb')  # pylint: disable=consider-using-with
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return file
+
+    def store(self, key, extension, source):
+        """Копирует файл отчета source в кэш и открывает копию."""
+        with source, self.writer(key, extension) as target:
+            source.seek(0)
+            shutil.copyfileobj(source, target)
+        return self.open(key, extension)
+
+    def tee(self, key, extension, chunks):
+        """Отдает фрагменты потокового ответа, попутно записывая их в кэш.
+        Если клиент прервал загрузку, недописанный файл удаляется."""
+        with self.writer(key, extension) as target:
+            for chunk in chunks:
+                target.write(chunk)
+                yield chunk
+
+    def writer(self, key, extension):
+        """Файл для записи отчета в кэш."""
+        return _AtomicWriter(self, self.path(key, extension))
+
+    def evict(self, keep=None):
+        """Удаляет давно не использованные файлы, пока размер кэша
+        больше MAX_BYTES. Только что записанный файл keep не удаляется, даже
+        если один превышает MAX_BYTES. Возвращает число удаленных файлов."""
+        try:
+            entries = [(i.stat().st_mtime, i.stat().st_size, i.path)\
+                for i in os.scandir(self.options['DIR']) if i.is_file()]
+        except FileNotFoundError:
+            return 0
+        # Недописанные файлы других процессов не трогаем, брошенные вытесняются.
+        abandoned = time.time() - TMP_TTL
+        entries = [i for i in entries if not i[2].endswith('.tmp') or i[0] < abandoned]
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.options['MAX_BYTES']:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+class _AtomicWriter:
+    """Запись файла кэша во временный файл с переименованием в конце,
+    чтобы другие процессы не увидели недописанный отчет."""
+
+    def __init__(self, cache, path):
+        self.cache = cache
+        self.path = path
+        self.tmp = f'{path}.{uuid.uuid4().hex}.tmp'
+        self.file = None
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.tmp, 'wb')  # pylint: disable=consider-using-with
+        return self.file
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.tmp, self.path)
+            self.cache.evict(keep=self.path)
+        else:
+            os.remove(self.tmp)
+
+
+report_cache = ReportCache()
@@ -0,0 +1,135 @@
+"""Модуль построения PDF отчетов.
+
+Таблица отчета разбивается на LongTable по CHUNK_ROWS строк с повтором
+заголовка на каждой странице. Фрагменты создаются из итератора строк по
+мере верстки (LazyStory), поэтому в памяти одновременно находится только
+текущий фрагмент, а не вся таблица. Стили и ширины колонок вычисляются
+заранее, ячейки - простые строки без Paragraph, поэтому reportlab не
+измеряет каждую ячейку. Готовый документ пишется во временный файл,
+который переносится на диск после SPOOL_MEMORY байт. Сверстанные страницы
+reportlab хранит до сохранения документа, поэтому память все же растет,
+примерно на 1 МБ на тысячу строк; число строк ограничено MAX_ROWS.
+Замер: manage.py benchmark_reports --legacy.
+
+Модуль импортирует reportlab, поэтому представления и воркеры задач
+импортируют его только при построении PDF; проверка числа строк и
+ReportTooLarge находятся в diary.exports."""
+import tempfile
+from functools import lru_cache
+from itertools import islice
+from django.conf import settings
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate, TableStyle
+from diary.exports import STAT_REPORT, check_row_limit, iter_rows
+from mainapp.settings import BASE_DIR
+
+FONT = 'Arimo'
+
+
+@lru_cache(maxsize=None)
+def report_styles():
+    """Регистрирует шрифт отчетов и один раз создает стили абзацев и таблиц."""
+    rl_config.TTFSearchPath.append(str(BASE_DIR) + '/mainapp/font')
+    pdfmetrics.registerFont(TTFont(FONT, 'Arimo-VariableFont_wght.ttf'))
+    styles = getSampleStyleSheet()
+    styles['Normal'].fontName = FONT
+    styles['Heading1'].fontName = FONT
+    table = TableStyle([('GRID', (0, 0), (-1, -1), 0.25, colors.black),
+                        ('FONTNAME', (0, 0), (-1, -1), FONT),
+                        ('FONTSIZE', (0, 0), (-1, -1), 8),
+                        ('VALIGN', (0, 0), (-1, -1), 'TOP')])
+    return styles, table
+
+
+class LazyStory(list):
+    """Список flowable для SimpleDocTemplate.build, пополняемый из итератора
+    по мере верстки. build на каждом шаге запрашивает длину списка и берет
+    flowable из его начала, поэтому достаточно держать в списке пару
+    следующих элементов."""
+
+    def __init__(self, flowables, ahead=2):
+        super().__init__()
+        self._source = iter(flowables)
+        self._ahead = ahead
+
+    def __len__(self):
+        while super().__len__() < self._ahead:
+            item = next(self._source, None)
+            if item is None:
+                break
+            self.append(item)
+        return super().__len__()
+
+
+def _table_chunks(header, rows, col_widths, table_style):
+    """Разбивает строки на LongTable по CHUNK_ROWS строк с заголовком."""
+    rows = iter(rows)
+    chunk_rows = settings.DIARY_REPORTS['CHUNK_ROWS']
+    while True:
+        chunk = [tuple('' if value is None else str(value) for value in row)\
+            for row in islice(rows, chunk_rows)]
+        if not chunk:
+            return
+        yield LongTable([header] + chunk, colWidths=col_widths, repeatRows=1,\
+            hAlign='CENTER', style=table_style)
+
+
+def build_report(paragraphs, header, rows, col_widths):
+    """Строит PDF отчет из абзацев paragraphs и таблицы header/rows.
+    col_widths - доли ширины страницы для колонок. rows может быть
+    итератором, он читается по мере верстки. Возвращает временный файл
+    с документом, позиционированный на начало."""
+    styles, table_style = report_styles()
+    rows = iter(rows)
+    limit = settings.DIARY_REPORTS['MAX_ROWS']
+    file = tempfile.SpooledTemporaryFile(  # pylint: disable=consider-using-with
+        max_size=settings.DIARY_REPORTS['SPOOL_MEMORY'])
+    doc = SimpleDocTemplate(file, rightMargin=0, leftMargin=6.5, topMargin=0.3,\
+        bottomMargin=0, pageCompression=1)
+    widths = [doc.width * share for share in col_widths]
+
+    def limited():
+        for number, row in enumerate(rows, 1):
+            if number > limit:
+                check_row_limit(number)
+            yield row
+
+    def flowables():
+        for text in paragraphs:
+            yield Paragraph(text, styles['Normal'])
+        yield from _table_chunks(header, limited(), widths, table_style)
+
+    try:
+        doc.build(LazyStory(flowables()))
+    except BaseException:
+        file.close()
+        raise
+    file.seek(0)
+    return file
+
+
+def period_pdf(report, user, result, date_start, date_end):
+    """PDF отчет за период о статистике (STAT_REPORT) или блюдах пользователя."""
+    check_row_limit(result.count())
+    result = result.order_by('date', 'id')
+    if report == STAT_REPORT:
+        header = ['id', 'username', 'data', 'calories', 'fat', 'protein', 'carbon']
+        rows = ((i, user.username, *rest) for i, *rest in iter_rows(result, 'id', 'date',\
+            'calories_burned', 'fat_burned', 'protein_burned', 'carbon_burned'))
+        widths = [0.1, 0.2, 0.14, 0.14, 0.14, 0.14, 0.14]
+        if user.recommended_calories:
+            header.append('balance')
+            rows = (row + (user.recommended_calories - row[3],) for row in rows)
+            widths = [0.09, 0.17, 0.12, 0.12, 0.12, 0.12, 0.12, 0.14]
+        return build_report([f'Your report on calories/fat/protein/carbon received the period '
+                             f'from {date_start} to {date_end}'], header, rows, widths)
+    rows = ((i, food, user.username, *rest) for i, food, *rest in iter_rows(result, 'id',\
+        'food', 'date', 'name', 'gram', 'caloric', 'fat', 'protein', 'carbon'))
+    return build_report([f'Your report on dishes eaten during the period '
+                         f'from {date_start} to {date_end}'], ('id', 'food id', 'user', 'date',\
+        'food name', 'gram', 'caloric', 'fat', 'protein', 'carbon'), rows,\
+        [0.07, 0.07, 0.12, 0.11, 0.27, 0.07, 0.07, 0.07, 0.07, 0.08])
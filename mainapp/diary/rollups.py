@@ -0,0 +1,112 @@
+"""Модуль сумм статистики пользователя за неделю и месяц (UserStatRollup).
+
+Суммы не прибавляются к счетчикам, а пересчитываются по UserStat для
+затронутых недель и месяцев целиком: одним INSERT ... SELECT ... GROUP BY
+... ON CONFLICT DO UPDATE на каждую запись статистики. Так число дней с
+записями остается точным и при перезаписи UserStat пересчетом, а на один
+период приходится не больше 31 строки UserStat.
+
+Пересчитанная сумма записывается поверх прежней, поэтому пересчеты одного
+пользователя должны идти по очереди: под READ COMMITTED транзакция, не
+видящая незафиксированный день другой, записала бы устаревшую сумму.
+Вызывающий код держит до конца транзакции блокировку строк UserBase
+затронутых пользователей (lock_users или UPDATE data_version), и запрос
+пересчета видит все зафиксированные до него дни."""
+from calendar import monthrange
+from datetime import timedelta
+from django.db import connection
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import TruncMonth, TruncWeek
+from diary.models import UserBase, UserFoodDay, UserStat, UserStatRollup
+
+# Счетчики, общие для UserStat и UserStatRollup.
+STAT_FIELDS = ('calories_burned', 'fat_burned', 'protein_burned', 'carbon_burned')
+TRUNC = {UserStatRollup.WEEK: TruncWeek, UserStatRollup.MONTH: TruncMonth}
+PERIODS = tuple(TRUNC)
+
+
+def lock_users(users):
+    """Блокирует строки UserBase диапазона id пользователей users до конца
+    транзакции. На SQLite ничего не делает: запись в БД и так одна."""
+    return list(UserBase.objects.select_for_update().filter(id__gte=users[0],\
+        id__lte=users[1]).order_by('id').values_list('id', flat=True))
+
+
+def period_range(period, day):
+    """Первый и последний день недели или месяца, в который входит day."""
+    if period == UserStatRollup.WEEK:
+        start = day - timedelta(days=day.weekday())
+        return start, start + timedelta(days=6)
+    return day.replace(day=1), day.replace(day=monthrange(day.year, day.month)[1])
+
+
+def _totals(period, stats):
+    """Суммы выборки UserStat по пользователю и началу периода."""
+    logged = Q()
+    for field in STAT_FIELDS:
+        logged |= ~Q(**{field: 0})
+    return stats.annotate(period_name=Value(period), period_start=TRUNC[period]('date'))\
+        .values('user', 'period_name', 'period_start').order_by()\
+        .annotate(**{f'total_{field}': Sum(field) for field in STAT_FIELDS},\
+        days_logged=Count('id', filter=logged))
+
+
+def _upsert(querysets):
+    """Записывает суммы нескольких выборок _totals одним INSERT ... SELECT
+    ... ON CONFLICT DO UPDATE. Возвращает число записанных периодов."""
+    meta = UserStatRollup._meta  # pylint: disable=protected-access
+    quote = connection.ops.quote_name
+    columns = ['user_id', 'period', 'start', *STAT_FIELDS, 'days_logged']
+    selects, params = [], []
+    for queryset in querysets:
+        sql, query_params = queryset.query.sql_with_params()
+        selects.append(sql)
+        params.extend(query_params)
+    action = ', '.join(f'{quote(i)} = EXCLUDED.{quote(i)}' for i in columns[3:])
+    # WHERE true снимает неоднозначность ON CONFLICT после SELECT в SQLite.
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote(meta.db_table)} '
+                       f'({", ".join(quote(i) for i in columns)}) '
+                       f'SELECT * FROM ({" UNION ALL ".join(selects)}) rollup WHERE true '
+                       f'ON CONFLICT ({quote("user_id")}, {quote("period")}, {quote("start")}) '
+                       f'DO UPDATE SET {action}', params)
+        return cursor.rowcount
+
+
+def refresh_days(user_id, days):
+    """Пересчитывает недели и месяцы пользователя, в которые входят days."""
+    querysets = []
+    for period in PERIODS:
+        ranges = {period_range(period, day) for day in days}
+        window = Q()
+        for start, end in ranges:
+            window |= Q(date__range=(start, end))
+        querysets.append(_totals(period, UserStat.objects.filter(window, user_id=user_id)))
+    return _upsert(querysets)
+
+
+def refresh_users(users, date_start=None, date_end=None):
+    """Пересчитывает периоды диапазона id пользователей users. Границы дат
+    расширяются до целых недель и месяцев."""
+    date_field = UserStat._meta.get_field('date')  # pylint: disable=protected-access
+    date_start, date_end = date_field.to_python(date_start), date_field.to_python(date_end)
+    querysets = []
+    for period in PERIODS:
+        stats = UserStat.objects.filter(user__gte=users[0], user__lte=users[1])
+        if date_start:
+            stats = stats.filter(date__gte=period_range(period, date_start)[0])
+        if date_end:
+            stats = stats.filter(date__lte=period_range(period, date_end)[1])
+        querysets.append(_totals(period, stats))
+    return _upsert(querysets)
+
+
+def refresh_food(food_id):
+    """Пересчитывает периоды пользователей, в которых съедено блюдо. Дни
+    берутся из записей дневника с этим блюдом по индексу food_id, суммы
+    пересчитываются по пользователю через refresh_days."""
+    days = {}
+    for user_id, day in UserFoodDay.objects.filter(food_id=food_id)\
+            .values_list('user', 'date').distinct().order_by().iterator():
+        days.setdefault(user_id, set()).add(day)
+    return sum(refresh_days(user_id, user_days) for user_id, user_days in days.items())
@@ -0,0 +1,115 @@
+"""Модуль поисковых бэкендов справочника блюд.
+
+Бэкенд выбирается настройкой DIARY_SEARCH_BACKEND (путь до класса),
+а если она не задана - по типу СУБД текущего подключения.
+
+Каждый бэкенд сортирует блюда по паре (rank, id) и отдает rank атрибутом
+найденных блюд, поэтому следующая страница выдачи читается условием
+"после (rank, id) последнего блюда" без OFFSET. Если переданы fields, из
+справочника читаются только эти поля и id, остальные поля блюд отложены."""
+from functools import lru_cache
+from django.conf import settings
+from django.contrib.postgres.search import TrigramSimilarity
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.functions import Cast, Length, Upper
+from django.utils.module_loading import import_string
+from diary.models import DirectoryFood
+
+FOOD_TABLE = 'diary_directoryfood'
+FTS_TABLE = 'diary_directoryfood_fts'
+
+
+class BaseSearchBackend:
+    """Базовый класс поискового бэкенда справочника блюд."""
+
+    def search(self, query, limit, after=None, fields=None):
+        """Возвращает не более limit блюд, отсортированных по релевантности.
+        after - пара (rank, id) последнего блюда предыдущей страницы,
+        fields - поля DirectoryFood, которые нужно загрузить (по умолчанию все)."""
+        raise NotImplementedError
+
+
+def only_fields(queryset, fields):
+    """Ограничивает выборку блюд полями fields и id."""
+    return queryset.only('id', *fields) if fields else queryset
+
+
+class IcontainsSearchBackend(BaseSearchBackend):
+    """Поиск вхождением подстроки без специального индекса.
+    Используется для СУБД без собственного бэкенда и для коротких запросов."""
+
+    def search(self, query, limit, after=None, fields=None):
+        result = DirectoryFood.objects.filter(name__icontains=query)\
+            .annotate(rank=Length('name'))
+        if after:
+            result = result.filter(Q(rank__gt=after[0]) | Q(rank=after[0], id__gt=after[1]))
+        return list(only_fields(result, fields).order_by('rank', 'id')[:limit])
+
+
+class PostgresTrigramSearchBackend(BaseSearchBackend):
+    """Поиск на PostgreSQL по GIN индексу pg_trgm над UPPER(name).
+    Находит как вхождения подстроки, так и похожие по триграммам названия,
+    сортирует по убыванию similarity."""
+
+    def search(self, query, limit, after=None, fields=None):
+        return list(self.queryset(query, after, fields)[:limit])
+
+    @staticmethod
+    def queryset(query, after=None, fields=None):
+        """Выборка найденных блюд после ключа after. similarity возвращает
+        real, а ключ страницы хранится как float Python: rank приводится к
+        double precision, чтобы сортировка, ключ и сравнение с ним шли в
+        одном типе и блюда с равным rank на границе страниц не терялись."""
+        upper_query = query.upper()
+        result = DirectoryFood.objects.annotate(upper_name=Upper('name'))\
+            .filter(Q(name__icontains=query) | Q(upper_name__trigram_similar=upper_query))\
+            .annotate(rank=Cast(TrigramSimilarity('upper_name', upper_query), FloatField()))
+        if after:
+            result = result.filter(Q(rank__lt=after[0]) | Q(rank=after[0], id__gt=after[1]))
+        return only_fields(result, fields).order_by('-rank', 'id')
+
+
+class SqliteFTSSearchBackend(BaseSearchBackend):
+    """Поиск на SQLite по теневой FTS5 таблице с триграммным токенизатором.
+    Таблица синхронизируется с DirectoryFood триггерами (миграция 0015),
+    результаты сортируются по bm25."""
+    min_query_length = 3
+
+    def search(self, query, limit, after=None, fields=None):
+        if len(query) < self.min_query_length:
+            return IcontainsSearchBackend().search(query, limit, after, fields)
+        columns = 'f.*'
+        if fields:
+            meta = DirectoryFood._meta  # pylint: disable=protected-access
+            columns = ', '.join(f'f.{connection.ops.quote_name(meta.get_field(i).column)}'\
+                for i in dict.fromkeys(('id', *fields)))
+        match = '"' + query.replace('"', '""') + '"'
+        keyset, params = '', [match]
+        if after:
+            keyset = ' AND (s.rank > %s OR (s.rank = %s AND f.id > %s))'
+            params += [after[0], after[0], after[1]]
+        return list(DirectoryFood.objects.raw(
+            f'SELECT {columns}, s.rank AS rank FROM {FTS_TABLE} s '
+            f'JOIN {FOOD_TABLE} f ON f.id = s.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s{keyset} ORDER BY s.rank, f.id LIMIT %s',
+            params + [limit]))
+
+
+VENDOR_BACKENDS = {
+    'postgresql': PostgresTrigramSearchBackend,
+    'sqlite': SqliteFTSSearchBackend,
+}
+
+
+@lru_cache(maxsize=None)
+def _load_backend(path, vendor):
+    """Создает экземпляр бэкенда по пути до класса или по типу СУБД."""
+    if path:
+        return import_string(path)()
+    return VENDOR_BACKENDS.get(vendor, IcontainsSearchBackend)()
+
+
+def get_search_backend():
+    """Возвращает поисковый бэкенд для текущего подключения к БД."""
+    return _load_backend(settings.DIARY_SEARCH_BACKEND, connection.vendor)
@@ -0,0 +1,39 @@
+"""Модуль обработчиков сигналов моделей приложения."""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from diary.autocomplete import name_index
+from diary.changelog import MODEL_KINDS, record
+from diary.models import DirectoryFood, DirectoryIngredients
+from diary.stats import bump_data_version, food_eaters, subtract_food
+
+
+@receiver(post_save, sender=DirectoryFood)
+@receiver(post_save, sender=DirectoryIngredients)
+def directory_saved(sender, instance, **kwargs):
+    """Записывает изменение справочника в журнал и добавляет созданную или
+    переименованную запись в индекс автодополнения после фиксации транзакции."""
+    kind = MODEL_KINDS[sender]
+    record(kind, [instance.pk])
+    transaction.on_commit(lambda: name_index.add(kind, instance.pk, instance.name))
+
+
+@receiver(post_delete, sender=DirectoryFood)
+@receiver(post_delete, sender=DirectoryIngredients)
+def directory_deleted(sender, instance, **kwargs):
+    """Записывает удаление в журнал справочника и удаляет запись из индекса
+    автодополнения после фиксации транзакции."""
+    kind = MODEL_KINDS[sender]
+    pk = instance.pk
+    record(kind, [pk])
+    transaction.on_commit(lambda: name_index.remove(kind, pk))
+
+
+@receiver(pre_delete, sender=DirectoryFood)
+def food_deleting(sender, instance, **kwargs):
+    """Вычитает блюдо из статистики пользователей до каскадного
+    удаления его записей UserFoodDay. Версия данных увеличивается первой:
+    UPDATE блокирует строки пользователей до конца транзакции удаления,
+    и суммы за периоды пересчитываются без одновременных изменений."""
+    bump_data_version(food_eaters(instance.pk))
+    subtract_food(instance.pk)
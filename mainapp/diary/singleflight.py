@@ -0,0 +1,73 @@
+"""Модуль объединения одновременных одинаковых операций.
+
+SingleFlight выполняет операцию один раз для ключа среди потоков одного
+процесса, остальные потоки ждут ее результат. advisory_lock дополнительно
+сериализует операцию между процессами через advisory lock PostgreSQL."""
+import hashlib
+import threading
+from contextlib import contextmanager
+from django.db import connection
+
+
+class _Call:
+    """Выполняемая операция и ее результат."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Объединяет одновременные вызовы с одинаковым ключом в один."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        """Выполняет func, если для key еще нет выполняющейся операции,
+        иначе дожидается результата уже запущенной. Исключение операции
+        получают все ожидающие вызовы."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+        except Exception as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+def lock_id(key):
+    """Преобразует строковый ключ в знаковое 64-битное число для pg_advisory_lock."""
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big', signed=True)
+
+
+@contextmanager
+def advisory_lock(key):
+    """Сессионная advisory блокировка PostgreSQL по ключу. На остальных СУБД
+    ничего не блокирует: SQLite используется только однопроцессно в разработке."""
+    if connection.vendor != 'postgresql':
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_advisory_lock(%s)', [lock_id(key)])
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_unlock(%s)', [lock_id(key)])
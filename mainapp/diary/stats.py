@@ -0,0 +1,220 @@
+"""Модуль поддержки дневной статистики пользователя UserStat.
+
+Счетчики увеличиваются одним выражением INSERT ... ON CONFLICT DO UPDATE
+по уникальному ключу (user, date), без чтения записи в Python, поэтому
+одновременные добавления не теряют обновления.
+
+Сверка и пересчет статистики выполняются над диапазонами id пользователей
+целиком на стороне БД: суммы за день считаются одним GROUP BY по
+UserFoodDay и сразу записываются INSERT ... SELECT ... ON CONFLICT.
+Калории и БЖУ берутся из значений, скопированных в запись дневника при
+добавлении блюда, поэтому правка справочника не меняет статистику.
+
+Каждое изменение статистики увеличивает UserBase.data_version затронутых
+пользователей, по которому кэш отчетов отличает устаревшие файлы, и
+пересчитывает суммы затронутых недель и месяцев (diary.rollups)."""
+from django.db import connection, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.db.utils import IntegrityError
+from diary.models import UserBase, UserFoodDay, UserStat
+from diary.rollups import STAT_FIELDS, lock_users, refresh_days, refresh_food, refresh_users
+
+FOOD_NUTRIENTS = UserFoodDay.NUTRIENT_FIELDS
+STAT_SOURCES = dict(zip(STAT_FIELDS, FOOD_NUTRIENTS))
+
+
+def _upsert_returning(user_id, deltas):
+    """Прибавляет счетчики за несколько дней одним INSERT ... ON CONFLICT DO UPDATE."""
+    meta = UserStat._meta  # pylint: disable=protected-access
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    columns = ['user_id', 'date'] + list(STAT_FIELDS)
+    placeholders = ', '.join(['(' + ', '.join(['%s'] * len(columns)) + ')'] * len(deltas))
+    updates = ', '.join(f'{quote(i)} = {table}.{quote(i)} + EXCLUDED.{quote(i)}'\
+        for i in STAT_FIELDS)
+    attnames = [field.attname for field in meta.concrete_fields]
+    sql = (f'INSERT INTO {table} ({", ".join(quote(i) for i in columns)}) '
+           f'VALUES {placeholders} ON CONFLICT ({quote("user_id")}, {quote("date")}) '
+           f'DO UPDATE SET {updates} RETURNING {", ".join(quote(i) for i in attnames)}')
+    params = [value for date, delta in deltas.items() for value in (user_id, date, *delta)]
+    date_field = meta.get_field('date')
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        result = [UserStat.from_db(connection.alias, attnames, row) for row in cursor.fetchall()]
+    for stat in result:
+        stat.date = date_field.to_python(stat.date)
+    return result
+
+
+def _upsert_fallback(user_id, deltas):
+    """Прибавляет счетчики через UPDATE с F() выражениями для СУБД без
+    INSERT ... ON CONFLICT."""
+    result = []
+    for date, delta in deltas.items():
+        increments = {field: F(field) + value for field, value in zip(STAT_FIELDS, delta)}
+        with transaction.atomic():
+            if not UserStat.objects.filter(user_id=user_id, date=date).update(**increments):
+                try:
+                    with transaction.atomic():
+                        UserStat.objects.create(user_id=user_id, date=date,\
+                            **dict(zip(STAT_FIELDS, delta)))
+                except IntegrityError:
+                    UserStat.objects.filter(user_id=user_id, date=date).update(**increments)
+        result.append(UserStat.objects.get(user_id=user_id, date=date))
+    return result
+
+
+def apply_stat_deltas(user_id, deltas):
+    """Прибавляет к статистике пользователя значения за несколько дней.
+    deltas - словарь {дата: (калории, жиры, белки, углеводы)}, отсутствующие
+    записи статистики создаются. Версия данных, статистика и суммы за
+    периоды меняются в одной транзакции. Возвращает измененные записи UserStat."""
+    deltas = {date: tuple(int(i) for i in delta) for date, delta in deltas.items()}
+    if not deltas:
+        return []
+    date_field = UserStat._meta.get_field('date')  # pylint: disable=protected-access
+    deltas = {date_field.to_python(date): delta for date, delta in deltas.items()}
+    # Без точки сохранения: ошибка и так отменяет всю внешнюю транзакцию.
+    with transaction.atomic(savepoint=False):
+        # UPDATE блокирует строку пользователя до конца транзакции: изменения
+        # статистики одного пользователя идут по очереди, и пересчет сумм
+        # за периоды видит дни одновременной транзакции (diary.rollups).
+        bump_data_version(UserBase.objects.filter(id=user_id))
+        if connection.vendor in ('postgresql', 'sqlite'):
+            result = _upsert_returning(user_id, deltas)
+        else:
+            result = _upsert_fallback(user_id, deltas)
+        refresh_days(user_id, deltas)
+    return result
+
+
+def bump_data_version(users):
+    """Увеличивает версию данных дневника пользователей выборки users."""
+    return users.update(data_version=F('data_version') + 1)
+
+
+def food_eaters(food_id):
+    """Пользователи, в дневнике которых есть блюдо food_id."""
+    return UserBase.objects.filter(Exists(UserFoodDay.objects.filter(\
+        user=OuterRef('pk'), food_id=food_id)))
+
+
+def add_to_stat(user_id, date, calories=0, fat=0, protein=0, carbon=0):
+    """Прибавляет значения к статистике пользователя за день одним запросом."""
+    return apply_stat_deltas(user_id, {date: (calories, fat, protein, carbon)})[0]
+
+
+def user_ranges(chunk_size, user_id=None):
+    """Разбивает пользователей на диапазоны id (первый, последний) по
+    chunk_size пользователей, не загружая список пользователей целиком."""
+    if user_id is not None:
+        yield user_id, user_id
+        return
+    last = 0
+    while True:
+        ids = list(UserBase.objects.filter(id__gt=last).order_by('id')\
+            .values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return
+        yield ids[0], ids[-1]
+        last = ids[-1]
+
+
+def _window(queryset, users, date_start=None, date_end=None):
+    """Ограничивает выборку диапазоном id пользователей и дат."""
+    queryset = queryset.filter(user__gte=users[0], user__lte=users[1])
+    if date_start:
+        queryset = queryset.filter(date__gte=date_start)
+    if date_end:
+        queryset = queryset.filter(date__lte=date_end)
+    return queryset
+
+
+def food_day_totals(users, date_start=None, date_end=None):
+    """Суммы калорий и БЖУ блюд UserFoodDay по пользователю и дню
+    одним GROUP BY по таблице дневника."""
+    return _window(UserFoodDay.objects, users, date_start, date_end)\
+        .values('user', 'date').order_by()\
+        .annotate(**{field: Coalesce(Sum(source), 0) for field, source in STAT_SOURCES.items()})
+
+
+def _upsert_select(queryset, increment):
+    """Записывает в статистику строки выборки (user, date, счетчики) одним
+    INSERT ... SELECT ... ON CONFLICT DO UPDATE. При increment значения
+    прибавляются к счетчикам, иначе заменяют расходящиеся счетчики.
+    Возвращает число вставленных и измененных записей."""
+    meta = UserStat._meta  # pylint: disable=protected-access
+    quote = connection.ops.quote_name
+    table = quote(meta.db_table)
+    columns = ['user_id', 'date'] + list(STAT_FIELDS)
+    select_sql, params = queryset.query.sql_with_params()
+    if increment:
+        action = ', '.join(f'{quote(i)} = {table}.{quote(i)} + EXCLUDED.{quote(i)}'\
+            for i in STAT_FIELDS)
+    else:
+        action = ', '.join(f'{quote(i)} = EXCLUDED.{quote(i)}' for i in STAT_FIELDS) +\
+            ' WHERE ' + ' OR '.join(f'{table}.{quote(i)} <> EXCLUDED.{quote(i)}'\
+            for i in STAT_FIELDS)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {table} ({", ".join(quote(i) for i in columns)}) '
+                       f'{select_sql} ON CONFLICT ({quote("user_id")}, {quote("date")}) '
+                       f'DO UPDATE SET {action}', params)
+        return cursor.rowcount
+
+
+def rebuild_stats(users, date_start=None, date_end=None):
+    """Пересчитывает статистику диапазона пользователей и дат по UserFoodDay.
+    Суммы записываются одним INSERT ... SELECT ... ON CONFLICT DO UPDATE, при
+    этом переписываются только расходящиеся записи. Дни, за которые у
+    пользователя не осталось блюд, обнуляются. Ручные добавления через
+    api/user/userstat/add при пересчете теряются: источником истины
+    считается UserFoodDay. Возвращает число исправленных и обнуленных дней."""
+    with transaction.atomic():
+        lock_users(users)
+        repaired = _upsert_select(food_day_totals(users, date_start, date_end), increment=False)
+        zeroed = _window(UserStat.objects, users, date_start, date_end)\
+            .exclude(Exists(UserFoodDay.objects.filter(user=OuterRef('user'), date=OuterRef('date'))))\
+            .exclude(**{field: 0 for field in STAT_FIELDS})\
+            .update(**{field: 0 for field in STAT_FIELDS})
+        if repaired or zeroed:
+            bump_data_version(UserBase.objects.filter(id__gte=users[0], id__lte=users[1]))
+            refresh_users(users, date_start, date_end)
+    return repaired, zeroed
+
+
+def subtract_food(food_id):
+    """Вычитает из статистики всех пользователей, евших блюдо, сохраненные
+    в записях дневника калории и БЖУ этого блюда. Выполняется одним
+    INSERT ... SELECT ... GROUP BY по дням с этим блюдом перед каскадным
+    удалением записей, без загрузки их в Python."""
+    per_day = UserFoodDay.objects.filter(food_id=food_id).values('user', 'date').order_by()\
+        .annotate(**{field: -Sum(source) for field, source in STAT_SOURCES.items()})
+    changed = _upsert_select(per_day, increment=True)
+    refresh_food(food_id)
+    return changed
+
+
+def stat_mismatches(users, date_start=None, date_end=None):
+    """Возвращает расхождения статистики с UserFoodDay в диапазоне пользователей
+    и дат: словари user, date, stored (записанные счетчики или None, если
+    записи нет) и expected (суммы по блюдам)."""
+    day_foods = UserFoodDay.objects.filter(user=OuterRef('user'), date=OuterRef('date'))\
+        .values('user', 'date').order_by()
+    expected = {f'expected_{field}': Coalesce(Subquery(day_foods.annotate(\
+        total=Sum(source)).values('total')), 0) for field, source in STAT_SOURCES.items()}
+    differs = Q()
+    for field in STAT_FIELDS:
+        differs |= ~Q(**{field: F(f'expected_{field}')})
+    stored = _window(UserStat.objects, users, date_start, date_end)\
+        .annotate(**expected).filter(differs).order_by('user', 'date')\
+        .values('user', 'date', *STAT_FIELDS, *expected)
+    for row in stored.iterator():
+        yield {'user': row['user'], 'date': row['date'],\
+            'stored': tuple(row[field] for field in STAT_FIELDS),\
+            'expected': tuple(row[f'expected_{field}'] for field in STAT_FIELDS)}
+    missing = food_day_totals(users, date_start, date_end).exclude(\
+        Exists(UserStat.objects.filter(user=OuterRef('user'), date=OuterRef('date'))))
+    for row in missing.order_by('user', 'date').iterator():
+        yield {'user': row['user'], 'date': row['date'], 'stored': None,\
+            'expected': tuple(row[field] for field in STAT_FIELDS)}
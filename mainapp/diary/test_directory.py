@@ -0,0 +1,197 @@
+"""Модуль тестов справочников блюд и ингредиентов: загрузки, автодополнения
+и синхронизации с клиентом."""
+import gzip
+import io
+import os
+import json
+import tempfile
+from http import HTTPStatus
+from unittest import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase
+from .models import DirectoryFood, DirectoryIngredients
+from .management.commands.import_directory import Command
+from .autocomplete import name_index
+from .changelog import FOOD, directory_snapshot
+from .directory import DUMP_READERS, import_dishes
+
+
+class TestAutocomplete(TestCase):
+    """Класс тестов автодополнения названий."""
+
+    def setUp(self):
+        name_index.reset()
+        self.addCleanup(name_index.reset)
+        DirectoryFood.objects.create(name='Apple pie')
+        DirectoryFood.objects.create(name='apricot jam')
+        DirectoryFood.objects.create(name='Banana')
+        DirectoryIngredients.objects.create(name='Apple')
+
+    def test_prefix_lookup(self):
+        """Поиск по префиксу без учета регистра в алфавитном порядке."""
+        response = self.client.get('/api/food/autocomplete?prefix=ap')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual([i['name'] for i in response.json()],\
+            ['Apple', 'Apple pie', 'apricot jam'])
+        response = self.client.get('/api/food/autocomplete?prefix=APP&kind=food&limit=1')
+        self.assertEqual(response.json(), [{'id': DirectoryFood.objects.get(name='Apple pie').id,\
+            'name': 'Apple pie', 'type': 'food'}])
+
+    def test_index_updated_without_queries(self):
+        """Изменения справочника применяются к индексу сигналами,
+        поиск не обращается к БД."""
+        name_index.ensure_fresh()
+        with self.captureOnCommitCallbacks(execute=True):
+            food = DirectoryFood.objects.create(name='Apricot')
+            DirectoryFood.objects.get(name='Apple pie').delete()
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/food/autocomplete?prefix=ap&kind=food')
+        self.assertEqual([i['name'] for i in response.json()], ['Apricot', 'apricot jam'])
+        with self.captureOnCommitCallbacks(execute=True):
+            food.name = 'Kiwi'
+            food.save()
+        self.assertEqual(name_index.lookup('kiw', 10)[0]['id'], food.id)
+        self.assertEqual(name_index.lookup('apricot', 10, FOOD)[0]['name'], 'apricot jam')
+
+    def test_index_applies_changelog(self):
+        """Массовые загрузки без сигналов дочитываются индексом по журналу
+        изменений справочников, без полной перезагрузки."""
+        name_index.ensure_fresh()
+        import_dishes([{'name': 'Apricot tart'}])
+        with self.settings(DIARY_AUTOCOMPLETE={**settings.DIARY_AUTOCOMPLETE,\
+                'CHECK_INTERVAL': 0}), mock.patch.object(name_index, 'load') as load:
+            name_index.ensure_fresh()
+        load.assert_not_called()
+        self.assertEqual([i['name'] for i in name_index.lookup('apricot', 10)],\
+            ['apricot jam', 'Apricot tart'])
+
+
+class TestDirectorySync(TestCase):
+    """Класс тестов снимка и изменений справочников для клиента."""
+
+    def setUp(self):
+        directory_snapshot.reset()
+        self.addCleanup(directory_snapshot.reset)
+        self.apple = DirectoryFood.objects.create(name='Apple', caloric=52)
+        self.salt = DirectoryIngredients.objects.create(name='Salt')
+
+    def test_snapshot_etag_and_changes(self):
+        """Снимок сжат gzip и отдает 304 по ETag, изменения после версии
+        снимка содержат только новые, измененные и удаленные записи."""
+        response = self.client.get('/api/directory/snapshot', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        snapshot = json.loads(gzip.decompress(response.content))
+        self.assertEqual([i['name'] for i in snapshot['food']], ['Apple'])
+        self.assertEqual(snapshot['ingredient'][0]['id'], self.salt.id)
+        response = self.client.get('/api/directory/snapshot',\
+            HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        pear = DirectoryFood.objects.create(name='Pear')
+        self.apple.caloric = 50
+        self.apple.save()
+        salt_id = self.salt.id
+        self.salt.delete()
+        response = self.client.get(f'/api/directory/changes?since={snapshot["version"]}')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        changes = response.json()
+        self.assertEqual([(i['id'], i['caloric']) for i in changes['food']],\
+            [(self.apple.id, 50), (pear.id, 0)])
+        self.assertEqual(changes['deleted'], {'food': [], 'ingredient': [salt_id]})
+        response = self.client.get(f'/api/directory/changes?since={changes["version"]}')
+        self.assertEqual(response.json()['food'], [])
+        response = self.client.get('/api/directory/snapshot')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(json.loads(response.content)['version'], changes['version'])
+
+    def test_changes_require_snapshot(self):
+        """Слишком длинный или неизвестный журнал требует загрузить снимок."""
+        with self.settings(DIARY_DIRECTORY_SYNC={'MAX_DELTA': 1}):
+            response = self.client.get('/api/directory/changes?since=0')
+        self.assertEqual(response.status_code, HTTPStatus.GONE)
+        self.assertEqual(response.json()['snapshot_url'], '/api/directory/snapshot')
+        response = self.client.get('/api/directory/changes?since=999999')
+        self.assertEqual(response.status_code, HTTPStatus.GONE)
+        response = self.client.get('/api/directory/changes?since=abc')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class TestDirectoryImport(TestCase):
+    """Класс тестов массового импорта блюд."""
+
+    def test_import_new_dishes_single_statement(self):
+        """Новые блюда вставляются одним запросом, повторы названий отбрасываются.
+        Еще два запроса записывают созданные блюда в журнал изменений."""
+        dishes = [{'name': 'Pelmeni', 'caloric': 275, 'fat': 12, 'carbon': 29, 'protein': 12},
+                  {'name': 'Vareniki', 'caloric': 200, 'fat': 5, 'carbon': 40, 'protein': 6},
+                  {'name': 'Pelmeni', 'caloric': 1, 'fat': 1, 'carbon': 1, 'protein': 1}]
+        with self.assertNumQueries(3):
+            foods = import_dishes(dishes)
+        self.assertEqual([i.name for i in foods], ['Pelmeni', 'Vareniki'])
+        self.assertEqual(foods[0].caloric, 275)
+        self.assertEqual(DirectoryFood.objects.count(), 2)
+
+    def test_import_existing_dishes(self):
+        """Существующие блюда не вызывают ошибку и возвращаются вместе с новыми."""
+        existing = DirectoryFood.objects.create(name='Borscht', caloric=50)
+        foods = import_dishes([{'name': 'Borscht', 'caloric': 70},\
+            {'name': 'Solyanka', 'caloric': 90}])
+        self.assertEqual([i.id for i in foods][0], existing.id)
+        self.assertEqual(foods[0].caloric, 50)
+        self.assertEqual(foods[1].name, 'Solyanka')
+
+
+class TestImportDirectoryCommand(TestCase):
+    """Класс тестов команды загрузки выгрузки в справочники."""
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def write_dump(self, name, content):
+        """Создает файл выгрузки во временной директории."""
+        path = os.path.join(self.tmp, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def test_import_formats(self):
+        """Загрузка JSON массива, JSON Lines и CSV пачками."""
+        dishes = [{'name': f'Dish {i}', 'caloric': f'{i},5', 'fat': i} for i in range(7)]
+        call_command('import_directory', self.write_dump('dump.json',\
+            json.dumps({'dishes': dishes})), chunk_size=3, stdout=io.StringIO())
+        self.assertEqual(DirectoryFood.objects.count(), 7)
+        self.assertEqual(DirectoryFood.objects.get(name='Dish 6').caloric, 6)
+        call_command('import_directory', self.write_dump('dump.ndjson',\
+            '\n'.join(json.dumps(i) for i in dishes[5:] + [{'name': 'Dish 7'}])),\
+            stdout=io.StringIO())
+        self.assertEqual(DirectoryFood.objects.count(), 8)
+        call_command('import_directory', self.write_dump('dump.csv',\
+            'name,caloric,fat,carbon,protein\nSalt,0,0,0,0\nSugar,387,0,100,0\n'),\
+            model='ingredients', stdout=io.StringIO())
+        self.assertEqual(DirectoryIngredients.objects.get(name='Sugar').carbon, 100)
+
+    def test_resume_from_checkpoint(self):
+        """Повторный запуск продолжает загрузку с байтовой позиции контрольной
+        точки, чтение с позиции любого формата дает оставшиеся записи."""
+        dishes = [{'name': f'Блюдо {i}', 'caloric': str(i)} for i in range(5)]
+        dumps = {'json': json.dumps({'dishes': dishes}, ensure_ascii=False, indent=1),
+                 'ndjson': '\n'.join(json.dumps(i, ensure_ascii=False) for i in dishes),
+                 'csv': 'name,caloric\n' + ''.join(f'"{i["name"]}",{i["caloric"]}\n'\
+                    for i in dishes)}
+        for dump_format, content in dumps.items():
+            with open(self.write_dump(f'dump.{dump_format}', content), 'rb') as file:
+                records = list(DUMP_READERS[dump_format](file))
+                self.assertEqual([item for item, _ in records], dishes)
+                rest = list(DUMP_READERS[dump_format](file, records[2][1]))
+                self.assertEqual([item for item, _ in rest], dishes[3:])
+        path = self.write_dump('dump.ndjson',\
+            '\n'.join(json.dumps({'name': f'Dish {i}'}) for i in range(5)))
+        offset = len(''.join(f'{json.dumps({"name": f"Dish {i}"})}\n' for i in range(3)))
+        Command.write_checkpoint(f'{path}.checkpoint', path, 3, offset)
+        out = io.StringIO()
+        call_command('import_directory', path, stdout=out)
+        self.assertIn('Resuming after 3 records', out.getvalue())
+        self.assertEqual(sorted(DirectoryFood.objects.values_list('name', flat=True)),\
+            ['Dish 3', 'Dish 4'])
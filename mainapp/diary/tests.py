@@ -1,9 +1,33 @@
 """Модуль тестов API django приложения."""
+import io
+import os
 import json
 import datetime
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
-from django.test import TestCase
-from .models import UserBase, DirectoryFood
+from unittest import mock
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.db.backends.postgresql.base import DatabaseWrapper as PostgresWrapper
+from django.test import TestCase, SimpleTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from .models import UserBase, DirectoryFood, UserStat, UserFoodDay, Job, UserStatRollup,\
+    DietaGramLookup
+from .search import PostgresTrigramSearchBackend, get_search_backend
+from .singleflight import SingleFlight
+from .dietagram.cache import lookup_cache
+from .dietagram.client import CircuitBreaker, DietaGramClient, DietaGramUnavailable,\
+    TokenBucket
+from .dietagram.stub import start_stub_server
+from .stats import add_to_stat, apply_stat_deltas, stat_mismatches
+from . import jobs
+from .api.serializers import UserFoodDaySerializer, UserStatForPeriodSerializer
 
 
 # Create your tests here.
@@ -58,6 +82,704 @@ class TestSearchFood(TestCase):
         self.assertEqual(result['protein'], food.protein)
         self.assertEqual(result['carbon'], food.carbon)
 
+    def test_search_food_ranked_and_limited(self):
+        """Результаты поиска отсортированы по релевантности и ограничены limit."""
+        DirectoryFood.objects.create(name='Apple pie with cinnamon')
+        DirectoryFood.objects.create(name='Apple')
+        DirectoryFood.objects.create(name='Green apple juice')
+        response = self.client.get('/api/food/search?name=apple&lang=en&limit=2')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        result = response.json()
+        self.assertEqual(len(result), 2)
+        self.assertEqual(result[0]['name'], 'Apple')
+
+    def test_search_pages(self):
+        """Постраничная выдача поиска по ключу (rank, id) совпадает
+        с полной выдачей, в том числе при поиске короче трех символов."""
+        for name in ('Apple', 'Apple pie', 'Green apple', 'Baked apple', 'Pineapple', 'Apple tea'):
+            DirectoryFood.objects.create(name=name)
+        for query in ('apple', 'ap'):
+            expected = [i['id'] for i in self.client.get(\
+                f'/api/food/search?name={query}&lang=en&limit=10').json()]
+            url, found = f'/api/food/search?name={query}&lang=en&page_size=4', []
+            while url:
+                page = self.client.get(url).json()
+                self.assertLessEqual(len(page['results']), 4)
+                found.extend(i['id'] for i in page['results'])
+                url = page['next']
+            self.assertEqual(found, expected)
+        response = self.client.get('/api/food/search?name=apple&lang=en&cursor=forged')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_trigram_rank_cast(self):
+        """rank триграммного поиска PostgreSQL приводится к double precision
+        и в выборке, и в условии ключа страницы."""
+        postgres = PostgresWrapper({**connection.settings_dict,\
+            'ENGINE': 'django.db.backends.postgresql'}, alias='postgres_sql')
+        queryset = PostgresTrigramSearchBackend.queryset('apple', (0.25, 7), ('name',))
+        sql, _ = queryset.query.get_compiler(connection=postgres).as_sql()
+        self.assertTrue(sql.startswith('SELECT "diary_directoryfood"."id", '
+                                       '"diary_directoryfood"."name", UPPER('))
+        cast = 'SIMILARITY(UPPER("diary_directoryfood"."name"), %s))::double precision'
+        self.assertEqual(sql.count(cast), 3)
+        self.assertIn('AS "rank"', sql)
+        self.assertRegex(sql, r'ORDER BY \d+ DESC, "diary_directoryfood"\."id" ASC$')
+
+    def test_food_batch_and_fields(self):
+        """api/food/batch возвращает блюда в порядке ids одним запросом,
+        параметр fields сужает ответ до перечисленных полей."""
+        foods = [DirectoryFood.objects.create(name=f'Batch {i}', caloric=i) for i in range(3)]
+        ids = f'{foods[2].id},{foods[0].id},0,{foods[2].id}'
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/food/batch?ids={ids}&fields=name,caloric')
+        self.assertEqual(response.json(), [{'name': 'Batch 2', 'caloric': 2},\
+            {'name': 'Batch 0', 'caloric': 0}])
+        for query in ('Batch', 'ba'):
+            with CaptureQueriesContext(connection) as queries:
+                result = self.client.get(f'/api/food/search?name={query}&lang=en&fields=id')\
+                    .json()
+            self.assertEqual(sorted(result, key=lambda i: i['id']), [{'id': i.id} for i in foods])
+            self.assertNotIn('caloric', queries[0]['sql'])
+        too_many = ','.join(map(str, range(101)))
+        for query in ('ids=1,x', 'ids=', f'ids={too_many}', 'ids=1&fields=rank'):
+            response = self.client.get(f'/api/food/batch?{query}')
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_search_index_follows_directory(self):
+        """Поисковый индекс синхронизирован с изменениями справочника."""
+        food = DirectoryFood.objects.create(name='Borscht')
+        self.assertEqual([i.id for i in get_search_backend().search('borscht', 10)], [food.id])
+        food.name = 'Solyanka'
+        food.save()
+        self.assertEqual(get_search_backend().search('borscht', 10), [])
+        self.assertEqual([i.id for i in get_search_backend().search('solyan', 10)], [food.id])
+        food.delete()
+        self.assertEqual(get_search_backend().search('solyan', 10), [])
+
+class TestDietaGramCache(TestCase):
+    """Класс тестов кэша запросов к API DietaGram."""
+
+    def setUp(self):
+        lookup_cache.clear()
+        self.upstream = mock.patch('diary.dietagram.lookup.get_client').start().return_value.search
+        self.addCleanup(mock.patch.stopall)
+
+    def test_negative_result_cached(self):
+        """Блюдо, которого нет в DietaGram, запрашивается во внешнем API один раз."""
+        self.upstream.return_value = []
+        for _ in range(3):
+            response = self.client.get('/api/food/search?name=Unknown  Dish&lang=en')
+            self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.get('/api/food/search?name=unknown dish&lang=EN')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(self.upstream.call_count, 1)
+        self.assertEqual(lookup_cache.stats()['hit_ratio'], 0.75)
+
+    def test_positive_result_cached(self):
+        """Найденные блюда запоминаются и повторно не запрашиваются."""
+        self.upstream.return_value = [{'name': 'Pelmeni', 'caloric': '275,5',\
+            'fat': '12', 'carbon': '29', 'protein': '12'}]
+        response = self.client.get('/api/food/search?name=dumplings&lang=en')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        lookup_cache.clear()
+        response = self.client.get('/api/food/search?name=dumplings&lang=en')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()[0]['name'], 'Pelmeni')
+        self.assertEqual(self.upstream.call_count, 1)
+        self.assertEqual(lookup_cache.stats()['db_hits'], 1)
+
+    def test_trim_every_n_stores(self):
+        """Записи сверх MAX_ROWS удаляются раз в TRIM_EVERY сохранений,
+        остальные сохранения сортировку таблицы не выполняют."""
+        options = dict(settings.DIETAGRAM_CACHE, MAX_ROWS=1, TRIM_EVERY=3)
+        with self.settings(DIETAGRAM_CACHE=options):
+            for name in ('borsch', 'shchi'):
+                with CaptureQueriesContext(connection) as queries:
+                    lookup_cache.store(name, 'en', [])
+                self.assertFalse([q for q in queries if 'ORDER BY' in q['sql']])
+            self.assertEqual(DietaGramLookup.objects.count(), 2)
+            lookup_cache.store('okroshka', 'en', [])
+        self.assertEqual(list(DietaGramLookup.objects.values_list('name', flat=True)),\
+            ['okroshka'])
+
+
+class TestDietaGramClient(SimpleTestCase):
+    """Класс тестов клиента API DietaGram на локальной заглушке."""
+
+    def make_client(self, **stub):
+        """Запускает заглушку и создает клиент, направленный на нее."""
+        server, url = start_stub_server(**stub)
+        self.addCleanup(server.shutdown)
+        options = dict(settings.DIETAGRAM, RETRIES=0, FAILURE_THRESHOLD=2, RESET_TIMEOUT=60)
+        return DietaGramClient(url, {}, options)
+
+    def test_search_dishes(self):
+        """Клиент возвращает блюда и пустой список для неизвестного блюда."""
+        client = self.make_client()
+        self.assertEqual(len(client.search('borscht', 'en')), 3)
+        self.assertEqual(client.search('unknown dish', 'en'), [])
+
+    def test_circuit_breaker_opens(self):
+        """После серии ошибок клиент перестает обращаться к API."""
+        client = self.make_client(error_rate=1.0)
+        for _ in range(2):
+            with self.assertRaisesMessage(DietaGramUnavailable, 'upstream status 503'):
+                client.search('borscht', 'en')
+        with self.assertRaisesMessage(DietaGramUnavailable, 'circuit breaker is open'):
+            client.search('borscht', 'en')
+
+    def test_token_bucket(self):
+        """Ограничитель пропускает не больше запросов, чем накоплено токенов."""
+        now = [0.0]
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0])
+        self.assertTrue(bucket.acquire())
+        self.assertTrue(bucket.acquire())
+        self.assertFalse(bucket.acquire())
+        now[0] = 0.5
+        self.assertTrue(bucket.acquire())
+
+    def test_half_open_probe_without_quota(self):
+        """Пробный запрос, не выполненный из-за лимита запросов, не оставляет
+        предохранитель разомкнутым."""
+        now = [0.0]
+        client = self.make_client()
+        client.quota_wait = 0
+        client.breaker = CircuitBreaker(failure_threshold=1, reset_timeout=60,\
+            clock=lambda: now[0])
+        client.bucket = TokenBucket(rate=1, capacity=1, clock=lambda: now[0])
+        client.breaker.record_failure()
+        now[0] = 60
+        client.bucket.tokens = 0
+        client.bucket.updated = now[0]
+        self.assertEqual(client.breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaisesMessage(DietaGramUnavailable, 'request quota exceeded'):
+            client.search('borscht', 'en')
+        now[0] = 61
+        self.assertEqual(len(client.search('borscht', 'en')), 3)
+        self.assertEqual(client.breaker.state, CircuitBreaker.CLOSED)
+
+
+class TestStatRollups(TestCase):
+    """Класс тестов сумм статистики за неделю и месяц."""
+
+    def setUp(self):
+        self.user = UserBase.objects.create(username='rollup_user', email='rollup_user@mail.com')
+        self.soup = DirectoryFood.objects.create(name='Суп', caloric=100, fat=1, protein=2,\
+            carbon=3)
+        # Понедельник 29.01.2024: неделя захватывает январь и февраль.
+        days = [datetime.date(2024, 1, 29) + datetime.timedelta(days=i) for i in range(10)]
+        UserFoodDay.objects.bulk_create([UserFoodDay(user=self.user, food=self.soup, date=day,\
+            **UserFoodDay.snapshot(self.soup)) for day in days])
+        apply_stat_deltas(self.user.id, {day: (100, 1, 2, 3) for day in days})
+        add_to_stat(self.user.id, '2024-02-07', 50)
+
+    def get_rollup(self, period, date_start, date_end):
+        """Запрашивает суммы за период через API."""
+        response = self.client.get(f'/api/user/stat-rollup?user={self.user.id}'
+                                   f'&period={period}&date_start={date_start}&date_end={date_end}')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.json()
+
+    def test_incremental_rollups(self):
+        """Суммы недель и месяцев поддерживаются при добавлении статистики
+        и пересчете UserStat, и совпадают с заполнением заново."""
+        weeks = self.get_rollup('week', '2024-01-31', '2024-02-29')
+        self.assertEqual([(i['start'], i['calories_burned'], i['days_logged']) for i in weeks],\
+            [('2024-01-29', 700, 7), ('2024-02-05', 350, 3)])
+        self.assertEqual(weeks[1]['avg_calories_burned'], 116.7)
+        months = self.get_rollup('month', '2024-01-01', '2024-12-31')
+        self.assertEqual([(i['start'], i['calories_burned'], i['fat_burned'], i['days_logged'])\
+            for i in months], [('2024-01-01', 300, 3, 3), ('2024-02-01', 750, 7, 7)])
+        UserStat.objects.filter(user=self.user, date='2024-02-07').update(calories_burned=0)
+        call_command('rebuild_userstat', user=self.user.id, stdout=io.StringIO())
+        months = self.get_rollup('month', '2024-01-01', '2024-12-31')
+        self.assertEqual([i['calories_burned'] for i in months], [300, 700])
+        expected = list(UserStatRollup.objects.order_by('period', 'start').values())
+        UserStatRollup.objects.all().delete()
+        call_command('backfill_rollups', stdout=io.StringIO())
+        self.assertEqual(list(UserStatRollup.objects.order_by('period', 'start')\
+            .values(*[i for i in expected[0] if i != 'id'])),\
+            [{k: v for k, v in i.items() if k != 'id'} for i in expected])
+        self.soup.delete()
+        self.assertEqual([(i['calories_burned'], i['days_logged']) for i in\
+            self.get_rollup('month', '2024-01-01', '2024-12-31')], [(0, 0), (0, 0)])
+        response = self.client.get(f'/api/user/stat-rollup?user={self.user.id}&period=year'
+                                   '&date_start=2024-01-01&date_end=2024-12-31')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+
+class TestRebuildUserStatCommand(TestCase):
+    """Класс тестов сверки и пересчета статистики по блюдам пользователя."""
+
+    def setUp(self):
+        self.users = UserBase.objects.bulk_create([UserBase(username=f'stat_user_{i}',\
+            email=f'stat_user_{i}@mail.com') for i in range(3)])
+        self.soup = DirectoryFood.objects.create(name='Soup', caloric=100, fat=1,\
+            protein=2, carbon=3)
+        self.cake = DirectoryFood.objects.create(name='Cake', caloric=400, fat=20,\
+            protein=5, carbon=50)
+        for user in self.users:
+            UserFoodDay.objects.bulk_create([UserFoodDay(user=user, food=food,\
+                date='2024-01-01', **UserFoodDay.snapshot(food))\
+                for food in (self.soup, self.cake, self.cake)])
+            add_to_stat(user.id, '2024-01-01', 900, 41, 12, 103)
+
+    def test_verify_and_rebuild(self):
+        """Расхождения находятся в режиме --verify и исправляются пересчетом
+        только в выбранном окне пользователей и дат."""
+        call_command('rebuild_userstat', verify=True, stdout=io.StringIO())
+        first, second, third = self.users
+        UserFoodDay.objects.filter(user=first, food=self.cake)[:1].get().delete()
+        UserFoodDay.objects.create(user=second, food=self.soup, date='2024-01-02',\
+            **UserFoodDay.snapshot(self.soup))
+        add_to_stat(third.id, '2024-01-03', 50)
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, '3 days'):
+            call_command('rebuild_userstat', verify=True, chunk_size=2, stdout=out)
+        self.assertIn(f'user {first.id} 2024-01-01: stored (900, 41, 12, 103), '
+                      'expected (500, 21, 7, 53)', out.getvalue())
+        call_command('rebuild_userstat', user=first.id, stdout=io.StringIO())
+        self.assertEqual(UserStat.objects.get(user=first).calories_burned, 500)
+        self.assertFalse(UserStat.objects.filter(user=second, date='2024-01-02').exists())
+        call_command('rebuild_userstat', chunk_size=2, date_start='2024-01-02',\
+            stdout=io.StringIO())
+        self.assertEqual(UserStat.objects.get(user=second, date='2024-01-02').fat_burned, 1)
+        self.assertEqual(UserStat.objects.get(user=third, date='2024-01-03').calories_burned, 0)
+        self.assertEqual(UserStat.objects.get(user=third, date='2024-01-01').calories_burned, 900)
+        call_command('rebuild_userstat', verify=True, stdout=io.StringIO())
+
+
+class TestIncrementalStat(TestCase):
+    """Класс тестов поддержки статистики при удалении блюд из дневника
+    и изменении блюд справочника."""
+
+    def setUp(self):
+        self.user = UserBase.objects.create_user(username='inc_user',\
+            email='inc_user@mail.com', password='Qwerty777!!')
+        self.other = UserBase.objects.create(username='inc_other', email='inc_other@mail.com')
+        self.soup = DirectoryFood.objects.create(name='Soup', caloric=100, fat=1,\
+            protein=2, carbon=3)
+        self.cake = DirectoryFood.objects.create(name='Cake', caloric=400, fat=20,\
+            protein=5, carbon=50)
+        for user, date, food in ((self.user, '2024-01-01', self.soup),\
+                (self.user, '2024-01-01', self.soup), (self.user, '2024-01-01', self.cake),\
+                (self.user, '2024-01-02', self.soup), (self.other, '2024-01-01', self.cake)):
+            UserFoodDay.objects.create(user=user, date=date, food=food,\
+                **UserFoodDay.snapshot(food))
+            add_to_stat(user.id, date, food.caloric, food.fat, food.protein, food.carbon)
+
+    def assert_stat_exact(self):
+        """Проверяет, что статистика совпадает с суммами по блюдам."""
+        users = (min(self.user.id, self.other.id), max(self.user.id, self.other.id))
+        self.assertEqual(list(stat_mismatches(users)), [])
+
+    def test_delete_from_diary(self):
+        """Удаление блюда из дневника вычитает его из статистики дня."""
+        user_auth = self.client.post('/api/auth', json.dumps({'username': 'inc_user',\
+            'password': 'Qwerty777!!'}), content_type='application/json')
+        entry = UserFoodDay.objects.filter(user=self.user, food=self.cake).get()
+        response = self.client.delete(f'/api/user/foodstat/delete/{entry.id}',\
+            headers={'Authorization': f"Bearer {user_auth.json()['access']}"})
+        self.assertEqual(response.status_code, HTTPStatus.NO_CONTENT)
+        self.assertEqual(UserStat.objects.get(user=self.user, date='2024-01-01')\
+            .calories_burned, 200)
+        self.assert_stat_exact()
+
+    def test_food_edit_and_delete(self):
+        """Изменение блюда не меняет историю: дневник и статистика хранят
+        значения на момент добавления, к UPDATE добавляется только запись
+        в журнал изменений справочника. Удаление блюда вычитает из статистики
+        сохраненные в дневнике значения."""
+        self.soup.caloric = 150
+        self.soup.fat = 3
+        with self.assertNumQueries(3):
+            self.soup.save()
+        self.assertEqual(UserStat.objects.get(user=self.user, date='2024-01-01')\
+            .calories_burned, 600)
+        self.assertEqual(UserStat.objects.get(user=self.user, date='2024-01-02').fat_burned, 1)
+        self.assertEqual(set(UserFoodDay.objects.filter(food=self.soup)\
+            .values_list('caloric', flat=True)), {100})
+        self.assert_stat_exact()
+        self.cake.caloric = 999
+        self.cake.save()
+        self.cake.delete()
+        self.assertEqual(UserStat.objects.get(user=self.other).calories_burned, 0)
+        self.assertEqual(UserStat.objects.get(user=self.user, date='2024-01-01')\
+            .carbon_burned, 6)
+        self.assert_stat_exact()
+
+
+class TestPeriodExport(TestCase):
+    """Класс тестов потоковой выгрузки статистики и блюд за период."""
+
+    def setUp(self):
+        self.user = UserBase.objects.create(username='export_user',\
+            email='export_user@mail.com', recommended_calories=2000)
+        soup = DirectoryFood.objects.create(name='Суп', caloric=100, fat=1, protein=2, carbon=3)
+        start = datetime.date(2024, 1, 1)
+        UserFoodDay.objects.bulk_create([UserFoodDay(user=self.user, food=soup,\
+            date=start + datetime.timedelta(days=i // 2), **UserFoodDay.snapshot(soup))\
+            for i in range(10)])
+        apply_stat_deltas(self.user.id, {start + datetime.timedelta(days=i):\
+            (200, 2, 4, 6) for i in range(5)})
+        self.params = f'date_start=2024-01-02&date_end=2024-01-04&user={self.user.id}'
+        cache_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(cache_dir.cleanup)
+        cache_settings = self.settings(DIARY_REPORT_CACHE={'DIR': cache_dir.name,\
+            'MAX_BYTES': 1 << 20})
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+
+    def get_stream(self, url):
+        """Выполняет запрос потоковой выгрузки и возвращает тело ответа."""
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content).decode()
+
+    def test_stat_export_formats(self):
+        """CSV, JSON Lines и JSON массив выгрузки статистики совпадают
+        с обычным ответом API."""
+        url = f'/api/user/stat-for-period?{self.params}'
+        expected = sorted(self.client.get(url).json(), key=lambda i: i['date'])
+        lines = self.get_stream(f'{url}&csv_file=true').splitlines()
+        self.assertEqual(lines[0], 'id,user,date,calories_burned,fat_burned,'
+                                   'protein_burned,carbon_burned,balance')
+        self.assertEqual(lines[1].split(',')[1:], ['export_user', '2024-01-02', '200', '2',\
+            '4', '6', '1800'])
+        self.assertEqual(len(lines), 4)
+        ndjson = self.get_stream(f'{url}&stream=ndjson')
+        self.assertEqual([json.loads(i) for i in ndjson.splitlines()], expected)
+        self.assertEqual(json.loads(self.get_stream(f'{url}&stream=json')), expected)
+
+    def test_fast_read_path_matches_serializers(self):
+        """Ответы без ModelSerializer побайтно совпадают с выводом
+        сериализаторов через JSONRenderer."""
+        cases = ((f'/api/user/stat-for-period?{self.params}', UserStatForPeriodSerializer,\
+            UserStat.objects.filter(user=self.user, date__range=('2024-01-02', '2024-01-04'))),\
+            (f'/api/user/foodstat/period?{self.params}', UserFoodDaySerializer,\
+            UserFoodDay.objects.filter(user=self.user, date__range=('2024-01-02', '2024-01-04'))),\
+            (f'/api/user/foodstat/day?date=2024-01-03&user={self.user.id}', UserFoodDaySerializer,\
+            UserFoodDay.objects.filter(user=self.user, date='2024-01-03')))
+        for url, serializer, queryset in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.content,\
+                    JSONRenderer().render(serializer(queryset, many=True).data))
+
+    def test_keyset_pages(self):
+        """Записи за период отдаются страницами по (date, id) с токеном
+        следующей страницы, без page_size и cursor - полным списком."""
+        url = f'/api/user/foodstat/period?{self.params}'
+        expected = sorted(self.client.get(url).json(), key=lambda i: (i['date'], i['id']))
+        pages, next_url = [], f'{url}&page_size=4'
+        while next_url:
+            page = self.client.get(next_url).json()
+            pages.append(page['results'])
+            next_url = page['next']
+        self.assertEqual([len(i) for i in pages], [4, 2])
+        self.assertEqual([i for page in pages for i in page], expected)
+        response = self.client.get(f'{url}&cursor=forged')
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        stats = self.client.get(f'/api/user/stat-for-period?{self.params}&page_size=2'
+                                '&fields=calories_burned').json()
+        self.assertEqual(stats['results'], [{'calories_burned': 200}] * 2)
+        stats = self.client.get(stats['next']).json()
+        self.assertEqual((len(stats['results']), stats['next']), (1, None))
+
+    def test_columnar_format(self):
+        """format=columnar возвращает те же данные параллельными массивами."""
+        url = f'/api/user/stat-for-period?{self.params}'
+        rows = sorted(self.client.get(url).json(), key=lambda i: i['date'])
+        with self.assertNumQueries(2):
+            columns = self.client.get(f'{url}&format=columnar').json()
+        self.assertEqual(columns['dates'], [i['date'] for i in rows])
+        self.assertEqual(columns['calories'], [i['calories_burned'] for i in rows])
+        self.assertEqual(columns['carbon'], [6, 6, 6])
+        columns = self.client.get(f'/api/user/foodstat/period?{self.params}&format=columnar')\
+            .json()
+        self.assertEqual(len(columns['dates']), 6)
+        self.assertEqual(set(columns['names']), {'Суп'})
+        self.assertEqual(columns['calories'], [100] * 6)
+        empty = self.client.get('/api/user/stat-for-period?date_start=2023-01-01'
+                                f'&date_end=2023-01-31&user={self.user.id}&format=columnar')
+        self.assertEqual(empty.json(), {'dates': [], 'calories': [], 'fat': [], 'protein': [],\
+            'carbon': []})
+
+    def test_food_export_streams_in_chunks(self):
+        """Выгрузка блюд читается из БД и отправляется фрагментами."""
+        url = f'/api/user/foodstat/period?{self.params}'
+        expected = sorted(self.client.get(url).json(), key=lambda i: i['id'])
+        with self.settings(DIARY_EXPORT={'CHUNK_SIZE': 2, 'FLUSH_ROWS': 2}):
+            response = self.client.get(f'{url}&stream=json')
+            chunks = [i.decode() for i in response.streaming_content]
+        self.assertEqual(chunks[0], '[')
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(json.loads(''.join(chunks)), expected)
+        self.assertEqual(expected[0]['name'], 'Суп')
+        lines = self.get_stream(f'{url}&csv_file=true').splitlines()
+        self.assertEqual(lines[1].split(',')[2:5], ['export_user', '2024-01-02', 'Суп'])
+        self.assertEqual(len(lines), 7)
+
+    def test_pdf_reports(self):
+        """PDF отчеты строятся фрагментами LongTable с ограничением числа строк."""
+        start = datetime.date(2024, 2, 1)
+        apply_stat_deltas(self.user.id, {start + datetime.timedelta(days=i): (100, 1, 1, 1)\
+            for i in range(300)})
+        url = f'/api/user/stat-for-period?date_start=2024-01-01&date_end=2025-01-01'\
+            f'&user={self.user.id}&pdf_file=true'
+        with self.settings(DIARY_REPORTS={'MAX_ROWS': 1000, 'CHUNK_ROWS': 50,\
+                'SPOOL_MEMORY': 1024}):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            content = b''.join(response.streaming_content)
+            self.assertTrue(content.startswith(b'%PDF'))
+            self.assertGreater(content.count(b'/Type /Page\n'), 3)
+            response = self.client.get(f'/api/user/foodstat/period?{self.params}&pdf_file=true')
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        with self.settings(DIARY_REPORTS={'MAX_ROWS': 100, 'CHUNK_ROWS': 50,\
+                'SPOOL_MEMORY': 1024}):
+            response = self.client.get(url.replace('2025-01-01', '2024-12-31'))
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+            self.assertIn('305 rows', response.json()['error'])
+
+    def test_report_cache(self):
+        """Повторный отчет отдается из кэша без запросов к дневнику, с тем же
+        ETag - ответом 304. Изменение дневника меняет ключ отчета."""
+        url = f'/api/user/stat-for-period?{self.params}&csv_file=true'
+        first = self.get_stream(url)
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(b''.join(response.streaming_content).decode(), first)
+        with self.assertNumQueries(1):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        add_to_stat(self.user.id, '2024-01-02', 50)
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn(',250,', b''.join(response.streaming_content).decode())
+        with self.settings(DIARY_REPORT_CACHE={**settings.DIARY_REPORT_CACHE,\
+                'MAX_BYTES': len(first.encode()) + 10}):
+            self.client.get(url.replace('csv_file', 'pdf_file'))
+        self.assertEqual(len(os.listdir(settings.DIARY_REPORT_CACHE['DIR'])), 1)
+
+
+class TestJobQueue(TestCase):
+    """Класс тестов очереди фоновых задач и асинхронных отчетов."""
+
+    def setUp(self):
+        self.user = UserBase.objects.create_user(username='job_user',\
+            email='job_user@mail.com', password='Qwerty777!!')
+        soup = DirectoryFood.objects.create(name='Суп', caloric=100, fat=1, protein=2, carbon=3)
+        UserFoodDay.objects.bulk_create([UserFoodDay(user=self.user, food=soup,\
+            date=datetime.date(2024, 1, 1 + i), **UserFoodDay.snapshot(soup)) for i in range(3)])
+        user_auth = self.client.post('/api/auth', json.dumps({'username': 'job_user',\
+            'password': 'Qwerty777!!'}), content_type='application/json')
+        self.headers = {'Authorization': f"Bearer {user_auth.json()['access']}"}
+        artifacts = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(artifacts.cleanup)
+        jobs_settings = self.settings(DIARY_JOBS={**settings.DIARY_JOBS,\
+            'ARTIFACT_DIR': artifacts.name, 'RETRY_DELAY': 0})
+        jobs_settings.enable()
+        self.addCleanup(jobs_settings.disable)
+
+    def test_async_pdf_report(self):
+        """Асинхронный PDF отчет ставится в очередь, строится воркером
+        и отдается только владельцу задачи."""
+        response = self.client.get('/api/user/foodstat/period?date_start=2024-01-01'
+            f'&date_end=2024-01-31&user={self.user.id}&pdf_file=true&async=true',\
+            headers=self.headers)
+        self.assertEqual(response.status_code, HTTPStatus.ACCEPTED)
+        job_id = response.json()['job']
+        response = self.client.get(f'/api/jobs/{job_id}/artifact', headers=self.headers)
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+        call_command('run_jobs', once=True, workers=1)
+        status = self.client.get(f'/api/jobs/{job_id}', headers=self.headers).json()
+        self.assertEqual((status['status'], status['attempts']), ('done', 1))
+        response = self.client.get(status['artifact_url'], headers=self.headers)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'%PDF'))
+        self.assertIn('food_stat_for_period_2024-01-01-2024-01-31.pdf',\
+            response['Content-Disposition'])
+        stranger = Job.objects.create(kind='period_report', run_after=timezone.now())
+        response = self.client.get(f'/api/jobs/{stranger.id}', headers=self.headers)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_retry_and_fail(self):
+        """Ошибка задачи повторяется до max_attempts попыток, затем задача
+        завершается с ошибкой. Захваченную задачу не получит другой воркер."""
+        calls = []
+
+        def flaky(params):
+            calls.append(params)
+            raise RuntimeError('boom')
+        with mock.patch.dict(jobs.HANDLERS, {'flaky': flaky}):
+            job = jobs.enqueue('flaky', {'n': 1}, max_attempts=2)
+            claimed = jobs.claim('worker-1')
+            self.assertEqual(claimed.id, job.id)
+            self.assertIsNone(jobs.claim('worker-2'))
+            jobs.run(claimed)
+            job.refresh_from_db()
+            self.assertEqual((job.status, job.attempts, job.locked_by), ('queued', 1, ''))
+            call_command('run_jobs', once=True, workers=1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, len(calls)), ('failed', 2, 2))
+        self.assertIn('RuntimeError: boom', job.error)
+
+    def test_heartbeat_keeps_lock(self):
+        """Воркер продлевает захват долгой задачи, и maintain() не возвращает
+        ее в очередь, а задачу без продления возвращает."""
+        job = jobs.enqueue('command', {'command': 'rebuild_userstat'})
+        claimed = jobs.claim('worker-1')
+        stale = timezone.now() - datetime.timedelta(seconds=settings.DIARY_JOBS['LOCK_TIMEOUT'] + 1)
+        Job.objects.filter(id=job.id).update(locked_at=stale)
+        stop = mock.Mock(wait=mock.Mock(side_effect=[False, True]))
+        with mock.patch('diary.jobs.connection'):
+            jobs.heartbeat(claimed, stop)
+        jobs.maintain()
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.RUNNING)
+        Job.objects.filter(id=job.id).update(locked_at=stale)
+        jobs.maintain()
+        self.assertEqual(Job.objects.get(id=job.id).status, Job.QUEUED)
+
+
+class TestStartupImports(SimpleTestCase):
+    """Класс тестов ленивой загрузки тяжелых модулей при запуске."""
+
+    def test_urls_import_without_reportlab(self):
+        """Импорт URLconf не загружает reportlab и клиент DietaGram,
+        а загрузка лишнего модуля считается ошибкой."""
+        out = io.StringIO()
+        call_command('benchmark_imports', runs=1, top=3, budget_ms=10 ** 6, stdout=out)
+        self.assertIn('import time of mainapp.urls', out.getvalue())
+        with self.assertRaisesMessage(CommandError, 'diary.api.views imported at startup'):
+            call_command('benchmark_imports', runs=1, top=0, budget_ms=10 ** 6,\
+                lazy_modules=['reportlab', 'diary.api.views'], stdout=io.StringIO())
+
+
+class TestSingleFlight(SimpleTestCase):
+    """Класс тестов объединения одновременных одинаковых операций."""
+
+    def test_concurrent_calls_coalesced(self):
+        """Одновременные вызовы с одним ключом выполняют операцию один раз."""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def fetch():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'dishes'
+
+        waiting = threading.Semaphore(0)
+        with ThreadPoolExecutor(8) as pool:
+            leader = pool.submit(flight.do, 'borscht', fetch)
+            started.wait(5)
+            done = flight._calls['borscht'].done  # pylint: disable=protected-access
+            wait = done.wait
+            done.wait = lambda timeout=None: waiting.release() or wait(timeout)
+            followers = [pool.submit(flight.do, 'borscht', fetch) for _ in range(7)]
+            for _ in followers:
+                waiting.acquire(timeout=5)
+            release.set()
+            results = [leader.result()] + [i.result() for i in followers]
+        self.assertEqual(results, ['dishes'] * 8)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(flight.do('borscht', lambda: 'again'), 'again')
+
+    def test_error_shared(self):
+        """Ошибку операции получают все ожидающие вызовы."""
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+        error = DietaGramUnavailable('down')
+
+        def fetch():
+            started.set()
+            release.wait(5)
+            raise error
+
+        waiting = threading.Semaphore(0)
+        with ThreadPoolExecutor(4) as pool:
+            leader = pool.submit(flight.do, 'borscht', fetch)
+            started.wait(5)
+            done = flight._calls['borscht'].done  # pylint: disable=protected-access
+            wait = done.wait
+            done.wait = lambda timeout=None: waiting.release() or wait(timeout)
+            followers = [pool.submit(flight.do, 'borscht', fetch) for _ in range(3)]
+            for _ in followers:
+                waiting.acquire(timeout=5)
+            release.set()
+            errors = [i.exception(5) for i in [leader] + followers]
+        self.assertEqual(errors, [error] * 4)
+
+
+class TestDiaryQueryPlans(TestCase):
+    """Класс тестов планов запросов выборок дневника по пользователю и дате
+    на синтетических данных: год истории у нескольких десятков пользователей."""
+
+    USERS = 40
+    DAYS = 365
+
+    @classmethod
+    def setUpTestData(cls):
+        users = UserBase.objects.bulk_create([UserBase(username=f'plan_user_{i}',\
+            email=f'plan_user_{i}@mail.com') for i in range(cls.USERS)])
+        foods = DirectoryFood.objects.bulk_create([DirectoryFood(name=f'plan_food_{i}')\
+            for i in range(20)])
+        start = datetime.date(2023, 1, 1)
+        days = [start + datetime.timedelta(days=i) for i in range(cls.DAYS)]
+        UserStat.objects.bulk_create([UserStat(user=user, date=day, calories_burned=100)\
+            for user in users for day in days], batch_size=2000)
+        UserFoodDay.objects.bulk_create([UserFoodDay(user=user, date=day,\
+            food=foods[(n + user.id) % len(foods)],\
+            **UserFoodDay.snapshot(foods[(n + user.id) % len(foods)]))\
+            for user in users for day in days for n in range(3)], batch_size=2000)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        cls.user = users[cls.USERS // 2]
+
+    def assert_index_scans(self, url):
+        """Выполняет запрос к API и проверяет, что все его выборки из таблиц
+        дневника идут по индексу, а не полным просмотром таблицы."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        checked = 0
+        for query in queries.captured_queries:
+            sql = query['sql']
+            if not sql.startswith('SELECT') or\
+                    ('diary_userstat' not in sql and 'diary_userfoodday' not in sql):
+                continue
+            with connection.cursor() as cursor:
+                if connection.vendor == 'postgresql':
+                    cursor.execute(f'EXPLAIN {sql}')
+                    plan = '\n'.join(row[0] for row in cursor.fetchall())
+                    self.assertNotIn('Seq Scan on diary_user', plan)
+                else:
+                    cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                    plan = '\n'.join(row[-1] for row in cursor.fetchall())
+                    self.assertRegex(plan, r'SEARCH diary_user(stat|foodday) USING')
+                    self.assertNotRegex(plan, r'SCAN diary_user(stat|foodday)')
+            checked += 1
+        self.assertEqual(checked, 1, url)
+
+    def test_day_queries_use_index(self):
+        """Выборки за день используют индексы (user, date)."""
+        self.assert_index_scans(f'/api/user/stat-for-day?date=2023-06-01&user={self.user.id}')
+        self.assert_index_scans(f'/api/user/foodstat/day?date=2023-06-01&user={self.user.id}')
+
+    def test_period_queries_use_index(self):
+        """Выборки за период используют диапазонный поиск по индексам (user, date)."""
+        params = f'date_start=2023-03-01&date_end=2023-03-31&user={self.user.id}'
+        self.assert_index_scans(f'/api/user/stat-for-period?{params}')
+        self.assert_index_scans(f'/api/user/foodstat/period?{params}')
+
+
 class TestUserStatFodDay(TestCase):
     """Класс тестов получения и добавления статистики
     пользователя за день."""
@@ -147,3 +869,70 @@ class TestFoodStatAdd(TestCase):
         self.assertEqual(result['user'], self.user.id)
         self.assertEqual(result['date'], self.time)
         self.assertEqual(result['calories_burned'], self.food_1.caloric + self.food_2.caloric)
+
+    def test_foodstat_add_accumulates_single_row(self):
+        """Повторные добавления блюд за день увеличивают одну запись
+        статистики атомарным upsert без чтения записи."""
+        headers = {'Authorization': f'Bearer {self.token}'}
+        for food in (self.food_1, self.food_2, self.food_1):
+            response = self.client.post('/api/user/foodstat/add', json.dumps(\
+                {'food': food.id, 'user': self.user.id, 'date': self.time}),\
+                content_type='application/json', headers=headers)
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+        stats = UserStat.objects.filter(user=self.user, date=self.time)
+        self.assertEqual(stats.count(), 1)
+        self.assertEqual(stats[0].calories_burned, 400)
+        self.assertEqual(stats[0].carbon_burned, 1600)
+        with self.assertNumQueries(3):
+            stat = add_to_stat(self.user.id, self.time, 1, 2, 3, 4)
+        self.assertEqual((stat.calories_burned, stat.fat_burned), (401, 802))
+
+    def test_foodstat_add_gram(self):
+        """Вес порции пересчитывает калории и БЖУ со 100 г на съеденные
+        граммы в записи дневника, статистике и выгрузках."""
+        headers = {'Authorization': f'Bearer {self.token}'}
+        response = self.client.post('/api/user/foodstat/add', json.dumps({'food': self.food_1.id,\
+            'user': self.user.id, 'date': '2024-01-01', 'gram': 250}),\
+            content_type='application/json', headers=headers)
+        self.assertEqual(response.json()['calories_burned'], 250)
+        response = self.client.post('/api/user/foodstat/add-batch', json.dumps({'user':\
+            self.user.id, 'items': [{'food': self.food_2.id, 'date': '2024-01-01', 'gram': 50}]}),\
+            content_type='application/json', headers=headers)
+        self.assertEqual(response.json()[0]['calories_burned'], 350)
+        day = self.client.get(f'/api/user/foodstat/day?date=2024-01-01&user={self.user.id}').json()
+        self.assertEqual([(i['gram'], i['caloric'], i['carbon']) for i in day],\
+            [(250, 250, 1000), (50, 100, 400)])
+        lines = b''.join(self.client.get('/api/user/foodstat/period?date_start=2024-01-01'\
+            f'&date_end=2024-01-01&user={self.user.id}&csv_file=true').streaming_content)\
+            .decode().splitlines()
+        self.assertEqual(lines[1].split(',')[4:], ['Test_food', '250', '250', '500', '750',\
+            '1000'])
+        for gram in (0, 2.5, 'x', UserFoodDay.MAX_GRAM + 1):
+            response = self.client.post('/api/user/foodstat/add', json.dumps({'food':\
+                self.food_1.id, 'user': self.user.id, 'gram': gram}),\
+                content_type='application/json', headers=headers)
+            self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertEqual(UserFoodDay.objects.filter(user=self.user).count(), 2)
+
+    def test_foodstat_add_batch(self):
+        """Добавление приема пищи из нескольких блюд за разные дни
+        выполняется постоянным числом запросов к БД."""
+        headers = {'Authorization': f'Bearer {self.token}'}
+        items = [{'food': self.food_1.id, 'date': '2024-01-01'}] * 5 +\
+            [{'food': self.food_2.id, 'date': '2024-01-01'},\
+            {'food': self.food_2.id, 'date': '2024-01-02'}]
+        with self.assertNumQueries(8):
+            response = self.client.post('/api/user/foodstat/add-batch', json.dumps(\
+                {'user': self.user.id, 'items': items}), content_type='application/json',\
+                headers=headers)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        result = response.json()
+        self.assertEqual([i['date'] for i in result], ['2024-01-01', '2024-01-02'])
+        self.assertEqual([i['calories_burned'] for i in result], [700, 200])
+        self.assertEqual(UserFoodDay.objects.filter(user=self.user).count(), 7)
+        response = self.client.post('/api/user/foodstat/add-batch', json.dumps(\
+            {'user': self.user.id, 'items': [{'food': self.food_1.id}, {'food': 0}]}),\
+            content_type='application/json', headers=headers)
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertEqual(response.json()['food'], [0])
+        self.assertEqual(UserFoodDay.objects.filter(user=self.user).count(), 7)
@@ -172,10 +172,127 @@ LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/login/'
 
+# Поиск по справочнику блюд. DIARY_SEARCH_BACKEND - путь до класса бэкенда,
+# если не задан, бэкенд выбирается по типу СУБД (см. diary.search).
+DIARY_SEARCH_BACKEND = environ.get('DIARY_SEARCH_BACKEND')
+DIARY_SEARCH_LIMIT = 50
+DIARY_SEARCH_MAX_LIMIT = 200
+# Наибольшее число id блюд в одном запросе api/food/batch.
+DIARY_FOOD_BATCH_MAX_IDS = 100
+
+# Автодополнение названий блюд и ингредиентов (diary.autocomplete).
+# CHECK_INTERVAL - как часто в секундах индекс сверяет версию справочников с БД.
+DIARY_AUTOCOMPLETE = {
+    'LIMIT': 10,
+    'MAX_LIMIT': 50,
+    'CHECK_INTERVAL': 30,
+}
+
+# Синхронизация справочников с клиентом (diary.changelog). MAX_DELTA - наибольшее
+# число записей в ответе api/directory/changes, при большем клиент получает 410
+# и загружает снимок api/directory/snapshot заново.
+DIARY_DIRECTORY_SYNC = {
+    'MAX_DELTA': 5000,
+}
+
+# Клиент API DietaGram (diary.dietagram.client). Таймауты в секундах,
+# RATE - запросов в секунду на процесс, BURST - допустимый всплеск.
+# DIETAGRAM_URL можно направить на локальную заглушку (manage.py dietagram_stub).
+DIETAGRAM = {
+    'URL': environ.get('DIETAGRAM_URL', 'https://dietagram.p.rapidapi.com/apiFood.php'),
+    'ENV_FILE': BASE_DIR / '.env',
+    'CONNECT_TIMEOUT': 3.05,
+    'READ_TIMEOUT': 5,
+    'RETRIES': 1,
+    'POOL_SIZE': 10,
+    'FAILURE_THRESHOLD': 5,
+    'RESET_TIMEOUT': 30,
+    'RATE': 5,
+    'BURST': 10,
+    'QUOTA_WAIT': 1,
+}
+
+# Кэш запросов к API DietaGram (diary.dietagram.cache). TTL в секундах.
+# Записи сверх MAX_ROWS удаляются раз в TRIM_EVERY сохранений.
+DIETAGRAM_CACHE = {
+    'POSITIVE_TTL': 60 * 60 * 24 * 30,
+    'NEGATIVE_TTL': 60 * 60 * 24,
+    'MEMORY_SIZE': 4096,
+    'MAX_ROWS': 200000,
+    'TRIM_EVERY': 1000,
+    'STATS_LOG_EVERY': 1000,
+}
+
+# Потоковая выгрузка статистики за период (diary.exports).
+# CHUNK_SIZE - строк, читаемых из БД за раз, FLUSH_ROWS - строк в одном
+# отправляемом клиенту фрагменте ответа.
+DIARY_EXPORT = {
+    'CHUNK_SIZE': 2000,
+    'FLUSH_ROWS': 200,
+}
+
+# PDF отчеты (diary.reports). MAX_ROWS - максимальное число строк таблицы
+# отчета, CHUNK_ROWS - строк в одном фрагменте LongTable, SPOOL_MEMORY -
+# размер документа в байтах, после которого он пишется во временный файл.
+DIARY_REPORTS = {
+    'MAX_ROWS': 20000,
+    'CHUNK_ROWS': 200,
+    'SPOOL_MEMORY': 1 << 20,
+}
+
+# Бюджет запуска процесса (manage.py benchmark_imports): IMPORT_BUDGET_MS -
+# предельное время импорта URLconf вместе с django.setup() в миллисекундах,
+# LAZY_MODULES - модули, которые импортируются только при первом использовании
+# (PDF отчеты и клиент DietaGram) и не должны загружаться при запуске.
+DIARY_STARTUP = {
+    'IMPORT_BUDGET_MS': 700,
+    'LAZY_MODULES': ('reportlab', 'dotenv', 'diary.reports', 'diary.dietagram.client'),
+}
+
+# Дисковый кэш PDF и CSV отчетов за период (diary.report_cache): DIR - каталог
+# файлов, MAX_BYTES - размер каталога, сверх которого давно не запрошенные
+# отчеты удаляются.
+DIARY_REPORT_CACHE = {
+    'DIR': BASE_DIR / 'report_cache',
+    'MAX_BYTES': 256 << 20,
+}
+
+# Очередь фоновых задач в БД (diary.jobs, manage.py run_jobs): WORKERS -
+# число воркеров, MODE - thread или process, POLL_INTERVAL - пауза опроса
+# пустой очереди в секундах, MAX_ATTEMPTS - попыток по умолчанию, RETRY_DELAY -
+# задержка первого повтора (удваивается), HEARTBEAT_INTERVAL - как часто в секундах
+# воркер продлевает захват выполняемой задачи, LOCK_TIMEOUT - через сколько секунд
+# без продления задача пропавшего воркера возвращается в очередь, ARTIFACT_DIR - каталог
+# файлов результатов, ARTIFACT_TTL - срок хранения завершенных задач.
+DIARY_JOBS = {
+    'WORKERS': 2,
+    'MODE': 'thread',
+    'POLL_INTERVAL': 1,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY': 30,
+    'HEARTBEAT_INTERVAL': 60,
+    'LOCK_TIMEOUT': 600,
+    'ARTIFACT_DIR': BASE_DIR / 'job_artifacts',
+    'ARTIFACT_TTL': 86400,
+}
+
+# Keyset пагинация поиска и списков за период (diary.api.pagination):
+# PAGE_SIZE - размер страницы по умолчанию, MAX_PAGE_SIZE - наибольший
+# размер страницы, который можно запросить параметром page_size.
+DIARY_PAGINATION = {
+    'PAGE_SIZE': 100,
+    'MAX_PAGE_SIZE': 1000,
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_simplejwt.authentication.JWTAuthentication',
-    )
+    ),
+    # JSON кодируется orjson, если он установлен; вывод совпадает с JSONRenderer.
+    'DEFAULT_RENDERER_CLASSES': (
+        'diary.api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
 }
 
 SIMPLE_JWT = {
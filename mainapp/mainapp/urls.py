@@ -23,12 +23,14 @@ from rest_framework_simplejwt.views import TokenObtainPairView,\
     TokenRefreshView, TokenBlacklistView
 from diary.api.views import UserLoginView, UserLogoutView,\
     UserRegisterView, FoodSearchView, UserFoodAddView, UserStatAddView,\
+    UserFoodAddBatchView,\
     DirectoryFoodUserCreateView, DirectoryIngredientsCreateView,\
     RecipeCreateView, UserFoodDeleteView, DirectoryFoodUserDeleteView, \
     DirectoryIngredientsDeleteView, UserGetStatForDayView, RecipeDeleteView,\
     UserGetStatForPeriodView, UserFoodDayStatView, UserFoodDayStatPeriodView, \
     UserChangePasswordView, UserGetInfoView, FoodGetRecipeView, RecipeUpdateView, \
-    UserRecCaloriesView \
+    UserRecCaloriesView, FoodAutocompleteView, JobStatusView, JobArtifactView,\
+    UserStatRollupView, FoodBatchView, DirectorySnapshotView, DirectoryChangesView
 
 schema_view = get_schema_view(
    openapi.Info(
@@ -54,7 +56,13 @@ urlpatterns = [
     path('api/register', UserRegisterView.as_view(), name='user-create'),
     path('api/change-pwd/<int:pk>', UserChangePasswordView.as_view(), name='user change password'),
     path('api/food/search', FoodSearchView.as_view(), name='search_food'),
+    path('api/food/batch', FoodBatchView.as_view(), name='batch_food'),
+    path('api/food/autocomplete', FoodAutocompleteView.as_view(), name='autocomplete_food'),
+    path('api/directory/snapshot', DirectorySnapshotView.as_view(), name='directory_snapshot'),
+    path('api/directory/changes', DirectoryChangesView.as_view(), name='directory_changes'),
     path('api/user/foodstat/add', UserFoodAddView.as_view(), name='food_add_in_stat'),
+    path('api/user/foodstat/add-batch', UserFoodAddBatchView.as_view(),\
+        name='food_add_batch_in_stat'),
     path('api/user/foodstat/day', UserFoodDayStatView.as_view(), name='food_stat_for_day'),
     path('api/user/foodstat/period', UserFoodDayStatPeriodView.as_view(),\
         name='food_stat_for_period'),
@@ -73,8 +81,11 @@ urlpatterns = [
     path('api/user/stat-for-day', UserGetStatForDayView.as_view(), name = 'stat_for_day_user'),
     path('api/user/stat-for-period', UserGetStatForPeriodView.as_view(),\
         name = 'stat_for_period_user'),
+    path('api/user/stat-rollup', UserStatRollupView.as_view(), name = 'stat_rollup_user'),
     path('api/user/userinfo', UserGetInfoView.as_view(), name= 'get_info_for_user'),
     path('api/food/get-recipe', FoodGetRecipeView.as_view(), name= 'get_recipe_food'),
     path('api/food/recipe/update', RecipeUpdateView.as_view(), name = 'update_recipe'),
     path('api/user/calc/calories', UserRecCaloriesView.as_view(), name = 'calc_calories'),
+    path('api/jobs/<int:pk>', JobStatusView.as_view(), name = 'job_status'),
+    path('api/jobs/<int:pk>/artifact', JobArtifactView.as_view(), name = 'job_artifact'),
 ]